@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from textlib import analyze, binaryformat
+
+
+def make_text_data():
+    """Return a small textData dictionary in the layout
+    of a metadata file written with --vocabulary
+    """
+    return {
+        '_meta' : { 'Filename' : u'straße.txt', 'language' : 'de_DE', 'tokenizer' : 'regex' },
+        'sentenceCount' : 2,
+        'wordCount' : 3,
+        'averageWordLength' : 4.667,
+        'maxSyllableCountPerWord' : { 'word' : '0x1c291ca3', 'count' : 2 },
+        'readingEase' : [{ 'id' : 'FleschReadingEase', 'value' : 71.2 }],
+        'vocabulary' : [
+            { 'word' : u'Größe', 'syllables' : [u'Grö', u'ße'], 'vocabularyId' : 0 },
+            { 'word' : u'zählt', 'syllables' : [u'zählt'], 'vocabularyId' : 1 }
+        ],
+        'sentences' : [
+            { 'sentence' : u'Größe zählt.', 'wordCount' : 2, 'words' : [{ 'word' : u'Größe', 'vocabularyId' : 0 }, { 'word' : u'zählt', 'vocabularyId' : 1 }] },
+            { 'sentence' : u'Größe!', 'wordCount' : 1, 'words' : [{ 'word' : u'Größe', 'vocabularyId' : 0 }] }
+        ]
+    }
+
+
+class BinaryFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, textData, outputFormat):
+        filename = os.path.join(self.folder, 'text_metadata.' + outputFormat)
+        analyze.write_metadata(textData, filename, outputFormat)
+        return filename
+
+    def test_round_trip_matches_json(self):
+        textData = make_text_data()
+        with open(self.write(textData, 'json'), 'rb') as jsonFile:
+            jsonData = json.load(jsonFile)
+        binaryData = binaryformat.load_binary(self.write(textData, 'binary'))
+        self.assertEqual(binaryData, jsonData)
+        self.assertEqual(binaryData, textData)
+
+    def test_round_trip_with_sentence_iterable(self):
+        textData = make_text_data()
+        sentences = textData.pop('sentences')
+        filename = os.path.join(self.folder, 'text_metadata.bin')
+        analyze.write_metadata(textData, filename, 'binary', sentences=iter(sentences))
+        self.assertEqual(binaryformat.load_binary(filename)['sentences'], sentences)
+        self.assertEqual(list(binaryformat.iter_binary_sentences(filename)), sentences)
+
+    def test_summary_without_vocabulary_and_sentences(self):
+        textData = make_text_data()
+        filename = self.write(textData, 'binary')
+        summary = binaryformat.load_binary_summary(filename)
+        self.assertEqual(summary, dict((key, value) for key, value in textData.iteritems() if key not in ('vocabulary', 'sentences')))
+        self.assertEqual(binaryformat.load_binary_header(filename), textData['_meta'])
+
+        # The vocabulary has its own section, which is skipped
+        with open(filename, 'rb') as binaryFile:
+            sections = list(binaryformat.iter_sections(binaryFile, decodeTypes=(binaryformat.SECTION_SUMMARY,)))
+        self.assertEqual([sectionType for sectionType, data in sections], [binaryformat.SECTION_HEADER, binaryformat.SECTION_SUMMARY, binaryformat.SECTION_VOCABULARY, binaryformat.SECTION_SENTENCE, binaryformat.SECTION_SENTENCE])
+        self.assertNotIn('vocabulary', sections[1][1])
+        self.assertIsNone(sections[2][1])
+
+    def test_rejects_other_files(self):
+        filename = os.path.join(self.folder, 'other.bin')
+        with open(filename, 'wb') as otherFile:
+            otherFile.write(b'{"sentences": []}')
+        self.assertRaises(ValueError, binaryformat.load_binary, filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
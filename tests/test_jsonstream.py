@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from textlib import jsonstream
+
+
+def make_data():
+    """Return nested data with unicode, escapes,
+    empty containers and numbers of all kinds
+    """
+    return {
+        '_meta' : { 'Filename' : u'straße.txt', 'MD5' : 'd41d8cd98f00b204e9800998ecf8427e', 'analyze_version' : '1.0.2' },
+        'averageWordLength' : 5.123456789,
+        'wordCount' : 1234567890123,
+        'negative' : -0.5e-7,
+        'flags' : [True, False, None],
+        'empty' : {},
+        'emptyList' : [],
+        'quoted' : u'"{[,:]}" \\ \n\t ☃',
+        'readingEase' : [{ 'id' : 'FleschReadingEase', 'value' : 71.2 }, { 'id' : 'WienerSachtextformel', 'value' : 3 }],
+        'sentences' : [
+            { 'sentence' : u'Größe zählt.', 'words' : [{ 'word' : u'Größe', 'syllables' : [u'Grö', u'ße'] }, { 'word' : u'zählt', 'syllables' : [u'zählt'] }] },
+            { 'sentence' : u'日本語のテキスト。', 'words' : [] },
+            { 'sentence' : u'', 'words' : [{ 'word' : u'a', 'syllables' : [] }] }
+        ]
+    }
+
+
+def write(data, arrays=None):
+    fileObject = io.BytesIO()
+    jsonstream.write_json(data, fileObject, arrays=arrays)
+    return fileObject.getvalue()
+
+
+class JsonWriterTest(unittest.TestCase):
+
+    def test_same_as_json_dumps(self):
+        data = make_data()
+        self.assertEqual(write(data), json.dumps(data, indent=4, sort_keys=True))
+
+    def test_empty_object(self):
+        self.assertEqual(write({}), json.dumps({}, indent=4, sort_keys=True))
+
+    def test_arrays_from_iterables(self):
+        data = make_data()
+        sentences = data.pop('sentences')
+        emptyList = data.pop('emptyList')
+        streamed = write(data, arrays={ 'sentences' : iter(sentences), 'emptyList' : iter(emptyList) })
+        data['sentences'] = sentences
+        data['emptyList'] = emptyList
+        self.assertEqual(streamed, json.dumps(data, indent=4, sort_keys=True))
+
+    def test_non_string_keys(self):
+        data = { 'counts' : { 1 : 'one', 2.5 : 'two and a half', True : 'yes', None : 'none' } }
+        self.assertEqual(write(data), json.dumps(data, indent=4, sort_keys=True))
+
+
+class JsonReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = make_data()
+        self.document = json.dumps(self.data, indent=4, sort_keys=True)
+
+    def read_all(self, document, chunkSize):
+        reader = jsonstream.JsonReader(io.BytesIO(document), chunkSize=chunkSize)
+        data = {}
+        for key in reader.iter_keys():
+            if key == 'sentences':
+                data[key] = list(reader.iter_array())
+            else:
+                data[key] = reader.read_value()
+        return data
+
+    def test_tiny_chunks(self):
+        # Chunks split multi-byte characters, numbers, strings and keys
+        for chunkSize in (1, 2, 3, 5, 7):
+            self.assertEqual(self.read_all(self.document, chunkSize), self.data)
+
+    def test_compact_document(self):
+        document = json.dumps(self.data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        for chunkSize in (1, 4):
+            self.assertEqual(self.read_all(document, chunkSize), self.data)
+
+    def test_skip_values(self):
+        reader = jsonstream.JsonReader(io.BytesIO(self.document), chunkSize=3)
+        keys = []
+        for key in reader.iter_keys():
+            keys.append(key)
+            reader.skip_value()
+        self.assertEqual(keys, sorted(self.data))
+
+    def test_invalid_documents(self):
+        for document in ['[1, 2]', '{"a": 1', '{"a" 1}', '']:
+            reader = jsonstream.JsonReader(io.BytesIO(document), chunkSize=2)
+            self.assertRaises(ValueError, lambda: [reader.read_value() for key in reader.iter_keys()])
+
+
+class JsonFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'text_metadata.json')
+        self.data = make_data()
+        with open(self.filename, 'wb') as jsonFile:
+            jsonstream.write_json(self.data, jsonFile)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_load_item(self):
+        self.assertEqual(jsonstream.load_json_item(self.filename, '_meta'), self.data['_meta'])
+        self.assertRaises(KeyError, jsonstream.load_json_item, self.filename, 'missing')
+
+    def test_load_summary(self):
+        summary = jsonstream.load_json_summary(self.filename, skipKeys=('sentences', 'readingEase'))
+        self.assertEqual(summary, dict((key, value) for key, value in self.data.iteritems() if key not in ('sentences', 'readingEase')))
+
+    def test_iter_array(self):
+        self.assertEqual(list(jsonstream.iter_json_array(self.filename, 'sentences')), self.data['sentences'])
+        self.assertEqual(list(jsonstream.iter_json_array(self.filename, 'missing')), [])
+
+    def test_sentence_spool(self):
+        spool = jsonstream.SentenceSpool(directory=self.folder)
+        for sentence in self.data['sentences']:
+            spool.add_sentence(sentence)
+        spool.flush()
+        self.assertEqual(list(spool), self.data['sentences'])
+        self.assertEqual(list(spool), self.data['sentences'])
+        spool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from textlib import analyze, ngrams
+
+
+# Small settings, so the heavy hitters and the sketch
+# actually have to drop and share n-grams
+SIZES = [1, 2]
+CAPACITY = 8
+WIDTH = 64
+DEPTH = 3
+
+WORDS = [u'der', u'die', u'das', u'hund', u'katze', u'läuft', u'schläft', u'über', u'straße', u'haus', u'garten', u'baum']
+
+
+def make_texts(textCount=5, sentenceCount=40, seed=7):
+    """Return a deterministic corpus as list of texts, each a list
+    of sentences, each a list of lower-case words. Word frequencies
+    are skewed, so there are clear heavy hitters.
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in xrange(len(WORDS))]
+    def pick_word():
+        value = rng.random() * sum(weights)
+        for word, weight in zip(WORDS, weights):
+            value -= weight
+            if value < 0:
+                return word
+        return WORDS[-1]
+    return [[[pick_word() for word in xrange(rng.randint(1, 12))] for sentence in xrange(sentenceCount)] for text in xrange(textCount)]
+
+
+def count_exactly(texts):
+    """Return the exact counts of all n-grams, by n
+    """
+    counts = dict((n, {}) for n in SIZES)
+    for text in texts:
+        for words in text:
+            for n in SIZES:
+                for start in xrange(len(words) - n + 1):
+                    ngram = ngrams.NGRAM_SEPARATOR.join(words[start:start + n])
+                    counts[n][ngram] = counts[n].get(ngram, 0) + 1
+    return counts
+
+
+def count_text(text, settings, flushEvery=None):
+    counter = ngrams.NgramCounter(settings)
+    for sentenceIndex, words in enumerate(text):
+        counter.add_words(words)
+        if flushEvery is not None and sentenceIndex % flushEvery == 0:
+            counter.finish()
+    return counter.finish()
+
+
+def make_settings(**kwargs):
+    values = { 'sizes' : SIZES, 'capacity' : CAPACITY, 'width' : WIDTH, 'depth' : DEPTH }
+    values.update(kwargs)
+    return ngrams.NgramSettings(**values)
+
+
+class SketchCountingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.texts = make_texts()
+        self.trueCounts = count_exactly(self.texts)
+        self.settings = make_settings()
+
+    def count_corpus(self):
+        """Count each text separately, like analyze does,
+        and merge them into a folder counter
+        """
+        corpus = ngrams.NgramCounter(self.settings)
+        for text in self.texts:
+            corpus.merge(count_text(text, self.settings, flushEvery=5))
+        return corpus.finish()
+
+    def assertBounds(self, counter):
+        for n in SIZES:
+            rows = list(counter.tables[n].iter_rows())
+            self.assertTrue(0 < len(rows) <= CAPACITY)
+            for ngram, count, error in rows:
+                trueCount = self.trueCounts[n].get(ngram, 0)
+                self.assertTrue(count - error <= trueCount <= count, (ngram, count, error, trueCount))
+
+    def test_heavy_hitter_bounds(self):
+        self.assertBounds(self.count_corpus())
+
+    def test_single_text_bounds(self):
+        counter = count_text(sum(self.texts, []), self.settings, flushEvery=3)
+        self.assertBounds(counter)
+
+    def test_most_frequent_ngrams(self):
+        # The most frequent words are far ahead of the others
+        counter = self.count_corpus()
+        topWords = sorted(self.trueCounts[1].iteritems(), key=lambda item: -item[1])[:2]
+        rows = list(counter.tables[1].iter_rows(topCount=2))
+        self.assertEqual([ngram for ngram, count, error in rows], [word for word, count in topWords])
+
+    def test_sketch_never_too_low(self):
+        counter = self.count_corpus()
+        for n in SIZES:
+            sketch = counter.tables[n].sketch
+            for ngram, trueCount in self.trueCounts[n].iteritems():
+                self.assertTrue(sketch.estimate(ngram) >= trueCount)
+            self.assertEqual(counter.tables[n].total, sum(self.trueCounts[n].itervalues()))
+
+    def test_sketch_merge(self):
+        # Merging sketches gives the same counters as counting everything in one
+        for n in SIZES:
+            counts = self.trueCounts[n]
+            keys = sorted(counts)
+            first = ngrams.CountMinSketch(WIDTH, DEPTH)
+            first.add_counts(dict((key, counts[key]) for key in keys[::2]))
+            second = ngrams.CountMinSketch(WIDTH, DEPTH)
+            second.add_counts(dict((key, counts[key]) for key in keys[1::2]))
+            first.merge(second)
+            whole = ngrams.CountMinSketch(WIDTH, DEPTH)
+            whole.add_counts(counts)
+            self.assertEqual(first.rows, whole.rows)
+            self.assertTrue(isinstance(first.estimate(keys[0]), int))
+        self.assertRaises(ValueError, ngrams.CountMinSketch(WIDTH, DEPTH).merge, ngrams.CountMinSketch(WIDTH * 2, DEPTH))
+
+    def test_exact_counts(self):
+        settings = make_settings(exact=True)
+        corpus = ngrams.NgramCounter(settings)
+        for text in self.texts:
+            corpus.merge(count_text(text, settings))
+        for n in SIZES:
+            rows = list(corpus.tables[n].iter_rows())
+            self.assertEqual(dict((ngram, count) for ngram, count, error in rows), self.trueCounts[n])
+            self.assertEqual(set(error for ngram, count, error in rows), set([0]))
+
+
+class SketchFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.ngramFilePaths = analyze.make_ngram_filenames(os.path.join(self.folder, 'text.txt'))
+        self.settings = make_settings()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, settings):
+        counter = count_text(sum(make_texts(), []), settings)
+        analyze.write_ngram_files(counter, { 'language' : 'de_DE' }, self.ngramFilePaths)
+        return counter
+
+    def test_round_trip(self):
+        counter = self.write(self.settings)
+        loaded = analyze.load_ngram_files(self.ngramFilePaths, self.settings)
+        for n in SIZES:
+            (table, loadedTable) = (counter.tables[n], loaded.tables[n])
+            self.assertEqual(loadedTable.total, table.total)
+            self.assertEqual(loadedTable.sketch.rows, table.sketch.rows)
+            self.assertEqual(loadedTable.heavyHitters.threshold, table.heavyHitters.threshold)
+            self.assertEqual(list(loadedTable.iter_rows()), list(table.iter_rows()))
+
+    def test_round_trip_exact(self):
+        settings = make_settings(exact=True)
+        counter = self.write(settings)
+        loaded = analyze.load_ngram_files(self.ngramFilePaths, settings)
+        for n in SIZES:
+            self.assertEqual(list(loaded.tables[n].iter_rows()), list(counter.tables[n].iter_rows()))
+
+    def test_fewer_sizes(self):
+        self.write(self.settings)
+        loaded = analyze.load_ngram_files(self.ngramFilePaths, make_settings(sizes=[2]))
+        self.assertEqual(sorted(loaded.tables), [2])
+
+    def test_other_settings_are_stale(self):
+        self.write(self.settings)
+        for changedSettings in [
+            make_settings(width=WIDTH * 2),
+            make_settings(depth=DEPTH + 1),
+            make_settings(capacity=CAPACITY * 2),
+            make_settings(exact=True),
+            make_settings(sizes=[2, 3]),
+        ]:
+            self.assertRaises(ValueError, ngrams.load_sketch_file, self.ngramFilePaths[1], changedSettings)
+
+    def test_exact_is_stale_for_sketches(self):
+        self.write(make_settings(exact=True))
+        self.assertRaises(ValueError, ngrams.load_sketch_file, self.ngramFilePaths[1], self.settings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import unittest
+
+from textlib import tokenize
+
+try:
+    import nltk
+except ImportError:
+    nltk = None
+
+
+# Sentences both backends split into the same words
+PLAIN_SENTENCES = [
+    (u'Der Hund läuft über die Straße.', [u'Der', u'Hund', u'läuft', u'über', u'die', u'Straße']),
+    (u'Können Sie mir bitte sagen, wie spät es ist?', [u'Können', u'Sie', u'mir', u'bitte', u'sagen', u'wie', u'spät', u'es', u'ist']),
+    (u'Größere Äpfel schmecken süßer als kleine.', [u'Größere', u'Äpfel', u'schmecken', u'süßer', u'als', u'kleine']),
+    (u'The quick brown fox jumps over the lazy dog.', [u'The', u'quick', u'brown', u'fox', u'jumps', u'over', u'the', u'lazy', u'dog']),
+    (u'Where are you going, and why are you in such a hurry?', [u'Where', u'are', u'you', u'going', u'and', u'why', u'are', u'you', u'in', u'such', u'a', u'hurry']),
+    (u'She sells sea shells; he buys them.', [u'She', u'sells', u'sea', u'shells', u'he', u'buys', u'them']),
+    # Numbers are no words with either backend
+    (u'Es kostet 25 Euro.', [u'Es', u'kostet', u'Euro']),
+]
+
+# Documented differences as (sentence, NLTK words, regex words).
+# NLTK drops tokens that do not consist of letters only,
+# the pattern returns their letter runs as separate words.
+DIFFERENCES = {
+    'digits' : [
+        (u'Der 3D-Drucker läuft.', [u'Der', u'läuft'], [u'Der', u'D', u'Drucker', u'läuft']),
+        (u'Version 2b is ready.', [u'Version', u'is', u'ready'], [u'Version', u'b', u'is', u'ready']),
+    ],
+    'apostrophes' : [
+        # NLTK splits off contractions and drops them
+        (u"We don't know Peter's dog.", [u'We', u'do', u'know', u'Peter', u'dog'], [u'We', u'don', u't', u'know', u'Peter', u's', u'dog']),
+        (u"Gib's mir!", [u'Gib', u'mir'], [u'Gib', u's', u'mir']),
+    ],
+    'hyphenated' : [
+        (u'It is a well-known fact.', [u'It', u'is', u'a', u'fact'], [u'It', u'is', u'a', u'well', u'known', u'fact']),
+        (u'Ich schreibe eine E-Mail.', [u'Ich', u'schreibe', u'eine'], [u'Ich', u'schreibe', u'eine', u'E', u'Mail']),
+    ],
+    'abbreviations' : [
+        (u'Sie kommt z.B. heute.', [u'Sie', u'kommt', u'heute'], [u'Sie', u'kommt', u'z', u'B', u'heute']),
+    ],
+    'underscores' : [
+        (u'Die Datei heißt foo_bar.', [u'Die', u'Datei', u'heißt'], [u'Die', u'Datei', u'heißt', u'foo', u'bar']),
+    ],
+}
+
+
+def get_words(sentence, backend):
+    """Return the words of a sentence, as iter_tokenize_sentences()
+    keeps them for the given tokenizer backend
+    """
+    words = tokenize.tokenize_sentence_to_words(sentence, backend=backend)
+    if backend == 'regex':
+        return words
+    return [word for word in words if tokenize.is_word(word)]
+
+
+class RegexTokenizerTest(unittest.TestCase):
+    """The documented behavior of the "regex" backend. Does not need NLTK.
+    """
+
+    def assertRegexWords(self, kind):
+        for sentence, nltkWords, regexWords in DIFFERENCES[kind]:
+            self.assertEqual(get_words(sentence, 'regex'), regexWords)
+
+    def test_plain_sentences(self):
+        for sentence, words in PLAIN_SENTENCES:
+            self.assertEqual(get_words(sentence, 'regex'), words)
+
+    def test_digits(self):
+        self.assertRegexWords('digits')
+
+    def test_apostrophes(self):
+        self.assertRegexWords('apostrophes')
+
+    def test_hyphenated_words(self):
+        self.assertRegexWords('hyphenated')
+
+    def test_abbreviations(self):
+        self.assertRegexWords('abbreviations')
+
+    def test_underscores(self):
+        self.assertRegexWords('underscores')
+
+    def test_word_pattern(self):
+        # Any run of Unicode letters, without digits and underscores
+        for word in [u'Straße', u'Äpfel', u'naïve', u'Ελλάδα', u'a']:
+            self.assertEqual(tokenize.WORD_PATTERN.findall(word), [word])
+        for token in [u'25', u'_', u'-', u"'", u'.', u'']:
+            self.assertEqual(tokenize.WORD_PATTERN.findall(token), [])
+        self.assertEqual(tokenize.WORD_PATTERN.findall(u'a1b_c-d'), [u'a', u'b', u'c', u'd'])
+
+    def test_invalid_backend(self):
+        self.assertRaises(ValueError, list, tokenize.iter_tokenize_sentences([u'Test.'], backend='spaces'))
+
+
+@unittest.skipIf(nltk is None, 'NLTK is not installed')
+class TokenizerParityTest(unittest.TestCase):
+    """The "nltk" and "regex" word tokenizer backends return the same
+    words for plain sentences, and only differ where README.md says so.
+    """
+
+    def assertNltkWords(self, kind):
+        for sentence, nltkWords, regexWords in DIFFERENCES[kind]:
+            self.assertEqual(get_words(sentence, 'nltk'), nltkWords)
+
+    def test_plain_sentences(self):
+        for sentence, words in PLAIN_SENTENCES:
+            self.assertEqual(get_words(sentence, 'nltk'), get_words(sentence, 'regex'))
+
+    def test_digits(self):
+        self.assertNltkWords('digits')
+
+    def test_apostrophes(self):
+        self.assertNltkWords('apostrophes')
+
+    def test_hyphenated_words(self):
+        self.assertNltkWords('hyphenated')
+
+    def test_abbreviations(self):
+        self.assertNltkWords('abbreviations')
+
+    def test_underscores(self):
+        self.assertNltkWords('underscores')
+
+
+if __name__ == '__main__':
+    unittest.main()
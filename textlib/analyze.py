@@ -1,11 +1,13 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import os, sys
-import csv, json
+import csv
 import time, datetime
-import operator
+import heapq
+import multiprocessing
+import re
 import string
-from textlib import tokenize, readability, hashes, fileoperations
+from textlib import tokenize, readability, hashes, fileoperations, compact, binaryformat, jsonstream, store, vectorized, profiling, pipeline, ngrams
 
 
 ####################################
@@ -17,17 +19,40 @@ from textlib import tokenize, readability, hashes, fileoperations
 # Analyze code version identifier
 # Increase this at will, but note that it *has* to be increased
 # if anything in the analysis or meta header generation changed!
-ANALYZE_VERSION = '1.0.1'
+ANALYZE_VERSION = '1.0.2'
 
 # Suffix added to metadata filenames
 FILESUFFIX_JSON = '_metadata.json'
 
+# Suffix added to binary metadata filenames
+FILESUFFIX_BINARY = '_metadata.bin'
+
 # Suffix added to word table filenames
 FILESUFFIX_CSV = '_wordfrequencies.csv'
 
+# Suffixes added to n-gram table and sketch filenames
+FILESUFFIX_NGRAMS_CSV = '_ngrams.csv'
+FILESUFFIX_NGRAMS_SKETCH = '_ngrams.sketch'
+
+# Suffix added to folder manifest filenames
+FILESUFFIX_MANIFEST = '_manifest.json'
+
 # Decimal places for rounding any float values in files
 DIGITS = 5
 
+# Rows written before the table of a .csv file, and the
+# keys of their values in the '_meta' header
+CSV_HEADER_ROWS = [
+    ('Filename', 'Filename'),
+    ('Folder', 'Folder'),
+    ('Date of Analysis', 'Date of analysis'),
+    ('CRC32 Checksum', 'CRC32'),
+    ('MD5 Hash', 'MD5')
+]
+
+# Language tag in a text filename, e.g. "some_text.en_US.txt"
+FILENAME_LANGUAGE_PATTERN = re.compile(r'\.([a-z]{2,3}_[A-Z]{2})$')
+
 
 ####################################
 #
@@ -46,12 +71,59 @@ def get_datetime_now(dtFormat = '%Y-%m-%d %H:%M'):
 #
 ####################################
 
-def make_metadata_filename(filename):
+def make_metadata_filename(filename, outputFormat='json'):
     """From the .txt file's original filename & path,
-    create the filename & path of the metadata .json file
+    create the filename & path of the metadata .json
+    (or binary .bin) file
     """
     fileBasePath = os.path.splitext(filename)[0]
-    return os.path.join(fileBasePath + FILESUFFIX_JSON)
+    suffix = FILESUFFIX_BINARY if outputFormat == 'binary' else FILESUFFIX_JSON
+    return os.path.join(fileBasePath + suffix)
+
+def write_metadata(textData, filename, outputFormat='json', sentences=None):
+    """Export textData as metadata file in the given format.
+    The file is written incrementally. sentences can be any iterable
+    of sentences (e.g. a jsonstream.SentenceSpool) to write instead
+    of textData['sentences'].
+    """
+    if outputFormat == 'binary':
+        binaryformat.write_binary(textData, filename, sentences=sentences)
+    else:
+        with open(filename, 'wb') as jsonFile:
+            jsonstream.write_json(textData, jsonFile, arrays={ 'sentences' : sentences } if sentences is not None else None)
+
+def load_metadata_header(filename, outputFormat='json'):
+    """Load only the '_meta' header of a metadata file.
+    Nothing after the header is decoded.
+    """
+    if outputFormat == 'binary':
+        return binaryformat.load_binary_header(filename)
+    return jsonstream.load_json_item(filename, '_meta')
+
+def load_metadata_summary(filename, outputFormat='json'):
+    """Load a metadata file without its sentences.
+    The sentences are not kept in memory.
+    """
+    if outputFormat == 'binary':
+        return binaryformat.load_binary_summary(filename)
+    return jsonstream.load_json_summary(filename, skipKeys=('sentences', 'vocabulary'))
+
+def iter_metadata_sentences(filename, outputFormat='json'):
+    """Yield the sentences of a metadata file, one at a time
+    """
+    if outputFormat == 'binary':
+        return binaryformat.iter_binary_sentences(filename)
+    return jsonstream.iter_json_array(filename, 'sentences')
+
+def get_file_language(filename, defaultLang):
+    """Return the language tagged in a text file's name
+    (e.g. "some_text.en_US.txt"), or defaultLang if there is none.
+    """
+    fileBaseName = os.path.splitext(os.path.basename(filename))[0]
+    match = FILENAME_LANGUAGE_PATTERN.search(fileBaseName)
+    if match is None:
+        return defaultLang
+    return match.group(1)
 
 def make_wordtable_filename(filename):
     """From the .txt file's original filename & path,
@@ -60,48 +132,100 @@ def make_wordtable_filename(filename):
     fileBasePath = os.path.splitext(filename)[0]
     return os.path.join(fileBasePath + FILESUFFIX_CSV)
 
-def write_csv(data, filename):
-    """Export data as CSV file
+def make_ngram_filenames(filename):
+    """From the .txt file's original filename & path, create the
+    filenames & paths of the n-gram .csv table and sketch files
     """
-    # Fill meta rows
-    headerRows = []
-    try:
-        headerRows.append(['Filename', data['_meta']['Filename']])
-    except:
-        pass
-    try:
-        headerRows.append(['Folder', data['_meta']['Folder']])
-    except:
-        pass
-    try:
-        headerRows.append(['Date of Analysis', data['_meta']['Date of analysis']])
-    except:
-        pass
-    try:
-        headerRows.append(['CRC32 Checksum', data['_meta']['CRC32']])
-    except:
-        pass
-    try:
-        headerRows.append(['MD5 Hash', data['_meta']['MD5']])
-    except:
-        pass
-
-    # Fill data rows
-    dataRows = [['Word'], ['Count'], ['Frequency']]
-    for dataSet in sorted(data['words'].items(), key=operator.itemgetter(1), reverse=True):
-        dataRows[0].append(dataSet[0].encode('utf-8'))
-        wordData = dataSet[1]
+    fileBasePath = os.path.splitext(filename)[0]
+    return (fileBasePath + FILESUFFIX_NGRAMS_CSV, fileBasePath + FILESUFFIX_NGRAMS_SKETCH)
 
-        dataRows[1].append(int(wordData['count']))
-        dataRows[2].append(round(wordData['frequency'], DIGITS))
+def make_folder_filename(folderPath, suffix):
+    """From a folder path, create the filename & path
+    of a folder-level file, e.g. "texts/_texts_metadata.json"
+    """
+    absPath = os.path.normpath(os.path.abspath(folderPath))
+    pathName = os.path.basename(absPath)
+    return os.path.join(absPath, '_' + pathName + suffix)
 
+def make_csv_header_rows(meta):
+    """Return the meta rows of a .csv file
+    from the values in a '_meta' header
+    """
+    return [[title, meta[key]] for title, key in CSV_HEADER_ROWS if key in meta]
+
+def write_csv(data, filename, topCount=None, minCount=None):
+    """Export a word table as CSV file: meta rows, then one row per
+    word, sorted descending by count (words with the same count are
+    sorted alphabetically, so the order does not depend on how the
+    word table was built). Rows are written one at a time.
+    With topCount, only the topCount most frequent words are written,
+    with minCount only words counted at least minCount times.
+    Frequencies stay relative to all words.
+    """
+    # Fill meta rows
+    headerRows = make_csv_header_rows(data.get('_meta', {}))
+
+    # Select and sort words
+    wordItems = data['words'].iteritems()
+    if minCount is not None:
+        wordItems = (item for item in wordItems if item[1]['count'] >= minCount)
+    sortKey = lambda item: (-item[1]['count'], item[0])
+    if topCount is not None:
+        sortedWordItems = heapq.nsmallest(topCount, wordItems, key=sortKey)
+    else:
+        sortedWordItems = sorted(wordItems, key=sortKey)
 
     # Write file
     with open(filename, 'wb') as csvFile:
         csvWriter = csv.writer(csvFile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
         csvWriter.writerows(headerRows)
         csvWriter.writerow([])
-        csvWriter.writerows(dataRows)
+        csvWriter.writerow(fileoperations.WORDTABLE_COLUMNS)
+        for word, wordData in sortedWordItems:
+            csvWriter.writerow([word.encode('utf-8'), int(wordData['count']), round(wordData['frequency'], DIGITS)])
+
+def write_ngram_csv(ngramCounter, meta, filename, topCount=None):
+    """Export the tables of an ngrams.NgramCounter as CSV file: meta rows,
+    then one row per n-gram, by size and descending by count. Error is
+    the maximum overestimation of the count (0 for exact counts).
+    Frequencies are relative to all n-grams of the same size.
+    With topCount, only the topCount most frequent n-grams per size
+    are written. Rows are written one at a time.
+    """
+    headerRows = make_csv_header_rows(meta)
+    headerRows.append(['N-gram counting', ngramCounter.settings.describe()])
+
+    with open(filename, 'wb') as csvFile:
+        csvWriter = csv.writer(csvFile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csvWriter.writerows(headerRows)
+        csvWriter.writerow([])
+        csvWriter.writerow(fileoperations.NGRAM_TABLE_COLUMNS)
+        for n in ngramCounter.settings.sizes:
+            table = ngramCounter.tables[n]
+            total = float(max(table.total, 1))
+            for ngram, count, error in table.iter_rows(topCount):
+                csvWriter.writerow([n, ngram.encode('utf-8'), count, error, round(count / total, DIGITS)])
+
+def write_ngram_files(ngramCounter, meta, ngramFilePaths):
+    """Write the n-gram .csv table and sketch files of a text.
+    ngramFilePaths is a tuple as returned by make_ngram_filenames().
+    """
+    (tableFilePath, sketchFilePath) = ngramFilePaths
+    write_ngram_csv(ngramCounter, meta, tableFilePath)
+    ngrams.write_sketch_file(ngramCounter, sketchFilePath)
+
+def load_ngram_files(ngramFilePaths, ngramSettings):
+    """Load the n-gram files of a text written by write_ngram_files().
+    Return an ngrams.NgramCounter. Raise ValueError if the n-grams
+    were not counted with the same settings.
+    """
+    (tableFilePath, sketchFilePath) = ngramFilePaths
+    ngramCounter = ngrams.load_sketch_file(sketchFilePath, ngramSettings)
+    tables = ngramCounter.tables
+    for n, ngram, count, error, frequency in fileoperations.iter_ngram_csv(tableFilePath):
+        if n in tables:
+            tables[n].add_row(ngram, count, error)
+    return ngramCounter
 
 
 ####################################
@@ -116,69 +240,160 @@ def count_punctuation(sentence):
     count = lambda l1, l2: len(list(filter(lambda c: c in l2, l1)))
     return count(sentence, string.punctuation)
 
-def compute_metadata(textData):
-    """Parse textData dictionary and compute the additional metadata.
-    The resulting metadata will be inserted into the dictionary.
+class Vocabulary():
+    """Table of the distinct words of a text. The features of each
+    word are computed once, when it first occurs, and stored as tuple:
+
+    (vocabulary id, CRC32, char count, syllable count,
+     average syllable length, lower-case word)
+
+    Words are keyed by their exact spelling, so a vocabulary must
+    only be used for texts of one language.
     """
-    # Total counters for whole text
-    totalSyllableCountPerText = 0
-    totalWordCountPerText = 0
-    totalCharCountPerText = 0
-    totalPunctuationCountPerText = 0
-    totalMaxPunctuationCountPerSentence = 0
-    totalMaxPunctuationCountPerSentence_sentence = ''
-    maxWordCountPerSentence = 0
-    totalMaxSyllableCountPerWord = 0
-    totalMaxSyllableCountPerWord_word = ''
-
-    # Iterate sentences
-    for sentence in textData['sentences']:
 
-        # TODO: This is zero sometimes, even though the sentence is not empty. Why?
-        if len(sentence['words']) == 0:
-            continue
+    def __init__(self):
+        self.entries = {}
+        self.words = []
+
+    def lookup(self, word, syllables):
+        """Return the feature tuple of a word,
+        adding the word if it is not known yet
+        """
+        entry = self.entries.get(word)
+        if entry is None:
+            syllableCount = len(syllables)
+            charCount = len(word)
+            entry = (
+                len(self.words),
+                hashes.get_string_crc32(word.encode('utf-8')),
+                charCount,
+                syllableCount,
+                round(float(charCount) / float(syllableCount), DIGITS),
+                word.lower()
+            )
+            self.entries[word] = entry
+            self.words.append((word, list(syllables)))
+        return entry
+
+    def __len__(self):
+        return len(self.words)
+
+    def to_list(self):
+        """Return all words with their features as list of
+        dictionaries, in the order of their vocabulary ids
+        """
+        vocabulary = []
+        for word, syllables in self.words:
+            (vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength, wordLower) = self.entries[word]
+            vocabulary.append({
+                'id' : vocabularyId,
+                'word' : word,
+                'syllables' : syllables,
+                'syllableCount' : syllableCount,
+                'charCount' : charCount,
+                'crc32' : wordCrc32,
+                'averageSyllableLength' : averageSyllableLength
+            })
+        return vocabulary
+
+
+class MetadataAccumulator():
+    """Computes the metadata of a text from its sentences,
+    one sentence at a time. Per-word metadata is looked up
+    in a Vocabulary. With vocabularyIds, words only reference
+    their vocabulary entry, and finish() inserts the vocabulary
+    into textData.
+    """
 
+    def __init__(self, vocabularyIds=False):
+        self.vocabulary = Vocabulary()
+        self.vocabularyIds = vocabularyIds
+
+        # Total counters for whole text
+        self.sentenceCount = 0
+        self.totalSyllableCountPerText = 0
+        self.totalWordCountPerText = 0
+        self.totalCharCountPerText = 0
+        self.totalPunctuationCountPerText = 0
+        self.totalMaxPunctuationCountPerSentence = 0
+        self.totalMaxPunctuationCountPerSentence_sentence = ''
+        self.maxWordCountPerSentence = 0
+        self.maxWordCountPerSentence_sentence = ''
+        self.totalMaxSyllableCountPerWord = 0
+        self.totalMaxSyllableCountPerWord_word = ''
+
+    def add_words(self, words):
+        """Compute the metadata of the words of a sentence.
+        The resulting metadata will be inserted into the word dictionaries.
+        Return the sentence's syllable count, char count, and the
+        maximum syllable count per word together with that word's CRC32.
+        """
         # Total counters for whole sentence
         totalSyllableCountPerSentence = 0
         totalCharCountPerSentence = 0
         maxSyllableCountPerWord = 0
         maxSyllableCountPerWord_word = ''
 
+        lookup = self.vocabulary.lookup
+
         # Iterate words
-        for word in sentence['words']:
+        for word in words:
 
             # Iterate syllables
             # for syllable in word['syllables']:
             #     pass
 
-            # Compute data
-            syllableCount = len(word['syllables'])
-            charCount = len(word['word'])
-            word['syllableCount'] = syllableCount
-            word['charCount'] = charCount
-            word['crc32'] = hashes.get_string_crc32(word['word'].encode('utf-8'))
-            word['averageSyllableLength'] = round(float(charCount) / float(syllableCount), DIGITS)
+            # Look up data
+            (vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength, wordLower) = lookup(word['word'], word['syllables'])
+            self.insert_word_data(word, vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength)
             totalSyllableCountPerSentence += syllableCount
             # Sentence-local max syllable count
             if syllableCount > maxSyllableCountPerWord:
                 maxSyllableCountPerWord = syllableCount
-                maxSyllableCountPerWord_word = word['crc32']
+                maxSyllableCountPerWord_word = wordCrc32
             # Total max syllable count
-            if syllableCount > totalMaxSyllableCountPerWord:
-                totalMaxSyllableCountPerWord = syllableCount
-                totalMaxSyllableCountPerWord_word = word['crc32']
+            if syllableCount > self.totalMaxSyllableCountPerWord:
+                self.totalMaxSyllableCountPerWord = syllableCount
+                self.totalMaxSyllableCountPerWord_word = wordCrc32
             totalCharCountPerSentence += charCount
 
+        return (totalSyllableCountPerSentence, totalCharCountPerSentence, maxSyllableCountPerWord, maxSyllableCountPerWord_word)
+
+    def insert_word_data(self, word, vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength):
+        """Insert the metadata of a word into its dictionary,
+        or only its vocabulary id if vocabularyIds is set
+        """
+        if self.vocabularyIds:
+            word['vocabularyId'] = vocabularyId
+            del word['syllables']
+        else:
+            word['syllableCount'] = syllableCount
+            word['charCount'] = charCount
+            word['crc32'] = wordCrc32
+            word['averageSyllableLength'] = averageSyllableLength
+
+    def add_sentence(self, sentence):
+        """Compute the metadata of a sentence and its words.
+        The resulting metadata will be inserted into the sentence dictionary.
+        """
+        self.sentenceCount += 1
+
+        # TODO: This is zero sometimes, even though the sentence is not empty. Why?
+        if len(sentence['words']) == 0:
+            return
+
+        (totalSyllableCountPerSentence, totalCharCountPerSentence, maxSyllableCountPerWord, maxSyllableCountPerWord_word) = self.add_words(sentence['words'])
+
         # CRC32 checksum
         sentence['crc32'] = hashes.get_string_crc32(sentence['sentence'].encode('utf-8'))
 
         # Punctuation count
         punctuationCount = count_punctuation(sentence['sentence'])
         sentence['punctuationCount'] = punctuationCount
-        if punctuationCount > totalMaxPunctuationCountPerSentence:
-            totalMaxPunctuationCountPerSentence = punctuationCount
-            totalMaxPunctuationCountPerSentence_sentence = sentence['crc32']
-        totalPunctuationCountPerText += punctuationCount
+        if punctuationCount > self.totalMaxPunctuationCountPerSentence:
+            self.totalMaxPunctuationCountPerSentence = punctuationCount
+            self.totalMaxPunctuationCountPerSentence_sentence = sentence['crc32']
+        self.totalPunctuationCountPerText += punctuationCount
 
         # Char count
         sentence['charCount'] = totalCharCountPerSentence
@@ -186,90 +401,196 @@ def compute_metadata(textData):
         # Word count
         wordCount = len(sentence['words'])
         sentence['wordCount'] = wordCount
-        if wordCount > maxWordCountPerSentence:
-            maxWordCountPerSentence = wordCount
-            maxWordCountPerSentence_sentence = sentence['crc32']
-        totalWordCountPerText += wordCount
+        if wordCount > self.maxWordCountPerSentence:
+            self.maxWordCountPerSentence = wordCount
+            self.maxWordCountPerSentence_sentence = sentence['crc32']
+        self.totalWordCountPerText += wordCount
 
         # Syllables
         sentence['averageSyllablesPerWord'] = round(float(totalSyllableCountPerSentence) / float(wordCount), DIGITS)
         sentence['averageSyllableLength'] = round(float(totalCharCountPerSentence) / float(totalSyllableCountPerSentence), DIGITS)
-        totalSyllableCountPerText += totalSyllableCountPerSentence
+        self.totalSyllableCountPerText += totalSyllableCountPerSentence
         sentence['maxSyllableCountPerWord'] = { 'word' : maxSyllableCountPerWord_word, 'count' : maxSyllableCountPerWord }
 
         # Word length
         sentence['averageWordLength'] = round(float(totalCharCountPerSentence) / float(wordCount), DIGITS)
-        totalCharCountPerText += totalCharCountPerSentence
-
-    sentenceCount = len(textData['sentences'])
-    textData['sentenceCount'] = sentenceCount
-    textData['wordCount'] = totalWordCountPerText
-    textData['charCount'] = totalCharCountPerText
-    textData['punctuationCount'] = totalPunctuationCountPerText
-    textData['maxPunctuationCountPerSentence'] = { 'sentence' : totalMaxPunctuationCountPerSentence_sentence, 'count' : totalMaxPunctuationCountPerSentence }
-    textData['maxWordCountPerSentence'] = { 'sentence' : maxWordCountPerSentence_sentence, 'count' : maxWordCountPerSentence }
-    textData['maxSyllableCountPerWord'] = { 'word' : totalMaxSyllableCountPerWord_word, 'count' : totalMaxSyllableCountPerWord }
-    textData['averageWordsPerSentence'] = round(float(totalWordCountPerText) / float(sentenceCount), DIGITS)
-    textData['averageSyllablesPerWord'] = round(float(totalSyllableCountPerText) / float(totalWordCountPerText), DIGITS)
-    textData['averageSyllableLength'] = round(float(totalSyllableCountPerText) / float(totalCharCountPerText), DIGITS)
-    textData['averageWordLength'] = round(float(totalCharCountPerText) / float(totalWordCountPerText), DIGITS)
-    textData['averagePunctuationPerSentence'] = round(float(totalPunctuationCountPerText) / float(sentenceCount), DIGITS)
-
-def metadata_header(filename, text, language):
+        self.totalCharCountPerText += totalCharCountPerSentence
+
+    def add_compact_text(self, compactText):
+        """Update the text-level totals from the columns of a CompactText,
+        without computing per-sentence and per-word metadata.
+        """
+        words = compactText.words
+        wordIds = compactText.tokenWordIds
+        syllableCounts = compactText.tokenSyllableCounts
+        charCounts = compactText.tokenCharCounts
+        offsets = compactText.sentenceOffsets
+
+        # Iterate sentences
+        for sentenceIndex, sentence in enumerate(compactText.sentences):
+            self.sentenceCount += 1
+
+            start = offsets[sentenceIndex]
+            end = offsets[sentenceIndex + 1]
+            wordCount = end - start
+            if wordCount == 0:
+                continue
+
+            # Syllables
+            sentenceSyllableCounts = syllableCounts[start:end]
+            maxSyllableCountPerWord = max(sentenceSyllableCounts)
+            if maxSyllableCountPerWord > self.totalMaxSyllableCountPerWord:
+                tokenIndex = start + sentenceSyllableCounts.index(maxSyllableCountPerWord)
+                self.totalMaxSyllableCountPerWord = maxSyllableCountPerWord
+                self.totalMaxSyllableCountPerWord_word = hashes.get_string_crc32(words[wordIds[tokenIndex]].encode('utf-8'))
+            self.totalSyllableCountPerText += sum(sentenceSyllableCounts)
+
+            # Punctuation count
+            punctuationCount = count_punctuation(sentence)
+            if punctuationCount > self.totalMaxPunctuationCountPerSentence:
+                self.totalMaxPunctuationCountPerSentence = punctuationCount
+                self.totalMaxPunctuationCountPerSentence_sentence = hashes.get_string_crc32(sentence.encode('utf-8'))
+            self.totalPunctuationCountPerText += punctuationCount
+
+            # Word count
+            if wordCount > self.maxWordCountPerSentence:
+                self.maxWordCountPerSentence = wordCount
+                self.maxWordCountPerSentence_sentence = hashes.get_string_crc32(sentence.encode('utf-8'))
+            self.totalWordCountPerText += wordCount
+
+            # Char count
+            self.totalCharCountPerText += sum(charCounts[start:end])
+
+    def finish(self, textData):
+        """Compute the text-level metadata from all added sentences.
+        The resulting metadata will be inserted into textData.
+        """
+        sentenceCount = self.sentenceCount
+        textData['sentenceCount'] = sentenceCount
+        textData['wordCount'] = self.totalWordCountPerText
+        textData['syllableCount'] = self.totalSyllableCountPerText
+        textData['charCount'] = self.totalCharCountPerText
+        textData['punctuationCount'] = self.totalPunctuationCountPerText
+        textData['maxPunctuationCountPerSentence'] = { 'sentence' : self.totalMaxPunctuationCountPerSentence_sentence, 'count' : self.totalMaxPunctuationCountPerSentence }
+        textData['maxWordCountPerSentence'] = { 'sentence' : self.maxWordCountPerSentence_sentence, 'count' : self.maxWordCountPerSentence }
+        textData['maxSyllableCountPerWord'] = { 'word' : self.totalMaxSyllableCountPerWord_word, 'count' : self.totalMaxSyllableCountPerWord }
+        textData['averageWordsPerSentence'] = round(float(self.totalWordCountPerText) / float(sentenceCount), DIGITS)
+        textData['averageSyllablesPerWord'] = round(float(self.totalSyllableCountPerText) / float(self.totalWordCountPerText), DIGITS)
+        textData['averageSyllableLength'] = round(float(self.totalSyllableCountPerText) / float(self.totalCharCountPerText), DIGITS)
+        textData['averageWordLength'] = round(float(self.totalCharCountPerText) / float(self.totalWordCountPerText), DIGITS)
+        textData['averagePunctuationPerSentence'] = round(float(self.totalPunctuationCountPerText) / float(sentenceCount), DIGITS)
+        if self.vocabularyIds:
+            textData['vocabulary'] = self.vocabulary.to_list()
+
+def compute_metadata(textData):
+    """Parse textData dictionary and compute the additional metadata.
+    The resulting metadata will be inserted into the dictionary.
+    """
+    metadata = MetadataAccumulator()
+    for sentence in textData['sentences']:
+        metadata.add_sentence(sentence)
+    metadata.finish(textData)
+
+def metadata_header(filename, text, language, digests=None, tokenizer='nltk'):
     """Create header dataset with some basic info.
+    tokenizer is the word tokenizer backend the text was analyzed with.
+    digests is a dictionary with the file's CRC32 and MD5 digests
+    as returned by hashes.get_bytes_digests(). If it is None,
+    the digests are computed from the file.
     """
     # Current date & time
     nowStr = get_datetime_now()
 
+    # Checksums
+    if digests is None:
+        digests = hashes.get_file_digests(filename)
+
     meta = {
         'Filename' : fileoperations.shorten_filename(filename),
-        'MD5' : hashes.get_file_md5(filename),
-        'CRC32' : hashes.get_file_crc32(filename),
+        'MD5' : digests['MD5'],
+        'CRC32' : digests['CRC32'],
         'Date of analysis' : nowStr,
         'analyze_version' : ANALYZE_VERSION,
-        'language' : language
+        'language' : language,
+        'tokenizer' : tokenizer
     }
 
     return meta
 
-def compute_word_table(textData):
-    """Traverse textData dictionary and compute a table
-    with occurring words, their absolute quanitities and
-    their relative frequencies.
+class WordTableAccumulator():
+    """Counts the words of a text,
+    one sentence at a time.
     """
-    wordTable = {}
 
-    # Iterate sentences
-    for sentence in textData['sentences']:
-        # Iterate words in sentence
+    def __init__(self):
+        self.wordCounts = {}
+
+    def add_sentence(self, sentence):
+        """Update word counts with the words in a sentence
+        """
+        wordCounts = self.wordCounts
         for word in sentence['words']:
             # Make word lower-case
             wordStr = word['word'].lower()
             # Update word count in table
-            count = wordTable.get(wordStr, {}).get('count', 0)
+            wordCounts[wordStr] = wordCounts.get(wordStr, 0) + 1
+
+    def add_compact_text(self, compactText):
+        """Update word counts with the words of a CompactText
+        """
+        # Count tokens per interned word
+        idCounts = [0] * len(compactText.words)
+        for wordId in compactText.tokenWordIds:
+            idCounts[wordId] += 1
+
+        # Interned words are in order of first occurrence,
+        # so this adds words in the same order as add_sentence()
+        wordCounts = self.wordCounts
+        for word, count in zip(compactText.words, idCounts):
+            wordStr = word.lower()
+            wordCounts[wordStr] = wordCounts.get(wordStr, 0) + count
+
+    def add_word_table(self, wordTable):
+        """Update word counts with the counts of a word table
+        in the layout returned by compute_word_table()
+        """
+        wordCounts = self.wordCounts
+        for wordStr, valueDict in wordTable['words'].iteritems():
+            wordCounts[wordStr] = wordCounts.get(wordStr, 0) + valueDict['count']
+
+    def total_word_count(self):
+        """Return the sum of all word counts
+        """
+        return sum(self.wordCounts.itervalues())
+
+    def finish(self, totalWordCount):
+        """Return the word table with absolute counts
+        and relative frequencies of all added words.
+        The accumulator must not be used any more afterwards.
+        """
+        # Replace counts in place, keeping the table's iteration order
+        wordTable = self.wordCounts
+        for wordStr, count in wordTable.items():
             wordTable[wordStr] = {
-                'count' : int(count + 1),
-                'frequency' : float(0.0)
+                'count' : count,
+                'frequency' : float(count) / float(totalWordCount)
             }
 
-    # Calculate relative word frequencies
-    totalWordCount = textData['wordCount']
-    for key, valueDict in wordTable.iteritems():
-        # Value is now a tuple with the value and the relative value
-        # TODO: Use child Dict, not a stupid Tuple!
-        #       That will also make the CSV export easier!
-        #wordTable[key] = (value, float(value) / float(wordCount))
-        count = valueDict['count']
-        wordTable[key] = {
-            'count' : count,
-            'frequency' : float(count) / float(totalWordCount)
+        resultTable = {
+            'words' : wordTable,
         }
 
-    resultTable = {
-        'words' : wordTable,
-    }
+        return resultTable
 
-    return resultTable
+def compute_word_table(textData):
+    """Traverse textData dictionary and compute a table
+    with occurring words, their absolute quanitities and
+    their relative frequencies.
+    """
+    wordTable = WordTableAccumulator()
+    for sentence in textData['sentences']:
+        wordTable.add_sentence(sentence)
+    return wordTable.finish(textData['wordCount'])
 
 
 ####################################
@@ -278,66 +599,330 @@ def compute_word_table(textData):
 #
 ####################################
 
-def compute_reading_ease_indices(textData):
-    """Traverse textData and compute all
-    readability / reading ease indices.
+class ReadabilityAccumulator():
+    """Counts words with special properties for the
+    readability indices, one sentence at a time.
+    The sentence's metadata must already be computed.
     """
-    DIGITS = 5
 
-    # Input data
-    wordCount = textData['wordCount']
-    sentenceCount = textData['sentenceCount']
-    asl = textData['averageWordsPerSentence']
-    asw = textData['averageSyllablesPerWord']
+    def __init__(self):
+        self.words_with_at_least_6_letters = 0
+        self.words_with_at_least_3_syllables = 0
+        self.words_with_only_one_syllable = 0
 
-    # Count words with special properties
-    words_with_at_least_6_letters = 0
-    words_with_at_least_3_syllables = 0
-    words_with_only_one_syllable = 0
-    for sentence in textData['sentences']:
+    def add_sentence(self, sentence):
+        """Update counters with the words in a sentence
+        """
         for word in sentence['words']:
             # Words with at least 6 letters
             if word['charCount'] >= 6:
-                words_with_at_least_6_letters += 1
+                self.words_with_at_least_6_letters += 1
             # Words with at least 3 syllables
             syllableCount = word['syllableCount']
             if syllableCount >= 3:
-                words_with_at_least_3_syllables += 1
+                self.words_with_at_least_3_syllables += 1
             # Words with only one syllable
             if syllableCount == 1:
+                self.words_with_only_one_syllable += 1
+
+    def add_compact_text(self, compactText):
+        """Update counters with the words of a CompactText
+        """
+        self.words_with_at_least_6_letters += sum(1 for charCount in compactText.tokenCharCounts if charCount >= 6)
+        for syllableCount in compactText.tokenSyllableCounts:
+            if syllableCount >= 3:
+                self.words_with_at_least_3_syllables += 1
+            elif syllableCount == 1:
+                self.words_with_only_one_syllable += 1
+
+    def finish(self, textData):
+        """Compute all readability / reading ease indices
+        from the counters and the text-level metadata in textData.
+        """
+        DIGITS = 5
+
+        # Input data
+        wordCount = textData['wordCount']
+        sentenceCount = textData['sentenceCount']
+        asl = textData['averageWordsPerSentence']
+        asw = textData['averageSyllablesPerWord']
+
+        # Words with special properties
+        words_with_at_least_6_letters = self.words_with_at_least_6_letters
+        words_with_at_least_3_syllables = self.words_with_at_least_3_syllables
+        words_with_only_one_syllable = self.words_with_only_one_syllable
+
+        # Compute Flesch-Reading-Ease
+        fre = readability.compute_flesch_reading_ease(asl=asl, asw=asw)
+        frea = readability.assess_flesch_reading_ease(fre)
+
+        # Flesch-Kincaid Grade Level
+        fkgl = readability.compute_flesch_kincaid_grade_level(asl=asl, asw=asw)
+
+        # Compute Gunning-Fog Index
+        gfi = readability.compute_gunning_fog_index(w=wordCount, s=sentenceCount, d=words_with_at_least_3_syllables)
+
+        # Compute Wiener Sachtextformel
+        ms = (wordCount / words_with_at_least_3_syllables) if words_with_at_least_3_syllables != 0 else 0.0
+        iw = (wordCount / words_with_at_least_6_letters) if words_with_at_least_6_letters != 0 else 0.0
+        es = (wordCount / words_with_only_one_syllable) if words_with_only_one_syllable != 0 else 0.0
+        (wsf1, wsf2, wsf3, wsf4) = readability.compute_wiener_sachtextformel(MS=ms, SL=asl, IW=iw, ES=es)
+
+        # All results go into the dict
+        results = [
+            { 'id' : 'words_with_6_letters', 'name' : 'Words with at least 6 letters' , 'value' : words_with_at_least_6_letters},
+            { 'id' : 'words_with_at_least_3_syllables', 'name' : 'Words with at least 3 syllables' , 'value' : words_with_at_least_3_syllables},
+            { 'id' : 'words_with_only_one_syllable', 'name' : 'Words with only one syllable' , 'value' : words_with_only_one_syllable},
+            { 'id' : 'fre', 'name' : 'Flesch-Reading-Ease (DE)' , 'value' : round(fre, DIGITS)},
+            { 'id' : 'frea', 'name' : 'Flesch-Reading-Ease (DE) Assessment' , 'value' : frea},
+            { 'id' : 'fkgl', 'name' : 'Flesch-Kincaid Grade Level (US)' , 'value' : round(fkgl, DIGITS)},
+            { 'id' : 'gfi', 'name' : 'Gunning-Fog Index (US)' , 'value' : round(gfi, DIGITS)},
+            { 'id' : 'wsf1', 'name' : 'Erste Wiener Sachtextformel (DE)' , 'value' : round(wsf1, DIGITS)},
+            { 'id' : 'wsf2', 'name' : 'Zweite Wiener Sachtextformel (DE)' , 'value' : round(wsf2, DIGITS)},
+            { 'id' : 'wsf3', 'name' : 'Dritte Wiener Sachtextformel (DE)' , 'value' : round(wsf3, DIGITS)},
+            { 'id' : 'wsf4', 'name' : 'Vierte Wiener Sachtextformel (DE)' , 'value' : round(wsf4, DIGITS)},
+        ]
+        return results
+
+def compute_reading_ease_indices(textData):
+    """Traverse textData and compute all
+    readability / reading ease indices.
+    """
+    readingEase = ReadabilityAccumulator()
+    for sentence in textData['sentences']:
+        readingEase.add_sentence(sentence)
+    return readingEase.finish(textData)
+
+
+####################################
+#
+# Single-pass analysis
+#
+####################################
+
+class TextAnalyzer(MetadataAccumulator):
+    """Computes metadata, word table and readability counters
+    in a single traversal of each sentence's words.
+    Results are identical to compute_metadata(), compute_word_table()
+    and compute_reading_ease_indices().
+    With ngramSettings (an ngrams.NgramSettings), the n-grams of
+    each sentence are counted, too.
+    """
+
+    def __init__(self, vocabularyIds=False, ngramSettings=None):
+        MetadataAccumulator.__init__(self, vocabularyIds=vocabularyIds)
+        self.wordTable = WordTableAccumulator()
+        self.readingEase = ReadabilityAccumulator()
+        self.ngrams = ngrams.NgramCounter(ngramSettings) if ngramSettings is not None else None
+
+    def add_words(self, words):
+        """Compute the metadata of the words of a sentence,
+        and update word counts and readability counters.
+        """
+        # Total counters for whole sentence
+        totalSyllableCountPerSentence = 0
+        totalCharCountPerSentence = 0
+        maxSyllableCountPerWord = 0
+        maxSyllableCountPerWord_word = ''
+
+        # Readability counters for whole sentence
+        words_with_at_least_6_letters = 0
+        words_with_at_least_3_syllables = 0
+        words_with_only_one_syllable = 0
+
+        # Local references for speed
+        wordCounts = self.wordTable.wordCounts
+        lookup = self.vocabulary.lookup
+        insertWordData = self.insert_word_data
+        totalMaxSyllableCountPerWord = self.totalMaxSyllableCountPerWord
+        totalMaxSyllableCountPerWord_word = self.totalMaxSyllableCountPerWord_word
+
+        # Iterate words
+        for word in words:
+            # Look up data
+            (vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength, wordLower) = lookup(word['word'], word['syllables'])
+            insertWordData(word, vocabularyId, wordCrc32, charCount, syllableCount, averageSyllableLength)
+            totalSyllableCountPerSentence += syllableCount
+            # Sentence-local max syllable count
+            if syllableCount > maxSyllableCountPerWord:
+                maxSyllableCountPerWord = syllableCount
+                maxSyllableCountPerWord_word = wordCrc32
+            # Total max syllable count
+            if syllableCount > totalMaxSyllableCountPerWord:
+                totalMaxSyllableCountPerWord = syllableCount
+                totalMaxSyllableCountPerWord_word = wordCrc32
+            totalCharCountPerSentence += charCount
+
+            # Word table
+            wordCounts[wordLower] = wordCounts.get(wordLower, 0) + 1
+
+            # Readability
+            if charCount >= 6:
+                words_with_at_least_6_letters += 1
+            if syllableCount >= 3:
+                words_with_at_least_3_syllables += 1
+            elif syllableCount == 1:
                 words_with_only_one_syllable += 1
 
-    # Compute Flesch-Reading-Ease
-    fre = readability.compute_flesch_reading_ease(asl=asl, asw=asw)
-    frea = readability.assess_flesch_reading_ease(fre)
-
-    # Flesch-Kincaid Grade Level
-    fkgl = readability.compute_flesch_kincaid_grade_level(asl=asl, asw=asw)
-
-    # Compute Gunning-Fog Index
-    gfi = readability.compute_gunning_fog_index(w=wordCount, s=sentenceCount, d=words_with_at_least_3_syllables)
-
-    # Compute Wiener Sachtextformel
-    ms = (wordCount / words_with_at_least_3_syllables) if words_with_at_least_3_syllables != 0 else 0.0
-    iw = (wordCount / words_with_at_least_6_letters) if words_with_at_least_6_letters != 0 else 0.0
-    es = (wordCount / words_with_only_one_syllable) if words_with_only_one_syllable != 0 else 0.0
-    (wsf1, wsf2, wsf3, wsf4) = readability.compute_wiener_sachtextformel(MS=ms, SL=asl, IW=iw, ES=es)
-
-    # All results go into the dict
-    results = [
-        { 'id' : 'words_with_6_letters', 'name' : 'Words with at least 6 letters' , 'value' : words_with_at_least_6_letters},
-        { 'id' : 'words_with_at_least_3_syllables', 'name' : 'Words with at least 3 syllables' , 'value' : words_with_at_least_3_syllables},
-        { 'id' : 'words_with_only_one_syllable', 'name' : 'Words with only one syllable' , 'value' : words_with_only_one_syllable},
-        { 'id' : 'fre', 'name' : 'Flesch-Reading-Ease (DE)' , 'value' : round(fre, DIGITS)},
-        { 'id' : 'frea', 'name' : 'Flesch-Reading-Ease (DE) Assessment' , 'value' : frea},
-        { 'id' : 'fkgl', 'name' : 'Flesch-Kincaid Grade Level (US)' , 'value' : round(fkgl, DIGITS)},
-        { 'id' : 'gfi', 'name' : 'Gunning-Fog Index (US)' , 'value' : round(gfi, DIGITS)},
-        { 'id' : 'wsf1', 'name' : 'Erste Wiener Sachtextformel (DE)' , 'value' : round(wsf1, DIGITS)},
-        { 'id' : 'wsf2', 'name' : 'Zweite Wiener Sachtextformel (DE)' , 'value' : round(wsf2, DIGITS)},
-        { 'id' : 'wsf3', 'name' : 'Dritte Wiener Sachtextformel (DE)' , 'value' : round(wsf3, DIGITS)},
-        { 'id' : 'wsf4', 'name' : 'Vierte Wiener Sachtextformel (DE)' , 'value' : round(wsf4, DIGITS)},
-    ]
-    return results
+        self.totalMaxSyllableCountPerWord = totalMaxSyllableCountPerWord
+        self.totalMaxSyllableCountPerWord_word = totalMaxSyllableCountPerWord_word
+
+        # N-grams of the lower-case words
+        if self.ngrams is not None:
+            entries = self.vocabulary.entries
+            self.ngrams.add_words([entries[word['word']][5] for word in words])
+
+        readingEase = self.readingEase
+        readingEase.words_with_at_least_6_letters += words_with_at_least_6_letters
+        readingEase.words_with_at_least_3_syllables += words_with_at_least_3_syllables
+        readingEase.words_with_only_one_syllable += words_with_only_one_syllable
+
+        return (totalSyllableCountPerSentence, totalCharCountPerSentence, maxSyllableCountPerWord, maxSyllableCountPerWord_word)
+
+    def finish(self, textData):
+        """Insert the text-level metadata and the readability
+        indices into textData, and return the word table.
+        If n-grams are counted, the word table contains
+        the ngrams.NgramCounter as 'ngrams'.
+        """
+        MetadataAccumulator.finish(self, textData)
+        textData['readingEase'] = self.readingEase.finish(textData)
+        wordTable = self.wordTable.finish(textData['wordCount'])
+        if self.ngrams is not None:
+            wordTable['ngrams'] = self.ngrams.finish()
+        return wordTable
+
+def analyze_text_data(textData, vocabularyIds=False, ngramSettings=None):
+    """Compute metadata, word table and readability indices
+    of a tokenized text in a single traversal.
+    Metadata and readability indices are inserted into textData,
+    the word table is returned.
+    With vocabularyIds, words only reference their entry in
+    textData['vocabulary'] instead of carrying their own metadata.
+    ngramSettings is passed to TextAnalyzer.
+    """
+    analyzer = TextAnalyzer(vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+    for sentence in textData['sentences']:
+        analyzer.add_sentence(sentence)
+    return analyzer.finish(textData)
+
+
+####################################
+#
+# Corpus aggregation
+#
+####################################
+
+# Maximum values in textData, and the key of the
+# sentence or word they refer to
+MAXIMUM_KEYS = [
+    ('maxPunctuationCountPerSentence', 'sentence'),
+    ('maxWordCountPerSentence', 'sentence'),
+    ('maxSyllableCountPerWord', 'word')
+]
+
+# Readability counters in textData['readingEase']
+# and the ReadabilityAccumulator attributes they belong to
+READABILITY_COUNTERS = [
+    ('words_with_6_letters', 'words_with_at_least_6_letters'),
+    ('words_with_at_least_3_syllables', 'words_with_at_least_3_syllables'),
+    ('words_with_only_one_syllable', 'words_with_only_one_syllable')
+]
+
+class CorpusAccumulator():
+    """Mergeable statistics of a corpus of texts: counts and sums,
+    maxima (with the file they occur in), and readability counters.
+    Texts are added from their textData, which does not need
+    to contain sentences, so cached metadata can be added, too.
+    """
+
+    def __init__(self):
+        self.fileCount = 0
+        self.sentenceCount = 0
+        self.wordCount = 0
+        self.syllableCount = 0
+        self.charCount = 0
+        self.punctuationCount = 0
+        self.maxima = dict((key, { refKey : '', 'count' : 0, 'file' : '' }) for key, refKey in MAXIMUM_KEYS)
+        self.readingEase = ReadabilityAccumulator()
+
+    def add_text_data(self, textData):
+        """Add the summary of a text's textData
+        """
+        other = CorpusAccumulator()
+        other.fileCount = 1
+        other.sentenceCount = textData['sentenceCount']
+        other.wordCount = textData['wordCount']
+        other.syllableCount = textData['syllableCount']
+        other.charCount = textData['charCount']
+        other.punctuationCount = textData['punctuationCount']
+
+        filename = textData.get('_meta', {}).get('Filename', '')
+        for key, refKey in MAXIMUM_KEYS:
+            other.maxima[key] = {
+                refKey : textData[key][refKey],
+                'count' : textData[key]['count'],
+                'file' : filename
+            }
+
+        readingEase = dict((result['id'], result['value']) for result in textData['readingEase'])
+        for resultId, counter in READABILITY_COUNTERS:
+            setattr(other.readingEase, counter, readingEase[resultId])
+
+        self.merge(other)
+
+    def merge(self, other):
+        """Merge another CorpusAccumulator into this one
+        """
+        self.fileCount += other.fileCount
+        self.sentenceCount += other.sentenceCount
+        self.wordCount += other.wordCount
+        self.syllableCount += other.syllableCount
+        self.charCount += other.charCount
+        self.punctuationCount += other.punctuationCount
+
+        for key, refKey in MAXIMUM_KEYS:
+            if other.maxima[key]['count'] > self.maxima[key]['count']:
+                self.maxima[key] = dict(other.maxima[key])
+
+        for resultId, counter in READABILITY_COUNTERS:
+            setattr(self.readingEase, counter, getattr(self.readingEase, counter) + getattr(other.readingEase, counter))
+
+    def finish(self):
+        """Return the corpus-level textData, computed
+        the same way as the text-level metadata
+        """
+        textData = {
+            'fileCount' : self.fileCount,
+            'sentenceCount' : self.sentenceCount,
+            'wordCount' : self.wordCount,
+            'syllableCount' : self.syllableCount,
+            'charCount' : self.charCount,
+            'punctuationCount' : self.punctuationCount,
+            'averageWordsPerSentence' : round(float(self.wordCount) / float(self.sentenceCount), DIGITS),
+            'averageSyllablesPerWord' : round(float(self.syllableCount) / float(self.wordCount), DIGITS),
+            'averageSyllableLength' : round(float(self.syllableCount) / float(self.charCount), DIGITS),
+            'averageWordLength' : round(float(self.charCount) / float(self.wordCount), DIGITS),
+            'averagePunctuationPerSentence' : round(float(self.punctuationCount) / float(self.sentenceCount), DIGITS)
+        }
+        for key, refKey in MAXIMUM_KEYS:
+            textData[key] = dict(self.maxima[key])
+        textData['readingEase'] = self.readingEase.finish(textData)
+        return textData
+
+def load_csv_wordtable(filename):
+    """Load a word table .csv file written by write_csv().
+    Return the word table in the layout returned by compute_word_table()
+    """
+    wordTable = {}
+    for word, count, frequency in fileoperations.iter_wordtable_csv(filename):
+        wordTable[word] = {
+            'count' : count,
+            'frequency' : frequency
+        }
+    return {
+        'words' : wordTable
+    }
 
 
 ####################################
@@ -346,29 +931,103 @@ def compute_reading_ease_indices(textData):
 #
 ####################################
 
-def metadata_is_uptodate(filename, language):
+def load_manifest(folderPath):
+    """Load the manifest of a folder, which records the state of
+    every text file at the time of its last analysis.
+    Return an empty manifest if there is none.
+    """
+    try:
+        manifest = fileoperations.load_json(make_folder_filename(folderPath, FILESUFFIX_MANIFEST))
+        if not isinstance(manifest.get('files'), dict):
+            raise ValueError('Manifest has no file list')
+    except:
+        manifest = {
+            'files' : {}
+        }
+    return manifest
+
+def write_manifest(manifest, folderPath):
+    """Write the manifest of a folder
+    """
+    manifest['analyze_version'] = ANALYZE_VERSION
+    fileoperations.write_json(manifest, make_folder_filename(folderPath, FILESUFFIX_MANIFEST))
+
+def make_manifest_entry(filename, meta):
+    """Create the manifest entry of a text file
+    from its current size & mtime and the meta header of its metadata
+    """
+    fileStat = os.stat(filename)
+    return {
+        'path' : filename,
+        'size' : fileStat.st_size,
+        'mtime' : fileStat.st_mtime,
+        'CRC32' : meta['CRC32'],
+        'MD5' : meta['MD5'],
+        'language' : meta['language'],
+        'tokenizer' : meta.get('tokenizer'),
+        'analyze_version' : meta['analyze_version']
+    }
+
+def make_manifest_key(filename, folderPath):
+    """Return the key of a text file in the manifest of a folder:
+    its path relative to the folder, using "/" as separator
+    """
+    return os.path.relpath(filename, folderPath).replace(os.sep, '/')
+
+def manifest_is_uptodate(filename, language, manifestEntry, fileStat=None, outputFormat='json', tokenizer='nltk'):
+    """Check the manifest entry of a text file to find out if we need
+    to analyze it again, without reading or hashing anything.
+    The file is considered unchanged if its size and mtime are unchanged.
+    fileStat can be given if the file's stat info is already known.
+
+    Return False if the manifest can not tell, otherwise True
+    """
+    if manifestEntry is None:
+        return False
+    try:
+        if fileStat is None:
+            fileStat = os.stat(filename)
+        return fileStat.st_size == manifestEntry['size'] and \
+            fileStat.st_mtime == manifestEntry['mtime'] and \
+            manifestEntry['analyze_version'] == ANALYZE_VERSION and \
+            manifestEntry['language'] == language and \
+            manifestEntry['tokenizer'] == tokenizer and \
+            os.path.isfile(make_metadata_filename(filename, outputFormat))
+    except:
+        return False
+
+def metadata_is_uptodate(filename, language, manifestEntry=None, fileStat=None, outputFormat='json', tokenizer='nltk'):
     """Check header of .json file to find out if we need
     to analyze the referred text file again. This is done
     by checking the MD5 and CRC32 checksums in the header
     against freshly computed checksums of the file, and
     also checking the analyze_version in the header against
-    the current one in the code.
+    the current one in the code, and language and tokenizer
+    against the current ones.
+
+    If the file's manifest entry is given and shows that
+    the file is unchanged, the checks are skipped.
 
     Return False if a fresh analysis is required, otherwise True
     """
     print('Checking ' + filename + '...')
 
-    # Open metadata .json file
-    metadataFilePath = make_metadata_filename(filename)
+    if manifest_is_uptodate(filename, language, manifestEntry, fileStat=fileStat, outputFormat=outputFormat, tokenizer=tokenizer):
+        print('Size and modification time unchanged.')
+        return True
+
+    # Open metadata file
+    metadataFilePath = make_metadata_filename(filename, outputFormat)
     try:
-        metadata = fileoperations.load_json(metadataFilePath)['_meta']
+        metadata = load_metadata_header(metadataFilePath, outputFormat)
     except:
         #print('Could not load metadata for ' + shorten_filename(filename) + '.')
         return False
 
     # Compute checksums for text file
-    checksumCrc32 = hashes.get_file_crc32(filename)
-    checksumMd5 = hashes.get_file_md5(filename)
+    digests = hashes.get_file_digests(filename)
+    checksumCrc32 = digests['CRC32']
+    checksumMd5 = digests['MD5']
 
     # Compare
     try:
@@ -384,111 +1043,437 @@ def metadata_is_uptodate(filename, language):
         if metadata['language'] != language:
             print('Language differs: ' + metadata['language'] + ' in metadata vs. current ' + language)
             return False
+        if metadata['tokenizer'] != tokenizer:
+            print('Tokenizer differs: ' + metadata['tokenizer'] + ' in metadata vs. current ' + tokenizer)
+            return False
     except:
         print('Metadata header is missing or incomplete!')
         return False
 
     return True
 
-def compute_wordfrequencies(wordTable):
-    """Compute relative frequencies in an existing word table
-    """
-    # First get total word count
-    totalWordCount = 0
-    for word, valueDict in wordTable.iteritems():
-        totalWordCount += valueDict.get('count', 0)
-
-    for word, valueDict in wordTable.iteritems():
-        count = valueDict['count']
-        wordTable[word] = {
-            'count' : count,
-            'frequency' : float(count) / float(totalWordCount)
-        }
-
-# TODO
-def merge_textdata(textData, globalTextData):
-    """Merge textData into globalTextData,
+def merge_textdata(textData, corpusStatistics):
+    """Merge textData into a CorpusAccumulator,
     adding up to global data
     """
     print('Merging global textData dictionaries...')
-    pass
+    with profiling.profiler.stage('merge'):
+        corpusStatistics.add_text_data(textData)
 
 def merge_wordtable(wordTable, globalWordTable):
-    """Merge wordTable into globalWordTable,
-    adding up to global data
+    """Merge wordTable into globalWordTable (a WordTableAccumulator),
+    adding up to global data. Only counts are added; relative
+    frequencies are computed by globalWordTable.finish() when exporting.
     """
-    # Iterate word table
-    # Update counts
     print('Merging global wordTable dictionaries...')
-    for word,valueDict in wordTable['words'].iteritems():
-        wordCount = valueDict['count']
+    with profiling.profiler.stage('merge'):
+        globalWordTable.add_word_table(wordTable)
 
-        newCount = int(globalWordTable.get(word, {}).get('count', 0) + wordCount)
-        globalWordTable[word] = {
-            'count' : newCount,
-            'frequency' : float(0.0)
-        }
-
-    # Compute relative frequencies
-    compute_wordfrequencies(globalWordTable)
+def merge_ngrams(wordTable, globalNgrams):
+    """Merge the n-grams of wordTable into globalNgrams
+    (an ngrams.NgramCounter), adding up to global data
+    """
+    print('Merging global n-gram tables...')
+    with profiling.profiler.stage('merge'):
+        globalNgrams.merge(wordTable['ngrams'])
 
-def process_text(text, lang='de_DE'):
+def process_text(text, lang='de_DE', backend='nltk', vocabularyIds=False, ngramSettings=None):
     """Perform all the analyses for a complete text
     Return textData and wordTable as a tuple
     """
 
     # Tokenize
     print('Tokenizing text...')
-    textData = tokenize.tokenize_text(unicode(text), lang=lang)
+    textData = tokenize.tokenize_text(unicode(text), lang=lang, backend=backend)
+
+    # Analyze metadata, word table and readability in one pass
+    print('Computing metadata and analyzing readability...')
+    with profiling.profiler.stage('analyze'):
+        wordTable = analyze_text_data(textData, vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+
+    return (textData, wordTable)
+
+def process_text_streaming(text, lang='de_DE', sentenceCallback=None, backend='nltk', vocabularyIds=False, ngramSettings=None):
+    """Perform all the analyses for a complete text, tokenizing and
+    analyzing one sentence at a time. Sentences are not kept in textData;
+    pass sentenceCallback to receive each analyzed sentence instead.
+    With vocabularyIds, the words of these sentences only reference
+    their entry in textData['vocabulary'].
+    Return textData and wordTable as a tuple
+    """
+    analyzer = TextAnalyzer(vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+
+    # Tokenize & analyze
+    print('Tokenizing text, computing metadata and analyzing readability...')
+    for sentence in tokenize.iter_tokenize_text(unicode(text), lang=lang, backend=backend):
+        analyzer.add_sentence(sentence)
+        if sentenceCallback is not None:
+            sentenceCallback(sentence)
+
+    textData = {}
+    wordTable = analyzer.finish(textData)
+
+    return (textData, wordTable)
+
+def process_text_chunks(textChunks, lang='de_DE', sentenceCallback=None, backend='nltk', vocabularyIds=False, ngramSettings=None):
+    """Perform all the analyses for a text that is given as an iterable
+    of unicode chunks, like process_text_streaming(). Chunks are split
+    into sentences as they arrive, so the complete text is never
+    held in memory.
+    Return textData and wordTable as a tuple
+    """
+    analyzer = TextAnalyzer(vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+
+    # Tokenize & analyze
+    print('Reading text in chunks, tokenizing, computing metadata and analyzing readability...')
+    for sentence in tokenize.iter_tokenize_chunks(textChunks, lang=lang, backend=backend):
+        analyzer.add_sentence(sentence)
+        if sentenceCallback is not None:
+            sentenceCallback(sentence)
+
+    textData = {}
+    wordTable = analyzer.finish(textData)
+
+    return (textData, wordTable)
+
+def process_text_compact(text, lang='de_DE', backend='nltk', statsBackend='python', ngramSettings=None):
+    """Perform all the analyses for a complete text, keeping the
+    tokens in a CompactText instead of per-word dictionaries.
+    With statsBackend "numpy", statistics are computed with
+    array operations over the CompactText's columns.
+    Return textData, wordTable and the CompactText as a tuple.
+    textData does not contain any sentences; use iter_compact_sentences()
+    to get them when writing the results.
+    """
+
+    # Tokenize
+    print('Tokenizing text...')
+    with profiling.profiler.stage('tokenize'):
+        compactText = compact.compact_sentences(tokenize.iter_tokenize_text(unicode(text), lang=lang, backend=backend))
 
     # Analyze
-    print('Computing metadata...')
-    compute_metadata(textData)
-    wordTable = compute_word_table(textData)
+    print('Computing metadata and analyzing readability...')
+    with profiling.profiler.stage('analyze'):
+        (textData, wordTable) = analyze_compact_text(compactText, statsBackend=statsBackend, ngramSettings=ngramSettings)
 
-    # Readability analysis
-    print('Analyzing readability...')
-    readingEase = compute_reading_ease_indices(textData)
-    textData['readingEase'] = readingEase
+    return (textData, wordTable, compactText)
 
+def analyze_compact_text(compactText, statsBackend='python', ngramSettings=None):
+    """Compute metadata, word table and readability of a CompactText,
+    with the "python" or the vectorized "numpy" statistics backend.
+    With ngramSettings, n-grams are counted like by TextAnalyzer.
+    Return textData (without sentences) and wordTable as a tuple.
+    """
+    textData = {}
+    metadata = MetadataAccumulator()
+    wordTable = WordTableAccumulator()
+    readingEase = ReadabilityAccumulator()
+    if statsBackend == 'numpy':
+        compactArrays = vectorized.CompactArrays(compactText)
+        vectorized.add_compact_metadata(metadata, compactArrays)
+        vectorized.add_compact_word_counts(wordTable, compactArrays)
+        vectorized.add_compact_readability(readingEase, compactArrays)
+    else:
+        metadata.add_compact_text(compactText)
+        wordTable.add_compact_text(compactText)
+        readingEase.add_compact_text(compactText)
+
+    metadata.finish(textData)
+    textData['readingEase'] = readingEase.finish(textData)
+    wordTable = wordTable.finish(textData['wordCount'])
+    if ngramSettings is not None:
+        ngramCounter = ngrams.NgramCounter(ngramSettings)
+        ngramCounter.add_compact_text(compactText)
+        wordTable['ngrams'] = ngramCounter.finish()
     return (textData, wordTable)
 
-def process_file(filePath, lang='de_DE'):
-    """Load a file, process it, and write the result files
+def iter_compact_sentences(compactText, metadata=None):
+    """Yield the sentences of a CompactText including their
+    per-sentence and per-word metadata, one at a time.
+    metadata is the MetadataAccumulator used for this.
+    """
+    if metadata is None:
+        metadata = MetadataAccumulator()
+    for sentence in compactText.iter_sentences():
+        metadata.add_sentence(sentence)
+        yield sentence
+
+def read_text(filePath):
+    """Read a text file, compute its digests and decode it.
+    Return the text, the digests and the byte count as a tuple.
+    """
+    print('Reading file...')
+    profiler = profiling.profiler
+    with profiler.stage('read'):
+        rawText = fileoperations.read_text_file(filePath)
+    with profiler.stage('hash'):
+        digests = hashes.get_bytes_digests(rawText)
+    with profiler.stage('decode'):
+        text = rawText.decode('utf-8')
+    return (text, digests, len(rawText))
+
+def write_result_files(textData, wordTable, metadataFilePath, wordTableFilePath, outputFormat='json', sentences=None, ngramFilePaths=None):
+    """Write the metadata file and the word count CSV table file of a text,
+    and its n-gram files if the word table contains n-grams.
+    sentences is passed to write_metadata().
+    """
+    print('Writing ' + outputFormat + ' metadata file...')
+    with profiling.profiler.stage('writeMetadata'):
+        write_metadata(textData, metadataFilePath, outputFormat, sentences=sentences)
+    print('Writing word count CSV table file...')
+    with profiling.profiler.stage('writeCsv'):
+        write_csv(wordTable, wordTableFilePath)
+    if 'ngrams' in wordTable and ngramFilePaths is not None:
+        print('Writing n-gram files...')
+        with profiling.profiler.stage('writeNgrams'):
+            write_ngram_files(wordTable['ngrams'], wordTable.get('_meta', {}), ngramFilePaths)
+
+def process_file(filePath, lang='de_DE', streaming=False, backend='nltk', compactTokens=False, outputFormat='json', chunked=False, statsBackend='python', vocabularyIds=False, textFile=None, resultWriter=None, ngramSettings=None, sentenceStats=False):
+    """Load a file, process it, and write the result files.
+    In streaming mode, the per-sentence data is not kept in memory,
+    but spooled to a temporary file until the metadata file is written.
+    In chunked mode, the file is also read and decoded in chunks,
+    for files that do not fit into memory; it implies streaming mode.
+    With compactTokens, tokens are kept in a CompactText during
+    analysis and only expanded when the metadata file is written.
+    statsBackend "numpy" implies compactTokens.
+    With vocabularyIds, words in the metadata file reference a table
+    of distinct words instead of carrying their own metadata.
+    outputFormat selects the format of the metadata file ("json" or "binary").
+    With ngramSettings (an ngrams.NgramSettings), n-grams are counted and
+    written to n-gram files; the word table contains them as 'ngrams'.
+    textFile can be the result of read_text() for this file, if it
+    has already been read. If resultWriter (a pipeline.BackgroundWriter)
+    is given, the result files are written in the background.
+    With sentenceStats, textData contains the per-sentence statistics
+    for the corpus store as 'sentenceStats'; they are not written to
+    the metadata file.
     """
     # Export paths
-    metadataFilePath = make_metadata_filename(filePath)
+    metadataFilePath = make_metadata_filename(filePath, outputFormat)
     wordTableFilePath = make_wordtable_filename(filePath)
+    ngramFilePaths = None
     print('Import text file : ' + filePath)
     print('Export metadata  : ' + metadataFilePath)
     print('Export word table: ' + wordTableFilePath)
-
-    # Read text file
-    print('Reading file...')
-    text = fileoperations.read_text_file(filePath).decode('utf-8')
-
-    # Process text file
-    (textData, wordTable) = process_text(text, lang=lang)
+    if ngramSettings is not None:
+        ngramFilePaths = make_ngram_filenames(filePath)
+        print('Export n-grams   : ' + ngramFilePaths[0])
+
+    profiler = profiling.profiler
+    profiler.begin_file(filePath)
+    cacheStats = tokenize.syllableCache.stats()
+
+    compactText = None
+    sentenceSpool = None
+    sentenceRows = None
+    text = None
+    if chunked or streaming:
+        sentenceSpool = jsonstream.SentenceSpool(directory=os.path.dirname(os.path.abspath(metadataFilePath)))
+        sentenceCallback = sentenceSpool.add_sentence
+        if sentenceStats:
+            # Sentences are not kept, so their statistics
+            # are collected as they are spooled
+            sentenceRows = store.SentenceRowCollector()
+            def sentenceCallback(sentence):
+                sentenceSpool.add_sentence(sentence)
+                sentenceRows.add_sentence(sentence)
+
+    if chunked:
+        # Read & process text file in chunks,
+        # computing the digests on the way
+        multiDigest = hashes.MultiDigest()
+        textChunks = fileoperations.iter_text_file_chunks(filePath, byteCallback=multiDigest.update)
+        with profiler.stage('readTokenizeAnalyze'):
+            (textData, wordTable) = process_text_chunks(textChunks, lang=lang, backend=backend, sentenceCallback=sentenceCallback, vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+        digests = multiDigest.digests()
+        profiler.count('bytes', os.path.getsize(filePath))
+    else:
+        # Read text file, unless it has been read ahead
+        if textFile is None:
+            textFile = read_text(filePath)
+        (text, digests, byteCount) = textFile
+        profiler.count('bytes', byteCount)
+        del textFile
+
+        # Process text file
+        if streaming:
+            with profiler.stage('tokenizeAnalyze'):
+                (textData, wordTable) = process_text_streaming(text, lang=lang, backend=backend, sentenceCallback=sentenceCallback, vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
+        elif compactTokens or statsBackend == 'numpy':
+            (textData, wordTable, compactText) = process_text_compact(text, lang=lang, backend=backend, statsBackend=statsBackend, ngramSettings=ngramSettings)
+        else:
+            (textData, wordTable) = process_text(text, lang=lang, backend=backend, vocabularyIds=vocabularyIds, ngramSettings=ngramSettings)
 
 
     # Insert headers
     print('Inserting meta headers...')
-    metaheader = metadata_header(filePath, text, language=lang)
+    metaheader = metadata_header(filePath, text, language=lang, digests=digests, tokenizer=backend)
     textData['_meta'] = metaheader
     wordTable['_meta'] = metaheader
 
-    # Write result filea
-    print('Writing JSON metadata file...')
-    fileoperations.write_json(textData, metadataFilePath)
-    print('Writing word count CSV table file...')
-    write_csv(wordTable, wordTableFilePath)
+    # Write result files
+    sentences = sentenceSpool
+    if compactText is not None:
+        # Sentences are expanded one at a time while they are written
+        metadata = MetadataAccumulator(vocabularyIds=vocabularyIds)
+        if vocabularyIds:
+            # Words are interned in order of their first occurrence,
+            # so this assigns the same ids as expanding the sentences
+            for word, syllables in zip(compactText.words, compactText.wordSyllables):
+                metadata.vocabulary.lookup(word, syllables)
+            textData['vocabulary'] = metadata.vocabulary.to_list()
+        sentences = iter_compact_sentences(compactText, metadata=metadata)
+    if sentenceSpool is not None:
+        sentenceSpool.flush()
+    if resultWriter is None:
+        write_result_files(textData, wordTable, metadataFilePath, wordTableFilePath, outputFormat, sentences=sentences, ngramFilePaths=ngramFilePaths)
+    else:
+        print('Writing result files in the background...')
+        resultWriter.submit(filePath, write_result_files, textData, wordTable, metadataFilePath, wordTableFilePath, outputFormat, sentences, ngramFilePaths)
+
+    # Per-sentence statistics for the corpus store
+    if sentenceStats:
+        if sentenceRows is not None:
+            textData['sentenceStats'] = sentenceRows.rows
+        elif compactText is not None:
+            textData['sentenceStats'] = store.make_sentence_rows(iter_compact_sentences(compactText))
+        else:
+            textData['sentenceStats'] = store.make_sentence_rows(textData['sentences'])
+    if sentenceSpool is not None:
+        sentenceSpool.close()
+
+    # Throughput counters
+    newCacheStats = tokenize.syllableCache.stats()
+    profiler.count('sentences', textData['sentenceCount'])
+    profiler.count('words', textData['wordCount'])
+    profiler.count('syllables', textData['syllableCount'])
+    profiler.count('syllableCacheHits', newCacheStats['hits'] - cacheStats['hits'])
+    profiler.count('syllableCacheMisses', newCacheStats['misses'] - cacheStats['misses'])
+    profiler.end_file()
 
     # Return data
     return (textData, wordTable)
 
 
-def analyze(sourcePath, fileExtension='.txt', lang='de_DE', forceAnalyze=False):
-    """Check filePath, start processing, measure processing time
+def load_cached_results(filename, lang='de_DE', forceAnalyze=False, manifestEntry=None, fileStat=None, outputFormat='json', ngramSettings=None, backend='nltk'):
+    """If the metadata of a file is up to date, load it and the word table.
+    With ngramSettings, the word table contains the file's n-grams as
+    'ngrams'; if they were not counted with the same settings, the file
+    needs to be analyzed again.
+    Return textData (without sentences) and wordTable as a tuple,
+    or None if the file needs to be analyzed.
+    """
+    # Check if we need to analyze this file
+    with profiling.profiler.stage('checkCache'):
+        uptodate = metadata_is_uptodate(filename, language=lang, manifestEntry=manifestEntry, fileStat=fileStat, outputFormat=outputFormat, tokenizer=backend)
+    if uptodate and forceAnalyze == False:
+        # Metadata is up to date. Just load it and the word table for the global tables
+        try:
+            with profiling.profiler.stage('loadCache'):
+                textData = load_metadata_summary(make_metadata_filename(filename, outputFormat), outputFormat)
+                wordTable = load_csv_wordtable(make_wordtable_filename(filename))
+                if ngramSettings is not None:
+                    wordTable['ngrams'] = load_ngram_files(make_ngram_filenames(filename), ngramSettings)
+            return (textData, wordTable)
+        except:
+            print('Could not load cached metadata, word table or n-grams.')
+    return None
+
+def prefetch_file(job):
+    """Pipeline stage run ahead of analyze_file(): load the cached
+    results of a file, or read the file if it needs to be analyzed.
+    Files in chunked mode are not read ahead.
+    Return a tuple of cached results and read_text() result,
+    either of which can be None.
+    """
+    (filename, options) = job
+    cachedResults = load_cached_results(filename, lang=get_file_language(filename, options['lang']), forceAnalyze=options['forceAnalyze'], manifestEntry=options['manifestEntry'], fileStat=options['fileStat'], outputFormat=options['outputFormat'], ngramSettings=options['ngramSettings'], backend=options['backend'])
+    textFile = None
+    if cachedResults is None and not options['chunked']:
+        textFile = read_text(filename)
+    return (cachedResults, textFile)
+
+def analyze_file(filename, lang='de_DE', forceAnalyze=False, streaming=False, backend='nltk', compactTokens=False, manifestEntry=None, fileStat=None, outputFormat='json', sentenceStats=False, chunked=False, statsBackend='python', vocabularyIds=False, prefetched=None, resultWriter=None, ngramSettings=None):
+    """Analyze a file from a folder, unless its metadata is up to date.
+    Return a tuple: whether the file has been analyzed, its textData
+    (without sentences), its wordTable, and its new manifest entry.
+    With sentenceStats, the textData of an analyzed file contains
+    its per-sentence statistics for the corpus store as 'sentenceStats'.
+    prefetched is the result of prefetch_file() for this file, if it
+    has been run ahead. resultWriter and ngramSettings are passed to process_file().
+    """
+    fileLang = get_file_language(filename, lang)
+
+    if prefetched is None:
+        cachedResults = load_cached_results(filename, lang=fileLang, forceAnalyze=forceAnalyze, manifestEntry=manifestEntry, fileStat=fileStat, outputFormat=outputFormat, ngramSettings=ngramSettings, backend=backend)
+        textFile = None
+    else:
+        (cachedResults, textFile) = prefetched
+    if cachedResults is not None:
+        (textData, wordTable) = cachedResults
+        print('Metadata is up to date. Skipping analysis.')
+        return (False, textData, wordTable, make_manifest_entry(filename, textData['_meta']))
+
+    # Metadata does not exist or is outdated. Analyze file.
+    print('Analyzing ' +
+          fileoperations.shorten_filename(filename) + '...')
+    (textData, wordTable) = process_file(filename, lang=fileLang, streaming=streaming, backend=backend, compactTokens=compactTokens, outputFormat=outputFormat, chunked=chunked, statsBackend=statsBackend, vocabularyIds=vocabularyIds, textFile=textFile, resultWriter=resultWriter, ngramSettings=ngramSettings, sentenceStats=sentenceStats)
+    textSummary = dict((key, value) for key, value in textData.iteritems() if key not in ('sentences', 'vocabulary'))
+    return (True, textSummary, wordTable, make_manifest_entry(filename, textData['_meta']))
+
+def init_worker(lang, backend, profile=False):
+    """Warm up a process pool worker. The hyphenator and NLTK's
+    sentence tokenizer are loaded once and then kept for all files
+    the worker analyzes. With profile, the worker records file reports.
+    """
+    if profile:
+        profiling.profiler.enable()
+    tokenize.get_hyphenator(lang)
+    list(tokenize.iter_tokenize_text(u'Warm up.', lang=lang, backend=backend))
+
+def store_file(corpusStore, filename, analyzed, textData, wordTable, outputFormat='json'):
+    """Write the results of a file to the corpus store.
+    Cached results are only written if the store does not have them
+    yet; their per-sentence statistics are read from the metadata file.
+    """
+    path = os.path.abspath(filename)
+    sentenceRows = textData.pop('sentenceStats', None)
+    if not analyzed:
+        if corpusStore.has_file(path, textData['_meta']):
+            return
+        sentenceRows = store.make_sentence_rows(iter_metadata_sentences(make_metadata_filename(filename, outputFormat), outputFormat))
+    corpusStore.add_file(path, textData, wordTable, sentenceRows=sentenceRows or [])
+
+def analyze_file_job(job):
+    """Process pool entry point for analyze_file().
+    Errors are returned instead of raised,
+    so a failing file does not abort the batch.
+    Profiler file reports are returned, too.
+    """
+    (filename, options) = job
+    try:
+        return (filename, analyze_file(filename, **options), None, profiling.profiler.pop_file_reports())
+    except Exception as e:
+        return (filename, None, repr(e), profiling.profiler.pop_file_reports())
+
+def analyze(sourcePath, fileExtension='.txt', lang='de_DE', forceAnalyze=False, streaming=False, backend='nltk', compactTokens=False, jobs=1, verify=False, recursive=False, include=None, exclude=None, outputFormat='json', storeFile=None, chunked=False, statsBackend='python', vocabularyIds=False, pipelined=False, wordTableTop=None, wordTableMinCount=None, ngramSizes=None, ngramExact=False, ngramTop=ngrams.DEFAULT_CAPACITY, ngramSketchWidth=ngrams.DEFAULT_SKETCH_WIDTH, ngramSketchDepth=ngrams.DEFAULT_SKETCH_DEPTH):
+    """Check filePath, start processing, measure processing time.
+    When analyzing a folder, fileExtension can be a tuple of extensions,
+    and recursive, include and exclude are passed to fileoperations.iter_files().
+    If storeFile is given, all results are also written to
+    the SQLite corpus store in that file.
+    If pipelined, files of a folder are analyzed one by one, while upcoming
+    files are read and hashed in a background thread, and finished result
+    files are written by background processes.
+    wordTableTop and wordTableMinCount limit the words in the folder's
+    word table (see write_csv()); the tables of single files are always
+    complete, as they are needed to build the folder's table later.
+    With ngramSizes (a list of n-gram sizes), n-grams are counted, too.
+    With ngramExact, they are counted exactly; otherwise the ngramTop most
+    frequent n-grams per size are tracked, and a count-min sketch of
+    ngramSketchWidth x ngramSketchDepth counters estimates their counts.
+    The folder's n-gram table always has at most ngramTop n-grams per size.
     """
     print('Analyze version: ' + ANALYZE_VERSION)
     print('')
@@ -498,77 +1483,189 @@ def analyze(sourcePath, fileExtension='.txt', lang='de_DE', forceAnalyze=False):
         sys.exit('ERROR: No path to text file provided!')
     if not os.path.exists(sourcePath):
         sys.exit('ERROR: "' + sourcePath + '" is not the path of an existing file or folder!')
+    if statsBackend == 'numpy' and not vectorized.is_available():
+        sys.exit('ERROR: The "numpy" statistics backend requires NumPy!')
+
+    # N-gram counting
+    ngramSettings = None
+    if ngramSizes is not None:
+        if min(ngramTop, ngramSketchWidth, ngramSketchDepth) < 1:
+            sys.exit('ERROR: Number of n-grams and sketch size must be at least 1!')
+        ngramSettings = ngrams.NgramSettings(sizes=ngramSizes, exact=ngramExact, capacity=ngramTop, width=ngramSketchWidth, depth=ngramSketchDepth)
+        print('Counting ' + ', '.join(str(n) for n in ngramSettings.sizes) + '-grams (' + ngramSettings.describe() + ')')
 
     # Memorize start time
     timeStart = time.time()
 
+    # Open corpus store
+    corpusStore = None
+    if storeFile is not None:
+        print('Corpus store: ' + storeFile)
+        corpusStore = store.CorpusStore(storeFile)
+
     # Start processing
     multiFileMsg = ''
     if os.path.isfile(sourcePath):
         # Process single file
-        process_file(sourcePath, lang=lang)
+        (textData, wordTable) = process_file(sourcePath, lang=get_file_language(sourcePath, lang), streaming=streaming, backend=backend, compactTokens=compactTokens, outputFormat=outputFormat, chunked=chunked, statsBackend=statsBackend, vocabularyIds=vocabularyIds, ngramSettings=ngramSettings, sentenceStats=corpusStore is not None)
+        if corpusStore is not None:
+            corpusStore.add_file(os.path.abspath(sourcePath), textData, wordTable, sentenceRows=textData.pop('sentenceStats', []))
     elif os.path.isdir(sourcePath):
         # Tables for storing ALL data from ALL files
         # (to build global tables after processing the files)
-        globalTextData = {}
-        globalWordTable = {}
+        corpusStatistics = CorpusAccumulator()
+        globalWordTable = WordTableAccumulator()
+        globalNgrams = ngrams.NgramCounter(ngramSettings) if ngramSettings is not None else None
 
         # Process files in folder
         fileCount = 0
-        filesInFolder = fileoperations.count_files(sourcePath, fileExtension)
-        for file in os.listdir(sourcePath):
-            if file.endswith(fileExtension):
-                filename = os.path.join(sourcePath, file)
-                # Check if we need to analyze this file
-                if metadata_is_uptodate(filename, language=lang) and forceAnalyze == False:
-                    # Metadata is up to date. Just load it and merge for the global table
-                    print('Metadata is up to date. Skipping analysis.')
-
-                    # Load existing metadata file and merge (to update global data)
-                    textData = fileoperations.load_json(make_metadata_filename(filename))
-                    merge_textdata(textData, globalTextData)
-                    # TODO: Update global word table, too
-                    # merge_wordtable(wordTable, globalWordTable)
-                    # compute_wordfrequencies(globalWordTable)
-                else:
-                    # Metadata does not exist or is outdated. Analyze file.
-                    print('Analyzing ' +
-                          fileoperations.shorten_filename(filename) + '...')
-                    (textData, wordTable) = process_file(filename, lang=lang)
-                    merge_textdata(textData, globalTextData)
+        filesInFolder = 0
+        failedFiles = []
+
+        # Manifest with the state of all files at their last analysis
+        # When verifying, it is ignored and all files are checked by their checksums
+        manifest = load_manifest(sourcePath)
+        manifestFiles = manifest['files']
+        if verify:
+            manifestFiles = {}
+        newManifestFiles = {}
+
+        fileOptions = {
+            'lang' : lang,
+            'forceAnalyze' : forceAnalyze,
+            'streaming' : streaming,
+            'backend' : backend,
+            'compactTokens' : compactTokens,
+            'outputFormat' : outputFormat,
+            'sentenceStats' : corpusStore is not None,
+            'chunked' : chunked,
+            'statsBackend' : statsBackend,
+            'vocabularyIds' : vocabularyIds,
+            'ngramSettings' : ngramSettings
+        }
+
+        # Discover files lazily. Each job is a file's path and
+        # its options, including manifest entry and cached stat info.
+        fileEntries = fileoperations.iter_files(sourcePath, fileExtension, recursive=recursive, include=include, exclude=exclude)
+        fileJobs = ((entry.path, dict(fileOptions, manifestEntry=manifestFiles.get(make_manifest_key(entry.path, sourcePath)), fileStat=entry.stat())) for entry in fileEntries)
+
+        if jobs > 1:
+            # Analyze files in a process pool, results arrive in file order
+            print('Analyzing with ' + str(jobs) + ' parallel jobs...')
+            pool = multiprocessing.Pool(processes=jobs, initializer=init_worker, initargs=(lang, backend, profiling.profiler.enabled))
+            try:
+                fileResults = pool.imap(analyze_file_job, fileJobs)
+                for (filename, fileResult, error, fileReports) in fileResults:
+                    filesInFolder += 1
+                    profiling.profiler.add_file_reports(fileReports)
+                    if error is not None:
+                        print('ERROR: Could not analyze ' + fileoperations.shorten_filename(filename) + ': ' + error)
+                        failedFiles.append(filename)
+                        continue
+                    (analyzed, textData, wordTable, manifestEntry) = fileResult
+                    newManifestFiles[make_manifest_key(filename, sourcePath)] = manifestEntry
+                    if corpusStore is not None:
+                        store_file(corpusStore, filename, analyzed, textData, wordTable, outputFormat)
+                    merge_textdata(textData, corpusStatistics)
+                    merge_wordtable(wordTable, globalWordTable)
+                    if globalNgrams is not None:
+                        merge_ngrams(wordTable, globalNgrams)
+                    if analyzed:
+                        fileCount += 1
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            # Analyze files one by one. When pipelined, the next files are
+            # read ahead, and result files are written in the background.
+            prefetcher = None
+            resultWriter = None
+            if pipelined:
+                print('Analyzing in a pipeline, reading ahead and writing in the background...')
+                prefetcher = pipeline.Prefetcher(fileJobs, prefetch_file)
+                resultWriter = pipeline.BackgroundWriter()
+                fileResults = iter(prefetcher)
+            else:
+                fileResults = ((job, None) for job in fileJobs)
+            try:
+                for ((filename, options), prefetched) in fileResults:
+                    filesInFolder += 1
+                    (analyzed, textData, wordTable, manifestEntry) = analyze_file(filename, prefetched=prefetched, resultWriter=resultWriter, **options)
+                    newManifestFiles[make_manifest_key(filename, sourcePath)] = manifestEntry
+                    if corpusStore is not None:
+                        store_file(corpusStore, filename, analyzed, textData, wordTable, outputFormat)
+                    merge_textdata(textData, corpusStatistics)
                     merge_wordtable(wordTable, globalWordTable)
-                    compute_wordfrequencies(globalWordTable)
-                    fileCount += 1
-                print('')
+                    if globalNgrams is not None:
+                        merge_ngrams(wordTable, globalNgrams)
+                    if analyzed:
+                        fileCount += 1
+                    print('')
+            finally:
+                if prefetcher is not None:
+                    prefetcher.close()
+                if resultWriter is not None:
+                    print('Waiting for result files to be written...')
+                    for (filename, error) in resultWriter.close():
+                        print('ERROR: Could not write results of ' + fileoperations.shorten_filename(filename) + ': ' + error)
+                        failedFiles.append(filename)
+                        newManifestFiles.pop(make_manifest_key(filename, sourcePath), None)
+
+        # Update manifest
+        manifest['files'] = newManifestFiles
+        with profiling.profiler.stage('writeManifest'):
+            write_manifest(manifest, sourcePath)
+
+        if len(failedFiles) > 0:
+            print(str(len(failedFiles)) + ' files could not be analyzed:')
+            for filename in failedFiles:
+                print('    ' + filename)
+            print('')
         multiFileMsg = str(fileCount) + ' of ' + str(filesInFolder) + ' files '
 
         # Export paths
-        if fileCount > 0:
+        # Export global tables, built from analyzed and cached files
+        if corpusStatistics.fileCount > 0:
             print('Building global tables...')
             absPath = os.path.normpath(os.path.abspath(sourcePath))
-            pathName = os.path.basename(absPath)
-            globalMetadataFilePath = os.path.join(absPath, '_' + pathName + FILESUFFIX_JSON)
-            globalWordTableFilePath = os.path.join(absPath, '_' + pathName + FILESUFFIX_CSV)
+            globalMetadataFilePath = make_folder_filename(absPath, FILESUFFIX_JSON)
+            globalWordTableFilePath = make_folder_filename(absPath, FILESUFFIX_CSV)
             print('Export global metadata  : ' + globalMetadataFilePath)
             print('Export global word table: ' + globalWordTableFilePath)
-
-            finalGlobalWordTable = {
-                '_meta' : {
-                    'Folder' : absPath,
-                    'Date of analysis' : get_datetime_now()
-                },
-                'words' : globalWordTable
+            if globalNgrams is not None:
+                globalNgramFilePath = make_folder_filename(absPath, FILESUFFIX_NGRAMS_CSV)
+                print('Export global n-grams   : ' + globalNgramFilePath)
+
+            globalMetaheader = {
+                'Folder' : absPath,
+                'Date of analysis' : get_datetime_now(),
+                'analyze_version' : ANALYZE_VERSION
             }
+            globalTextData = corpusStatistics.finish()
+            globalTextData['_meta'] = globalMetaheader
+            finalGlobalWordTable = globalWordTable.finish(globalWordTable.total_word_count())
+            finalGlobalWordTable['_meta'] = globalMetaheader
 
             # Write result files
             print('Writing global JSON metadata file...')
-            fileoperations.write_json(globalTextData, globalMetadataFilePath)
-            print('Writing global word count CSV table file...')
-            write_csv(finalGlobalWordTable, globalWordTableFilePath)
+            with profiling.profiler.stage('writeGlobal'):
+                fileoperations.write_json(globalTextData, globalMetadataFilePath)
+                print('Writing global word count CSV table file...')
+                write_csv(finalGlobalWordTable, globalWordTableFilePath, topCount=wordTableTop, minCount=wordTableMinCount)
+                if globalNgrams is not None:
+                    print('Writing global n-gram CSV table file...')
+                    write_ngram_csv(globalNgrams, globalMetaheader, globalNgramFilePath, topCount=ngramTop)
             print('')
 
     else:
         print('That is weird. It seems to be neither a file nor a folder...')
 
+    if corpusStore is not None:
+        print('Corpus store contains ' + str(corpusStore.file_count()) + ' files.')
+        corpusStore.close()
+
     print('Finished processing ' + multiFileMsg + '(' + str(round(time.time() - timeStart, 3)) + ' seconds)')
+    cacheStats = tokenize.syllableCache.stats()
+    print('Syllable cache: ' + str(cacheStats['hits']) + ' hits, ' + str(cacheStats['misses']) + ' misses, ' + str(cacheStats['size']) + ' of ' + str(cacheStats['maxSize']) + ' entries used (hit rate ' + "{:.1%}".format(cacheStats['hitRate']) + ')')
     print('')
@@ -0,0 +1,617 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os, sys
+import time
+import shutil
+import tempfile
+import copy
+import subprocess
+import random
+from textlib import fileoperations
+
+####################################
+#
+# Constants
+#
+####################################
+
+BENCHMARK_MODES = ['help', 'startup', 'engine', 'stats', 'suite', 'corpus']
+
+BENCHMARK_HELP = """Benchmarks for measuring the performance of TextTools.
+
+--benchmark startup
+Measures the time each mode of texttool.py needs from starting
+the interpreter to exiting, using minimal input files.
+
+--benchmark engine [TEXTFILE]
+Compares the single-pass analysis engine against the three separate
+passes compute_metadata(), compute_word_table() and
+compute_reading_ease_indices(), on an already tokenized text.
+If no TEXTFILE is given, a built-in sample text is used.
+
+--benchmark stats [TEXTFILE]
+Compares the "python" and the vectorized "numpy" statistics backends
+on an already tokenized text in compact columns. Requires NumPy.
+If no TEXTFILE is given, a built-in sample text is used.
+
+--benchmark suite [files=N] [sentences=N] [languages=MIX] [seed=N] [folder=PATH]
+Generates a deterministic synthetic corpus and times every stage separately:
+reading, sentence, word and syllable tokenization, compute_metadata(),
+compute_word_table(), readability, JSON and CSV writing, CSM learn
+and CSM evaluate. MIX is a list of languages with weights, e.g.
+"de_DE:3,en_US:1". The corpus is generated in a temporary folder,
+unless a folder is given. Defaults: files=20 sentences=200 languages=de_DE seed=1
+
+--benchmark corpus folder=PATH [files=N] [sentences=N] [languages=MIX] [seed=N]
+Only generates the synthetic corpus of the suite in a folder.
+
+--benchmark help
+Displays this help text.
+
+Use --benchmark-output FILE to write the results to a JSON file.
+"""
+
+# Path of the command line tool
+TEXTTOOL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'texttool.py')
+
+# Number of runs per command in the startup benchmark
+STARTUP_REPEAT = 5
+
+# Commands measured by the startup benchmark.
+# Placeholders in curly braces are replaced with the fixture paths.
+# The --shuffle mode is not included, as it needs a funpatterns.json
+# in the working directory.
+STARTUP_COMMANDS = [
+    ('interpreter', None),
+    ('help', []),
+    ('csm help', ['--csm', 'help']),
+    ('csm learn', ['{folder}', '--csm', 'learn']),
+    ('csm evaluate', ['{folder}', '--csm', 'evaluate', '{wordtable}']),
+    ('analyze', ['{textfile}', '--analyze', '--force']),
+]
+
+# Text used as input for the startup benchmark
+STARTUP_TEXT = u'Das ist ein kurzer Text. Er hat nur zwei Sätze.'
+
+# Number of runs per variant in the engine benchmark
+ENGINE_REPEAT = 5
+
+# Number of runs per backend in the stats benchmark
+STATS_REPEAT = 5
+
+# Default configuration of the benchmark suite and its synthetic corpus
+SUITE_DEFAULTS = {
+    'files' : 20,
+    'sentences' : 200,
+    'languages' : 'de_DE',
+    'seed' : 1,
+    'folder' : None
+}
+
+# Words for synthetic texts, per language
+SYNTHETIC_WORDS = {
+    'de_DE' : u"""der die das und ist nicht ein eine zu mit auf für von sich
+        den dem im auch es an werden aus er hat dass sie nach wird bei
+        einer um am sind noch wie einem über einen so zum war haben nur
+        oder aber vor zur bis mehr durch man sein wurde sei Jahr Haus
+        Katze Garten Vogel Fenster Schlüssel Fahrrad Bibliothek Stadt
+        Nachmittag Gesundheit Bewegung Wochenende Untersuchung Wissenschaft
+        Universität Straßenbahn Geschwindigkeit Verantwortung Entwicklung
+        Gesellschaft Möglichkeit Eigenschaft Übersetzung Arbeitszeit
+        gehen laufen sehen finden bleiben zeigen fördern schließen beobachten
+        regnen sitzen verstehen erklären untersuchen entwickeln schnell
+        langsam schön regelmäßig wissenschaftlich geschlossen gestern heute
+        leider deshalb überhaupt wahrscheinlich außerordentlich""",
+    'en_US' : u"""the of and to in is that for it as was with be by on not he
+        this are or his from at which but have an they you were her she
+        there would their we him been has when who will more no if out so
+        said what up its about into than them can only other new some
+        house garden window library bicycle afternoon university weekend
+        government information development understanding responsibility
+        community education environment opportunity relationship
+        walk run see find stay show close observe explain develop
+        investigate quickly slowly beautiful regular scientific yesterday
+        today unfortunately therefore probably extraordinary"""
+}
+
+# Sentence endings of synthetic texts, repeated entries are more likely
+SYNTHETIC_SENTENCE_ENDINGS = [u'.', u'.', u'.', u'.', u'!', u'?']
+
+# Sample text for benchmarks that need a text, and how often it is repeated
+SAMPLE_TEXT = u"""Die Katze sitzt auf der Fensterbank und beobachtet die Vögel im Garten.
+Gestern regnete es den ganzen Nachmittag, deshalb blieben wir zu Hause.
+Wissenschaftliche Untersuchungen zeigen, dass regelmäßige Bewegung die Gesundheit fördert!
+Hat jemand den Schlüssel für das Fahrradschloss gesehen?
+Die Universitätsbibliothek ist am Wochenende leider geschlossen. """
+SAMPLE_TEXT_REPEAT = 500
+
+
+####################################
+#
+# Startup
+#
+####################################
+
+def make_startup_fixtures(folder):
+    """Create the minimal input files for the startup benchmark
+    in a folder, and return a dict with their paths
+    """
+    textFile = os.path.join(folder, 'startup.txt')
+    with open(textFile, 'wb') as f:
+        f.write(STARTUP_TEXT.encode('utf-8'))
+
+    wordTableFile = os.path.join(folder, 'startup_wordfrequencies.csv')
+    with open(wordTableFile, 'wb') as f:
+        f.write('Word,Count,Frequency\n')
+        f.write('das,2,0.5\n')
+        f.write('ist,1,0.25\n')
+        f.write('ein,1,0.25\n')
+
+    return {
+        'folder' : folder,
+        'textfile' : textFile,
+        'wordtable' : wordTableFile
+    }
+
+def time_command(commandLine, repeat):
+    """Run a command line repeatedly and return a list of run times
+    and the return code of the last run
+    """
+    times = []
+    returnCode = 0
+    with open(os.devnull, 'wb') as devNull:
+        for _ in range(repeat):
+            timeStart = time.time()
+            returnCode = subprocess.call(commandLine, stdout=devNull, stderr=devNull)
+            times.append(time.time() - timeStart)
+    return (times, returnCode)
+
+def benchmark_startup(repeat=STARTUP_REPEAT):
+    """Measure startup-to-exit time of all texttool.py modes
+    """
+    results = []
+    fixtureFolder = tempfile.mkdtemp(prefix='texttools_benchmark_')
+    try:
+        fixtures = make_startup_fixtures(fixtureFolder)
+        for name, args in STARTUP_COMMANDS:
+            if args is None:
+                # Bare interpreter startup, for reference
+                commandLine = [sys.executable, '-c', 'pass']
+            else:
+                commandLine = [sys.executable, TEXTTOOL_PATH] + [arg.format(**fixtures) for arg in args]
+
+            (times, returnCode) = time_command(commandLine, repeat)
+            result = {
+                'name' : name,
+                'args' : args,
+                'min' : min(times),
+                'mean' : sum(times) / len(times),
+                'max' : max(times),
+                'returnCode' : returnCode
+            }
+            results.append(result)
+            print('{:<14} min {:.3f}s  mean {:.3f}s  max {:.3f}s'.format(name, result['min'], result['mean'], result['max']))
+    finally:
+        shutil.rmtree(fixtureFolder, ignore_errors=True)
+
+    return {
+        'benchmark' : 'startup',
+        'python' : sys.version,
+        'repeat' : repeat,
+        'commands' : results
+    }
+
+
+####################################
+#
+# Analysis engine
+#
+####################################
+
+def load_benchmark_text(args):
+    """Return the text given as first argument,
+    or the repeated sample text
+    """
+    if len(args) > 0:
+        print('Reading ' + args[0] + '...')
+        return fileoperations.read_text_file(args[0]).decode('utf-8')
+    return SAMPLE_TEXT * SAMPLE_TEXT_REPEAT
+
+def time_function(function, argument, repeat):
+    """Call a function repeatedly, each time with a fresh
+    deep copy of the argument. Return a list of run times
+    and the result of the last call.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        argumentCopy = copy.deepcopy(argument)
+        timeStart = time.time()
+        result = function(argumentCopy)
+        times.append(time.time() - timeStart)
+    return (times, result)
+
+def run_three_passes(textData):
+    from textlib import analyze
+    analyze.compute_metadata(textData)
+    wordTable = analyze.compute_word_table(textData)
+    textData['readingEase'] = analyze.compute_reading_ease_indices(textData)
+    return (textData, wordTable)
+
+def run_single_pass(textData):
+    from textlib import analyze
+    wordTable = analyze.analyze_text_data(textData)
+    return (textData, wordTable)
+
+def benchmark_engine(args, repeat=ENGINE_REPEAT):
+    """Compare the single-pass analysis engine
+    against the three-pass pipeline
+    """
+    from textlib import tokenize
+
+    text = load_benchmark_text(args)
+    print('Tokenizing text...')
+    textData = tokenize.tokenize_text(text)
+    wordCount = sum(len(sentence['words']) for sentence in textData['sentences'])
+    print('Tokenized ' + str(len(textData['sentences'])) + ' sentences, ' + str(wordCount) + ' words.')
+
+    (threePassTimes, threePassResult) = time_function(run_three_passes, textData, repeat)
+    (singlePassTimes, singlePassResult) = time_function(run_single_pass, textData, repeat)
+
+    identical = threePassResult == singlePassResult
+    speedup = min(threePassTimes) / min(singlePassTimes) if min(singlePassTimes) > 0.0 else 0.0
+    print('Three passes   min {:.3f}s  mean {:.3f}s'.format(min(threePassTimes), sum(threePassTimes) / repeat))
+    print('Single pass    min {:.3f}s  mean {:.3f}s'.format(min(singlePassTimes), sum(singlePassTimes) / repeat))
+    print('Speedup: {:.2f}x, results identical: {}'.format(speedup, identical))
+
+    return {
+        'benchmark' : 'engine',
+        'python' : sys.version,
+        'repeat' : repeat,
+        'sentences' : len(textData['sentences']),
+        'words' : wordCount,
+        'threePass' : threePassTimes,
+        'singlePass' : singlePassTimes,
+        'speedup' : speedup,
+        'identical' : identical
+    }
+
+
+####################################
+#
+# Statistics backends
+#
+####################################
+
+def benchmark_stats(args, repeat=STATS_REPEAT):
+    """Compare the "python" and "numpy" statistics
+    backends on a CompactText
+    """
+    from textlib import tokenize, compact, analyze, vectorized
+
+    if not vectorized.is_available():
+        print('ERROR: The stats benchmark requires NumPy!')
+        return None
+
+    text = load_benchmark_text(args)
+    print('Tokenizing text...')
+    compactText = compact.compact_sentences(tokenize.iter_tokenize_text(text))
+    print('Tokenized ' + str(compactText.sentence_count()) + ' sentences, ' + str(compactText.token_count()) + ' words.')
+
+    results = {}
+    times = {}
+    for statsBackend in vectorized.STATS_BACKENDS:
+        backendTimes = []
+        for _ in range(repeat):
+            timeStart = time.time()
+            results[statsBackend] = analyze.analyze_compact_text(compactText, statsBackend=statsBackend)
+            backendTimes.append(time.time() - timeStart)
+        times[statsBackend] = backendTimes
+        print('{:<8} min {:.3f}s  mean {:.3f}s'.format(statsBackend, min(backendTimes), sum(backendTimes) / repeat))
+
+    identical = results['python'] == results['numpy']
+    speedup = min(times['python']) / min(times['numpy']) if min(times['numpy']) > 0.0 else 0.0
+    print('Speedup: {:.2f}x, results identical: {}'.format(speedup, identical))
+
+    return {
+        'benchmark' : 'stats',
+        'python' : sys.version,
+        'repeat' : repeat,
+        'sentences' : compactText.sentence_count(),
+        'words' : compactText.token_count(),
+        'times' : times,
+        'speedup' : speedup,
+        'identical' : identical
+    }
+
+
+####################################
+#
+# Synthetic corpus
+#
+####################################
+
+def parse_suite_args(args):
+    """Parse the key=value arguments of the suite and corpus
+    benchmarks, and return the complete configuration
+    """
+    config = dict(SUITE_DEFAULTS)
+    for arg in args:
+        key, separator, value = arg.partition('=')
+        if separator == '' or key not in SUITE_DEFAULTS:
+            raise ValueError('Invalid benchmark argument "' + arg + '". Valid arguments are: ' + str(sorted(SUITE_DEFAULTS.keys())))
+        config[key] = int(value) if isinstance(SUITE_DEFAULTS[key], int) else value
+    return config
+
+def parse_language_mix(languages):
+    """Parse a language mix like "de_DE:3,en_US:1"
+    into a list of (language, weight) tuples
+    """
+    languageMix = []
+    for item in languages.split(','):
+        language, separator, weight = item.partition(':')
+        if language not in SYNTHETIC_WORDS:
+            raise ValueError('No synthetic words for language "' + language + '". Valid languages are: ' + str(sorted(SYNTHETIC_WORDS.keys())))
+        languageMix.append((language, int(weight) if separator else 1))
+    return languageMix
+
+def choose_language(rng, languageMix):
+    """Choose a language from a language mix, according to the weights
+    """
+    position = rng.randint(1, sum(weight for language, weight in languageMix))
+    for language, weight in languageMix:
+        position -= weight
+        if position <= 0:
+            return language
+
+def make_synthetic_sentence(rng, words):
+    """Generate a random sentence from a word list.
+    Words at the start of the list are chosen more often,
+    so word frequencies are roughly Zipf-like.
+    """
+    wordCount = rng.randint(4, 20)
+    sentenceWords = [words[int(len(words) * rng.random() ** 2)] for _ in range(wordCount)]
+    sentenceWords[0] = sentenceWords[0][0].upper() + sentenceWords[0][1:]
+    if wordCount > 8 and rng.random() < 0.5:
+        commaIndex = rng.randint(2, wordCount - 3)
+        sentenceWords[commaIndex] += u','
+    return u' '.join(sentenceWords) + rng.choice(SYNTHETIC_SENTENCE_ENDINGS)
+
+def make_synthetic_text(rng, language, sentenceCount):
+    """Generate a random text with sentenceCount sentences
+    """
+    words = SYNTHETIC_WORDS[language].split()
+    sentences = [make_synthetic_sentence(rng, words) for _ in range(sentenceCount)]
+    paragraphs = [u' '.join(sentences[index:index + 5]) for index in range(0, sentenceCount, 5)]
+    return u'\n\n'.join(paragraphs) + u'\n'
+
+def generate_corpus(folder, config):
+    """Generate a deterministic synthetic corpus in a folder.
+    Every file gets its own random generator, seeded from the
+    seed and its index, so a file's contents do not depend on the
+    number of files. Files are named with their language tag,
+    e.g. "synthetic_0003.en_US.txt".
+    Return a list of (filename, language) tuples.
+    """
+    languageMix = parse_language_mix(config['languages'])
+    files = []
+    for fileIndex in range(config['files']):
+        rng = random.Random(config['seed'] * 1000003 + fileIndex)
+        language = choose_language(rng, languageMix)
+        text = make_synthetic_text(rng, language, config['sentences'])
+        filename = os.path.join(folder, 'synthetic_{:04d}.{}.txt'.format(fileIndex, language))
+        with open(filename, 'wb') as textFile:
+            textFile.write(text.encode('utf-8'))
+        files.append((filename, language))
+    return files
+
+
+####################################
+#
+# Suite
+#
+####################################
+
+# Stages timed by the benchmark suite, in order
+SUITE_STAGES = [
+    'read',
+    'tokenizeSentences',
+    'tokenizeWords',
+    'tokenizeSyllables',
+    'computeMetadata',
+    'computeWordTable',
+    'readability',
+    'writeJson',
+    'writeCsv',
+    'csmLearn',
+    'csmEvaluate'
+]
+
+class StageTimer():
+    """Accumulates the run time of named stages
+    """
+
+    def __init__(self, stages):
+        self.times = dict((stage, 0.0) for stage in stages)
+        self.stage = None
+        self.timeStart = 0.0
+
+    def start(self, stage):
+        self.stage = stage
+        self.timeStart = time.time()
+
+    def stop(self):
+        self.times[self.stage] += time.time() - self.timeStart
+        self.stage = None
+
+def tokenize_timed(text, lang, timer):
+    """Tokenize a text like tokenize.tokenize_text(),
+    timing sentence, word and syllable tokenization separately
+    """
+    from textlib import tokenize
+
+    timer.start('tokenizeSentences')
+    sentences = tokenize.split_sentences(text)
+    timer.stop()
+
+    timer.start('tokenizeWords')
+    sentenceWords = [[word for word in tokenize.tokenize_sentence_to_words(sentence) if tokenize.is_word(word)] for sentence in sentences]
+    timer.stop()
+
+    timer.start('tokenizeSyllables')
+    textData = {
+        'sentences' : [{
+            'sentence' : sentence,
+            'words' : [{ 'word' : word, 'syllables' : tokenize.tokenize_word_to_syllables(word, lang=lang) } for word in words]
+        } for sentence, words in zip(sentences, sentenceWords)]
+    }
+    timer.stop()
+
+    return textData
+
+def benchmark_suite(args):
+    """Generate a synthetic corpus and time every stage
+    of analysis and Common Sense Matrix learning
+    """
+    from textlib import tokenize, analyze, hashes, csm
+
+    config = parse_suite_args(args)
+    folder = config['folder']
+    temporaryFolder = None
+    if folder is None:
+        temporaryFolder = tempfile.mkdtemp(prefix='texttools_suite_')
+        folder = temporaryFolder
+    elif not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    try:
+        print('Generating synthetic corpus in ' + folder + '...')
+        files = generate_corpus(folder, config)
+
+        timer = StageTimer(SUITE_STAGES)
+        tokenize.syllableCache.clear()
+        corpusSize = {
+            'files' : len(files),
+            'bytes' : 0,
+            'sentences' : 0,
+            'words' : 0
+        }
+
+        for filename, lang in files:
+            print('Analyzing ' + fileoperations.shorten_filename(filename) + '...')
+            timer.start('read')
+            rawText = fileoperations.read_text_file(filename)
+            text = rawText.decode('utf-8')
+            timer.stop()
+
+            textData = tokenize_timed(text, lang, timer)
+
+            timer.start('computeMetadata')
+            analyze.compute_metadata(textData)
+            timer.stop()
+
+            timer.start('computeWordTable')
+            wordTable = analyze.compute_word_table(textData)
+            timer.stop()
+
+            timer.start('readability')
+            textData['readingEase'] = analyze.compute_reading_ease_indices(textData)
+            timer.stop()
+
+            metaheader = analyze.metadata_header(filename, text, language=lang, digests=hashes.get_bytes_digests(rawText), tokenizer='nltk')
+            textData['_meta'] = metaheader
+            wordTable['_meta'] = metaheader
+
+            timer.start('writeJson')
+            analyze.write_metadata(textData, analyze.make_metadata_filename(filename))
+            timer.stop()
+
+            timer.start('writeCsv')
+            analyze.write_csv(wordTable, analyze.make_wordtable_filename(filename))
+            timer.stop()
+
+            corpusSize['bytes'] += len(rawText)
+            corpusSize['sentences'] += textData['sentenceCount']
+            corpusSize['words'] += textData['wordCount']
+
+        commonSenseMatrix = csm.CommonSenseMatrix()
+        commonSenseMatrix.init()
+        timer.start('csmLearn')
+        commonSenseMatrix.learn(folder)
+        timer.stop()
+
+        timer.start('csmEvaluate')
+        commonSenseMatrix.evaluate(folder, analyze.make_wordtable_filename(files[0][0]))
+        timer.stop()
+    finally:
+        if temporaryFolder is not None:
+            shutil.rmtree(temporaryFolder, ignore_errors=True)
+
+    print('')
+    totalTime = sum(timer.times.itervalues())
+    for stage in SUITE_STAGES:
+        stageTime = timer.times[stage]
+        print('{:<18} {:8.3f}s {:6.1%}'.format(stage, stageTime, stageTime / totalTime if totalTime > 0.0 else 0.0))
+    print('{:<18} {:8.3f}s, {:.0f} words/s'.format('total', totalTime, corpusSize['words'] / totalTime if totalTime > 0.0 else 0.0))
+
+    config['folder'] = config['folder'] if temporaryFolder is None else None
+    return {
+        'benchmark' : 'suite',
+        'python' : sys.version,
+        'analyze_version' : analyze.ANALYZE_VERSION,
+        'config' : config,
+        'corpus' : corpusSize,
+        'stages' : dict((stage, timer.times[stage]) for stage in SUITE_STAGES),
+        'total' : totalTime,
+        'syllableCache' : tokenize.syllableCache.stats()
+    }
+
+def benchmark_corpus(args):
+    """Only generate the synthetic corpus of the suite
+    """
+    config = parse_suite_args(args)
+    if config['folder'] is None:
+        print('ERROR: The corpus benchmark needs a folder=PATH argument!')
+        return None
+    if not os.path.isdir(config['folder']):
+        os.makedirs(config['folder'])
+    files = generate_corpus(config['folder'], config)
+    print('Generated ' + str(len(files)) + ' files in ' + config['folder'])
+    return None
+
+
+####################################
+#
+# Process / flow
+#
+####################################
+
+def start(mode, args, outputFile=None):
+    mode = mode.lower()
+    if mode not in BENCHMARK_MODES:
+        print('ERROR: Invalid MODE argument. Valid arguments are: ' + str(BENCHMARK_MODES))
+        return
+    if mode == 'help':
+        print(BENCHMARK_HELP)
+        return
+
+    print('Running ' + mode + ' benchmark...')
+    if mode == 'startup':
+        results = benchmark_startup()
+    elif mode == 'engine':
+        results = benchmark_engine(args)
+    elif mode == 'stats':
+        results = benchmark_stats(args)
+    elif mode in ('suite', 'corpus'):
+        try:
+            results = benchmark_suite(args) if mode == 'suite' else benchmark_corpus(args)
+        except ValueError as e:
+            print('ERROR: ' + str(e))
+            return
+
+    if results is None:
+        return
+
+    if outputFile is not None:
+        print('Writing benchmark results to ' + outputFile)
+        fileoperations.write_json(results, outputFile)
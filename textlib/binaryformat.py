@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import json
+import struct
+
+####################################
+#
+# Binary metadata file format
+#
+# A file starts with MAGIC and the format version (1 byte),
+# followed by sections. Each section starts with its type (1 byte)
+# and the length of its payload (4 bytes, little endian).
+# Payloads are compact JSON documents, encoded as UTF-8.
+#
+#   SECTION_HEADER     : The '_meta' header
+#   SECTION_SUMMARY    : All other text-level values, except
+#                        sentences and vocabulary
+#   SECTION_VOCABULARY : The 'vocabulary' table, if there is one
+#   SECTION_SENTENCE   : One sentence (one section per sentence)
+#   SECTION_END        : End of file, empty payload
+#
+# Header and summary always come first, so they can be read
+# without decoding (or even reading) the vocabulary or any sentences.
+#
+####################################
+
+MAGIC = b'TTMD'
+FORMAT_VERSION = 2
+
+SECTION_END = 0
+SECTION_HEADER = 1
+SECTION_SUMMARY = 2
+SECTION_SENTENCE = 3
+SECTION_VOCABULARY = 4
+
+# Section type and payload length
+SECTION_STRUCT = struct.Struct('<BI')
+
+
+def encode_payload(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def decode_payload(payload):
+    return json.loads(payload.decode('utf-8'))
+
+
+class BinaryWriter():
+    """Writes a binary metadata file section by section
+    """
+
+    def __init__(self, fileObject):
+        self.fileObject = fileObject
+        self.fileObject.write(MAGIC + struct.pack('<B', FORMAT_VERSION))
+
+    def write_section(self, sectionType, data):
+        payload = encode_payload(data) if data is not None else b''
+        self.fileObject.write(SECTION_STRUCT.pack(sectionType, len(payload)))
+        self.fileObject.write(payload)
+
+    def write_header(self, meta):
+        self.write_section(SECTION_HEADER, meta)
+
+    def write_summary(self, summary):
+        self.write_section(SECTION_SUMMARY, summary)
+
+    def write_vocabulary(self, vocabulary):
+        self.write_section(SECTION_VOCABULARY, vocabulary)
+
+    def write_sentence(self, sentence):
+        self.write_section(SECTION_SENTENCE, sentence)
+
+    def close(self):
+        self.write_section(SECTION_END, None)
+
+
+def iter_sections(fileObject, decodeTypes=None):
+    """Yield (sectionType, data) for all sections of a binary metadata file.
+    Only payloads of the section types in decodeTypes are read and decoded
+    (all, if decodeTypes is None); data is None for all others.
+    """
+    magic = fileObject.read(len(MAGIC) + 1)
+    if magic[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a binary metadata file')
+    version = struct.unpack('<B', magic[len(MAGIC):])[0]
+    if version != FORMAT_VERSION:
+        raise ValueError('Unsupported binary metadata format version ' + str(version))
+
+    while True:
+        sectionData = fileObject.read(SECTION_STRUCT.size)
+        if len(sectionData) < SECTION_STRUCT.size:
+            raise ValueError('Binary metadata file is truncated')
+        (sectionType, length) = SECTION_STRUCT.unpack(sectionData)
+        if sectionType == SECTION_END:
+            return
+
+        if decodeTypes is None or sectionType in decodeTypes:
+            yield (sectionType, decode_payload(fileObject.read(length)))
+        else:
+            fileObject.seek(length, 1)
+            yield (sectionType, None)
+
+
+def write_binary(data, filename, sentences=None):
+    """Export a textData dictionary as binary metadata file.
+    sentences can be any iterable of sentences to write
+    instead of data['sentences'].
+    """
+    if sentences is None:
+        sentences = data.get('sentences', [])
+    with open(filename, 'wb') as binaryFile:
+        writer = BinaryWriter(binaryFile)
+        writer.write_header(data.get('_meta', {}))
+        writer.write_summary(dict((key, value) for key, value in data.iteritems() if key not in ('_meta', 'sentences', 'vocabulary')))
+        if 'vocabulary' in data:
+            writer.write_vocabulary(data['vocabulary'])
+        for sentence in sentences:
+            writer.write_sentence(sentence)
+        writer.close()
+
+
+def load_binary_header(filename):
+    """Load only the '_meta' header of a binary metadata file
+    """
+    with open(filename, 'rb') as binaryFile:
+        for (sectionType, data) in iter_sections(binaryFile, decodeTypes=(SECTION_HEADER,)):
+            if sectionType == SECTION_HEADER:
+                return data
+    return {}
+
+
+def load_binary_summary(filename):
+    """Load a binary metadata file without its vocabulary and sentences
+    """
+    data = {}
+    with open(filename, 'rb') as binaryFile:
+        for (sectionType, sectionData) in iter_sections(binaryFile, decodeTypes=(SECTION_HEADER, SECTION_SUMMARY)):
+            if sectionType == SECTION_HEADER:
+                data['_meta'] = sectionData
+            elif sectionType == SECTION_SUMMARY:
+                data.update(sectionData)
+            else:
+                break
+    return data
+
+
+def iter_binary_sentences(filename):
+    """Yield the sentences of a binary metadata file, one at a time
+    """
+    with open(filename, 'rb') as binaryFile:
+        for (sectionType, data) in iter_sections(binaryFile, decodeTypes=(SECTION_SENTENCE,)):
+            if sectionType == SECTION_SENTENCE:
+                yield data
+
+
+def load_binary(filename):
+    """Load a complete binary metadata file,
+    in the same layout as the JSON metadata file
+    """
+    data = {}
+    sentences = []
+    with open(filename, 'rb') as binaryFile:
+        for (sectionType, sectionData) in iter_sections(binaryFile):
+            if sectionType == SECTION_HEADER:
+                data['_meta'] = sectionData
+            elif sectionType == SECTION_SUMMARY:
+                data.update(sectionData)
+            elif sectionType == SECTION_VOCABULARY:
+                data['vocabulary'] = sectionData
+            elif sectionType == SECTION_SENTENCE:
+                sentences.append(sectionData)
+    data['sentences'] = sentences
+    return data
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from array import array
+
+
+# Type code for all integer columns
+COLUMN_TYPECODE = 'i'
+
+
+class CompactText():
+    """Column-based storage of a tokenized text.
+
+    Instead of one dictionary per word and sentence, words are interned
+    (each distinct word is stored once, with its syllables), and tokens
+    are stored as integer columns:
+
+    tokenWordIds        : Word id of each token
+    tokenSyllableCounts : Syllable count of each token
+    tokenCharCounts     : Char count of each token
+    sentenceOffsets     : Index of the first token of each sentence,
+                          plus the total token count as last element
+    """
+
+    def __init__(self):
+        # Interned words
+        self.wordIds = {}
+        self.words = []
+        self.wordSyllables = []
+
+        # Sentences
+        self.sentences = []
+        self.sentenceOffsets = array(COLUMN_TYPECODE, [0])
+
+        # Tokens
+        self.tokenWordIds = array(COLUMN_TYPECODE)
+        self.tokenSyllableCounts = array(COLUMN_TYPECODE)
+        self.tokenCharCounts = array(COLUMN_TYPECODE)
+
+    def intern_word(self, word, syllables):
+        """Return the id of a word, adding it to the
+        interned words if it is not known yet.
+        """
+        wordId = self.wordIds.get(word)
+        if wordId is None:
+            wordId = len(self.words)
+            self.wordIds[word] = wordId
+            self.words.append(word)
+            self.wordSyllables.append(tuple(syllables))
+        return wordId
+
+    def add_sentence(self, sentenceData):
+        """Append a sentence in the layout yielded by
+        tokenize.iter_tokenize_text()
+        """
+        for wordData in sentenceData['words']:
+            word = wordData['word']
+            syllables = wordData['syllables']
+            self.tokenWordIds.append(self.intern_word(word, syllables))
+            self.tokenSyllableCounts.append(len(syllables))
+            self.tokenCharCounts.append(len(word))
+
+        self.sentences.append(sentenceData['sentence'])
+        self.sentenceOffsets.append(len(self.tokenWordIds))
+
+    def sentence_count(self):
+        return len(self.sentences)
+
+    def token_count(self):
+        return len(self.tokenWordIds)
+
+    def iter_sentences(self):
+        """Yield all sentences in the layout yielded by
+        tokenize.iter_tokenize_text(), one at a time.
+        """
+        words = self.words
+        wordSyllables = self.wordSyllables
+        tokenWordIds = self.tokenWordIds
+        offsets = self.sentenceOffsets
+        for sentenceIndex, sentence in enumerate(self.sentences):
+            wordDataList = []
+            for tokenIndex in xrange(offsets[sentenceIndex], offsets[sentenceIndex + 1]):
+                wordId = tokenWordIds[tokenIndex]
+                wordDataList.append({
+                    'word' : words[wordId],
+                    'syllables' : list(wordSyllables[wordId])
+                })
+            yield {
+                'sentence' : sentence,
+                'words' : wordDataList
+            }
+
+
+def compact_sentences(sentences):
+    """Build a CompactText from an iterable of sentences
+    in the layout yielded by tokenize.iter_tokenize_text()
+    """
+    compactText = CompactText()
+    for sentenceData in sentences:
+        compactText.add_sentence(sentenceData)
+    return compactText
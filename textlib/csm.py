@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 import os
 import operator
-from textlib import analyze, fileoperations
+from textlib import fileoperations, store, profiling
 
 ####################################
 #
@@ -22,6 +22,8 @@ Steffen Lepa and Frank Willeke in 2005.
 This will parse the metadata in a folder and create a common sense matrix of it.
 This requires metadata to be present in that folder. Metadata can be created
 using the --analyse option.
+With --store STOREFILE, the word counts are taken from a corpus store created
+with the --analyze and --store options instead, and the result is written to FOLDER.
 
 --csm evaluate MATRIXFILE ANALYZEFILE
 This will use the Common Sense Matrix specified by the path MATRIXFILE and
@@ -38,12 +40,13 @@ def path_to_csm_filename(folderPath):
     return os.path.join(folderPath, "_" + os.path.basename(folderPath) + '_csm.json')
 
 
-def wordtable_csv_to_worddata(wordTable):
-    """Transform the rows of a word table to
-    a Dict that associates words with their counts
+def wordtable_csv_to_worddata(wordTableRows):
+    """Transform the (word, count, frequency) rows of a word table
+    (see fileoperations.iter_wordtable_csv()) to a Dict that
+    associates words with their counts
     """
     wordBasedData = {}
-    for word, wordCount in zip(wordTable['Word'], wordTable['Count']):
+    for word, wordCount, wordFrequency in wordTableRows:
         # Take word and count value from CSV data
         wordBasedData[word] = {
             'count': wordCount#,
@@ -121,82 +124,60 @@ class CommonSenseMatrix():
         self.resultTable = None
 
     
-    def learn(self, sourceFolder):
-        """
+    def learn(self, sourceFolder, recursive=False, include=None, exclude=None, storeFile=None):
+        """Learn word frequencies from all word table .csv files in a folder.
+        recursive, include and exclude are passed to fileoperations.iter_files().
+        If storeFile is given, learn from the word counts in that
+        corpus store instead, and write the result to the folder.
         """
 
         if not os.path.isdir(sourceFolder):
             print('ERROR: "' + sourceFolder + '" is not a valid folder!')
             return
 
+        if storeFile is not None:
+            return self.learn_from_store(sourceFolder, storeFile)
+
         # Process files in folder
         fileCount = 0
+        filesInFolder = 0
         inputFileSuffix = '_wordfrequencies.csv'
-        filesInFolder = fileoperations.count_files(sourceFolder, inputFileSuffix)
-        if filesInFolder > 0:
-            totalWordData = {}
-            print('Learning from data in ' + sourceFolder + '...')
-            for file in os.listdir(sourceFolder):
-                if (not file.startswith('_')) and file.endswith(inputFileSuffix):
-                    filename = os.path.join(sourceFolder, file)
-                    # Open word table .csv file
-                    try:
-                        wordTable = fileoperations.load_csv(filename, delimiter=',', quotechar='"', firstColumnAsTitle=True, minimumRowLength=3)
-                        print('Word data loaded from ' + filename)
-                    except:
-                        print('ERROR: Could not load word table from ' +
-                            fileoperations.shorten_filename(filename) + '!')
-                        return False
-
-                    # Transform word table (row-based plain table) to word data (word-associated counts)
-                    try:
-                        wordData = wordtable_csv_to_worddata(wordTable)
-                    except:
-                        print('ERROR: Could not transform word table to word data!')
-                        return False
-
-                    # Merge word data of this file into totalWordData
-                    try:
-                        add_worddata(totalWordData, wordData)
-                    except:
-                        print('ERROR: Could not merge word data')
-                        return False
-
-                    fileCount += 1
+        totalWordData = {}
+        for entry in fileoperations.iter_files(sourceFolder, inputFileSuffix, recursive=recursive, include=include, exclude=exclude):
+            filesInFolder += 1
+            if filesInFolder == 1:
+                print('Learning from data in ' + sourceFolder + '...')
+
+            # Skip folder-level word tables
+            if entry.name.startswith('_'):
+                continue
+            filename = entry.path
+
+            # Read word table .csv file row by row into word data (word-associated counts)
+            try:
+                with profiling.profiler.stage('csmLoad'):
+                    wordData = wordtable_csv_to_worddata(fileoperations.iter_wordtable_csv(filename))
+                print('Word data loaded from ' + filename)
+            except:
+                print('ERROR: Could not load word table from ' +
+                    fileoperations.shorten_filename(filename) + '!')
+                return False
+
+            # Merge word data of this file into totalWordData
+            try:
+                with profiling.profiler.stage('csmMerge'):
+                    add_worddata(totalWordData, wordData)
+            except:
+                print('ERROR: Could not merge word data')
+                return False
+
+            fileCount += 1
 
+        if filesInFolder > 0:
             print('Learned from ' + str(fileCount) + ' of ' + str(filesInFolder) + ' files.')
 
             if fileCount > 0:
-                # Transform totalWordData into data list, sorted descending by count
-                try:
-                    sortedWordData = worddata_to_sorted(totalWordData, descending=True)
-                except:
-                    print('ERROR: Could not sort word data!')
-                    return False
-
-                # Get total word counts
-                (totalWordCount, uniqueWordCount) = get_total_word_counts(sortedWordData)
-                print('Learned ' + str(totalWordCount) + ' words in total, ' + str(uniqueWordCount) + ' unique.')
-
-                # Calculate word frequencies
-                try:
-                    finalWordData = calculate_word_frequencies(sortedWordData, totalWordCount)
-                except:
-                    print('ERROR: Could not calculate word frequencies!')
-                    return False
-
-                csmData = {}
-                csmData['meta'] = {
-                    'source' : sourceFolder,
-                    'total_count': totalWordCount,
-                    'unique_count' : uniqueWordCount
-                }
-                csmData['words'] = finalWordData
-
-                # Store sortedWordData as JSON
-                csmFilePath = path_to_csm_filename(sourceFolder)
-                print('Writing Common Sense Matrix data to ' + csmFilePath + " ...")
-                CommonSenseMatrix.write_csm(csmFilePath, csmData)
+                return self.save_worddata(sourceFolder, totalWordData)
             else:
                 print('STRANGE: Did not learn from any of the files.')
         else:
@@ -206,6 +187,71 @@ class CommonSenseMatrix():
         return True
 
 
+    def learn_from_store(self, sourceFolder, storeFile):
+        """Learn word frequencies from all files in a corpus store
+        """
+        if not os.path.isfile(storeFile):
+            print('ERROR: "' + storeFile + '" is not a valid corpus store!')
+            return False
+
+        try:
+            with profiling.profiler.stage('csmLoad'):
+                corpusStore = store.CorpusStore(storeFile)
+                fileCount = corpusStore.file_count()
+                totalWordData = dict(corpusStore.word_counts())
+                corpusStore.close()
+        except:
+            print('ERROR: Could not load word data from corpus store ' + storeFile + '!')
+            return False
+
+        if fileCount == 0 or len(totalWordData) == 0:
+            print('No data found to learn from.')
+            print('The corpus store must contain files analyzed with the "--analyze" and "--store" options.')
+            return True
+
+        print('Learned from ' + str(fileCount) + ' files in ' + storeFile + '.')
+        return self.save_worddata(sourceFolder, totalWordData)
+
+
+    def save_worddata(self, sourceFolder, totalWordData):
+        """Compute word frequencies from learned word counts
+        and write them as Common Sense Matrix data to the folder
+        """
+        # Transform totalWordData into data list, sorted descending by count
+        try:
+            sortedWordData = worddata_to_sorted(totalWordData, descending=True)
+        except:
+            print('ERROR: Could not sort word data!')
+            return False
+
+        # Get total word counts
+        (totalWordCount, uniqueWordCount) = get_total_word_counts(sortedWordData)
+        print('Learned ' + str(totalWordCount) + ' words in total, ' + str(uniqueWordCount) + ' unique.')
+
+        # Calculate word frequencies
+        try:
+            finalWordData = calculate_word_frequencies(sortedWordData, totalWordCount)
+        except:
+            print('ERROR: Could not calculate word frequencies!')
+            return False
+
+        csmData = {}
+        csmData['meta'] = {
+            'source' : sourceFolder,
+            'total_count': totalWordCount,
+            'unique_count' : uniqueWordCount
+        }
+        csmData['words'] = finalWordData
+
+        # Store sortedWordData as JSON
+        csmFilePath = path_to_csm_filename(sourceFolder)
+        print('Writing Common Sense Matrix data to ' + csmFilePath + " ...")
+        with profiling.profiler.stage('csmWrite'):
+            CommonSenseMatrix.write_csm(csmFilePath, csmData)
+
+        return True
+
+
     def evaluate(self, sourcePath, evalPath):
         """Evaluate CSM data by comparing word frequencies of an exemplary text against the frequencies from the CSM file
         """
@@ -237,15 +283,17 @@ class CommonSenseMatrix():
 
         # Load Common Sense Matrix data
         try:
-            csmData = CommonSenseMatrix.read_csm(csmFilename)
+            with profiling.profiler.stage('csmLoad'):
+                csmData = CommonSenseMatrix.read_csm(csmFilename)
             print('Common Sense Matrix data loaded from ' + csmFilename)
         except:
             print('ERROR: Could not load Common Sense Matrix from ' + csmFilename)
             return False
 
-        # Open evaluate word table .csv file
+        # Read evaluate word table .csv file row by row into word data (word-associated counts)
         try:
-            evalWordTable = fileoperations.load_csv(evalFilename, delimiter=',', quotechar='"', firstColumnAsTitle=True, minimumRowLength=3)
+            with profiling.profiler.stage('csmLoad'):
+                evalWordData = wordtable_csv_to_worddata(fileoperations.iter_wordtable_csv(evalFilename))
             print('Word data loaded from ' + evalFilename)
         except:
             print('ERROR: Could not load word table from ' + fileoperations.shorten_filename(evalFilename) + '!')
@@ -253,13 +301,6 @@ class CommonSenseMatrix():
 
         print('Solving Common Sense Matrix...')
 
-        # Transform word table (row-based plain table) to word data (word-associated counts)
-        try:
-            evalWordData = wordtable_csv_to_worddata(evalWordTable)
-        except:
-            print('ERROR: Could not transform word table to word data!')
-            return False
-
         # Merge word data of this file into totalWordData
         finalEvalWordData = {}
         try:
@@ -286,7 +327,8 @@ class CommonSenseMatrix():
             return False
 
         #try:
-        resultTable = diff_worddata_tables(csmData['words'], sortedFinalEvalWordData)
+        with profiling.profiler.stage('csmEvaluate'):
+            resultTable = diff_worddata_tables(csmData['words'], sortedFinalEvalWordData)
         #except:
         #    print('ERROR: Could not diff CSM data against evaluation word data!')
         #    return False
@@ -324,7 +366,7 @@ class CommonSenseMatrix():
         fileoperations.write_json(csm, filePath)
 
 
-def start(mode, args):
+def start(mode, args, recursive=False, include=None, exclude=None, storeFile=None):
     print('Common Sense Matrix version ' + CSM_VERSION)
     print('')
     mode = mode.lower()
@@ -338,7 +380,7 @@ def start(mode, args):
     csm = CommonSenseMatrix()
     csm.init()
     if mode == 'learn':
-        csm.learn(args[0])
+        csm.learn(args[0], recursive=recursive, include=include, exclude=exclude, storeFile=storeFile)
         return
     elif mode == 'evaluate':
         csm.evaluate(args[0], args[1])
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import stat
+import json
+import time
+import signal
+import threading
+import multiprocessing
+import BaseHTTPServer
+import SocketServer
+from textlib import analyze, hashes, fileoperations
+
+####################################
+#
+# Constants
+#
+####################################
+
+# Default host of the HTTP server; only local clients can connect
+DEFAULT_HOST = '127.0.0.1'
+
+# Prefix of addresses that refer to a Unix socket
+UNIX_SOCKET_PREFIX = 'unix:'
+
+# Maximum size of a request body in bytes
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+DAEMON_HELP = """Analysis server that keeps NLTK and PyHyphen loaded.
+
+--serve ADDRESS
+ADDRESS is a port ("8080"), a host and port ("127.0.0.1:8080"),
+or a Unix socket ("unix:/tmp/texttools.sock"). An existing socket
+at that path is replaced; if the path is anything else, the server
+does not start.
+--language, --tokenizer and --jobs set the default language,
+the tokenizer and the number of worker processes.
+
+POST /analyze
+Body: JSON object with either "text" (the text to analyze) or "path"
+(the path of a UTF-8 text file on the server), and optionally "language"
+and "sentences" (true to include the per-sentence data).
+Returns a JSON object with "textData", "wordTable" and "readingEase".
+
+GET /status
+Returns the analyze version, number of workers and served requests.
+"""
+
+
+####################################
+#
+# Worker
+#
+####################################
+
+def init_daemon_worker(lang, backend):
+    """Warm up a pool worker. Workers ignore Ctrl+C,
+    the server terminates them when it stops.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    analyze.init_worker(lang, backend)
+
+
+def analyze_request(request):
+    """Analyze the text or file of a request in a pool worker.
+    Return a tuple of HTTP status code and response dictionary.
+    """
+    try:
+        lang = request['language']
+        if 'text' in request:
+            text = request['text']
+            filename = '<text>'
+            digests = hashes.get_bytes_digests(text.encode('utf-8'))
+        else:
+            filename = request['path']
+            rawText = fileoperations.read_text_file(filename)
+            digests = hashes.get_bytes_digests(rawText)
+            text = rawText.decode('utf-8')
+            del rawText
+
+        (textData, wordTable) = analyze.process_text(text, lang=lang, backend=request['backend'])
+        textData['_meta'] = analyze.metadata_header(filename, text, language=lang, digests=digests, tokenizer=request['backend'])
+        if not request.get('sentences', False):
+            textData.pop('sentences', None)
+
+        return (200, {
+            'textData' : textData,
+            'wordTable' : wordTable['words'],
+            'readingEase' : textData['readingEase']
+        })
+    except Exception as e:
+        return (500, { 'error' : repr(e) })
+
+
+####################################
+#
+# Server
+#
+####################################
+
+class AnalysisRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handles HTTP requests to the analysis server.
+    Each request runs in its own thread and waits for a pool worker.
+    """
+
+    def send_json(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, { 'error' : 'Unknown path ' + self.path })
+            return
+        server = self.server
+        self.send_json(200, {
+            'analyze_version' : analyze.ANALYZE_VERSION,
+            'language' : server.lang,
+            'tokenizer' : server.backend,
+            'workers' : server.jobs,
+            'requests' : server.requestCount,
+            'uptime' : time.time() - server.timeStarted
+        })
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self.send_json(404, { 'error' : 'Unknown path ' + self.path })
+            return
+
+        # Parse request
+        try:
+            length = int(self.headers.getheader('Content-Length', 0))
+            if length > MAX_REQUEST_SIZE:
+                self.send_json(413, { 'error' : 'Request is larger than ' + str(MAX_REQUEST_SIZE) + ' bytes' })
+                return
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(request, dict) or ('text' in request) == ('path' in request):
+                raise ValueError('Request must be a JSON object with either "text" or "path"')
+        except ValueError as e:
+            self.send_json(400, { 'error' : str(e) })
+            return
+
+        server = self.server
+        request.setdefault('language', server.lang)
+        request['backend'] = server.backend
+        with server.lock:
+            server.requestCount += 1
+
+        (status, response) = server.pool.apply(analyze_request, (request,))
+        self.send_json(status, response)
+
+
+class AnalysisServerMixIn(SocketServer.ThreadingMixIn):
+    """Threaded analysis server with a pool of warm worker processes
+    """
+    daemon_threads = True
+
+    def init_analysis(self, address, pool, lang, backend, jobs):
+        self.address = address
+        self.pool = pool
+        self.lang = lang
+        self.backend = backend
+        self.jobs = jobs
+        self.requestCount = 0
+        self.lock = threading.Lock()
+        self.timeStarted = time.time()
+
+
+class AnalysisHTTPServer(AnalysisServerMixIn, BaseHTTPServer.HTTPServer):
+    pass
+
+
+class AnalysisUnixServer(AnalysisServerMixIn, SocketServer.UnixStreamServer):
+
+    def get_request(self):
+        # Unix socket clients have no address, log the server's instead
+        (request, clientAddress) = self.socket.accept()
+        return (request, (self.address, 0))
+
+
+def parse_address(address):
+    """Parse a server address. Return ('unix', path)
+    or ('tcp', (host, port)).
+    """
+    if address.startswith(UNIX_SOCKET_PREFIX):
+        return ('unix', address[len(UNIX_SOCKET_PREFIX):])
+    host, separator, port = address.rpartition(':')
+    return ('tcp', (host or DEFAULT_HOST, int(port)))
+
+
+def is_socket(path):
+    """Return True if path is a Unix socket (and not a link to one)
+    """
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+
+def serve(address, lang='de_DE', backend='nltk', jobs=1):
+    """Run the analysis server until it is interrupted
+    """
+    if address.lower() == 'help':
+        print(DAEMON_HELP)
+        return
+
+    try:
+        (family, serverAddress) = parse_address(address)
+    except ValueError:
+        print('ERROR: Invalid server address "' + address + '". Use PORT, HOST:PORT or unix:PATH')
+        return
+
+    # A stale socket of an earlier server is replaced,
+    # but nothing else is removed
+    if family == 'unix' and os.path.lexists(serverAddress) and not is_socket(serverAddress):
+        print('ERROR: ' + serverAddress + ' exists and is not a socket!')
+        return
+
+    # Start the workers before the server socket is opened,
+    # so they do not inherit it
+    print('Starting ' + str(jobs) + ' analysis workers (' + lang + ', ' + backend + ' tokenizer)...')
+    pool = multiprocessing.Pool(processes=jobs, initializer=init_daemon_worker, initargs=(lang, backend))
+
+    try:
+        if family == 'unix':
+            if is_socket(serverAddress):
+                os.remove(serverAddress)
+            server = AnalysisUnixServer(serverAddress, AnalysisRequestHandler)
+        else:
+            if serverAddress[0] not in (DEFAULT_HOST, 'localhost'):
+                print('WARNING: Serving on ' + serverAddress[0] + '. Clients can analyze any file the server can read!')
+            server = AnalysisHTTPServer(serverAddress, AnalysisRequestHandler)
+    except:
+        pool.terminate()
+        raise
+    server.init_analysis(address, pool, lang, backend, jobs)
+
+    print('Serving on ' + address + '. Press Ctrl+C to stop.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Stopping server...')
+    finally:
+        server.server_close()
+        server.pool.terminate()
+        server.pool.join()
+        if family == 'unix' and is_socket(serverAddress):
+            os.remove(serverAddress)
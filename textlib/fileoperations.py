@@ -1,7 +1,30 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import os
+import fnmatch
 import json, csv
+import codecs
+import mmap
+from textlib import jsonstream
+
+# os.scandir() is part of Python since 3.5,
+# older versions need the scandir package
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Size of the raw chunks read by iter_text_file_chunks()
+TEXT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Column titles of word table .csv files
+WORDTABLE_COLUMNS = ['Word', 'Count', 'Frequency']
+
+# Column titles of n-gram table .csv files
+NGRAM_TABLE_COLUMNS = ['N', 'Ngram', 'Count', 'Error', 'Frequency']
 
 ####################################
 #
@@ -9,14 +32,86 @@ import json, csv
 #
 ####################################
 
-def count_files(path, extension):
-    """Count files in a folder that match a certain file extension
+class ListdirEntry():
+    """Minimal replacement for os.DirEntry,
+    used if scandir is not available
+    """
+
+    def __init__(self, folder, name):
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self._stat = None
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+    def is_file(self):
+        return os.path.isfile(self.path)
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def list_entries(path):
+    """Return the entries of a folder, sorted by name
+    """
+    if scandir is not None:
+        entries = list(scandir(path))
+    else:
+        entries = [ListdirEntry(path, name) for name in os.listdir(path)]
+    entries.sort(key=lambda entry: entry.name)
+    return entries
+
+
+def matches_patterns(relativePath, name, patterns):
+    """Return True if a relative path or a name
+    matches any of a list of glob patterns
+    """
+    for pattern in patterns:
+        if fnmatch.fnmatch(relativePath, pattern) or fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def iter_files(path, extensions, recursive=False, include=None, exclude=None):
+    """Walk a folder lazily and yield the os.DirEntry of every file
+    that ends with one of the extensions (a string or a tuple of strings).
+    The entries cache their stat info.
+
+    recursive : Also walk all subfolders
+    include   : List of glob patterns; if given, only files matching
+                one of them are yielded
+    exclude   : List of glob patterns; files and subfolders matching
+                one of them are skipped
+
+    Patterns are matched against the file or folder name, and against
+    its path relative to the walked folder, using "/" as separator.
+    Files are yielded in name order, folder by folder.
     """
-    count = 0
-    for file in os.listdir(path):
-        if file.endswith(extension):
-            count += 1
-    return count
+    if isinstance(extensions, list):
+        extensions = tuple(extensions)
+    include = include or []
+    exclude = exclude or []
+
+    folders = [(path, '')]
+    while len(folders) > 0:
+        (folder, relativeFolder) = folders.pop()
+        subFolders = []
+        for entry in list_entries(folder):
+            relativePath = relativeFolder + entry.name
+            if matches_patterns(relativePath, entry.name, exclude):
+                continue
+            if entry.is_dir():
+                if recursive:
+                    subFolders.append((entry.path, relativePath + '/'))
+            elif entry.name.endswith(extensions):
+                if len(include) == 0 or matches_patterns(relativePath, entry.name, include):
+                    yield entry
+
+        # Walk subfolders in name order
+        folders.extend(reversed(subFolders))
 
 
 def shorten_filename(full_path):
@@ -35,6 +130,43 @@ def read_text_file(filePath):
     return text
 
 
+def iter_text_file_chunks(filePath, chunkSize=TEXT_CHUNK_SIZE, encoding='utf-8', byteCallback=None):
+    """Read a text file in chunks of chunkSize bytes and yield
+    them as decoded unicode strings, so the whole file is never
+    held in memory. The file is memory-mapped if possible.
+    Characters split between two chunks are completed by an
+    incremental decoder. byteCallback, if given, is called
+    with each raw chunk (e.g. to compute digests).
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(filePath, 'rb') as textFile:
+        try:
+            fileMap = mmap.mmap(textFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # Empty files can not be mapped, read them normally
+            fileMap = None
+
+        try:
+            source = fileMap if fileMap is not None else textFile
+            while True:
+                rawChunk = source.read(chunkSize)
+                if len(rawChunk) == 0:
+                    break
+                if byteCallback is not None:
+                    byteCallback(rawChunk)
+                chunk = decoder.decode(rawChunk)
+                if len(chunk) > 0:
+                    yield chunk
+        finally:
+            if fileMap is not None:
+                fileMap.close()
+
+    # Raises an error if the file ends with an incomplete character
+    chunk = decoder.decode(b'', final=True)
+    if len(chunk) > 0:
+        yield chunk
+
+
 def load_json(filename):
     """Loads a JSON file
     """
@@ -43,31 +175,62 @@ def load_json(filename):
 
 
 def write_json(data, filename):
-    """Export data as structured JSON file
+    """Export data as structured JSON file. Dictionaries are
+    written item by item, without building the whole document
+    as one string first.
     """
-    jsonData = json.dumps(data, indent=4, sort_keys=True)
     with open(filename, 'wb') as jsonFile:
-        jsonFile.write(jsonData)
+        if isinstance(data, dict):
+            jsonstream.write_json(data, jsonFile)
+        else:
+            jsonFile.write(json.dumps(data, indent=4, sort_keys=True))
 
 
-def load_csv(filename, delimiter=',', quotechar='"', firstColumnAsTitle=True, minimumRowLength=3):
-    """
+def iter_wordtable_csv(filename):
+    """Yield (word, count, frequency) tuples from a word table .csv file,
+    one at a time, with words as unicode. Reads the long layout (a row of
+    WORDTABLE_COLUMNS, then one row per word) as well as the older wide
+    layout (one row each for all words, counts and frequencies).
     """
     with open(filename, 'rb') as csvFile:
-        csvReader = csv.reader(csvFile, delimiter=delimiter, quotechar=quotechar)
+        csvReader = csv.reader(csvFile, delimiter=',', quotechar='"')
 
-        if firstColumnAsTitle:
-            # Use first field of each row as key for a dictionary
-            # Put rest of rows into dictionary values, filtered by minimumRowLength
-            csvData = {}
+        # Skip meta rows
+        for row in csvReader:
+            if len(row) > 0 and row[0] == WORDTABLE_COLUMNS[0]:
+                break
+        else:
+            raise ValueError('No word table found in ' + filename)
+
+        if row == WORDTABLE_COLUMNS:
+            # Long layout
             for row in csvReader:
-                if minimumRowLength > 0 and len(row) < minimumRowLength:
-                    continue
-                csvData[row[0]] = row[1:]
-            return csvData
+                if len(row) == len(WORDTABLE_COLUMNS):
+                    yield (row[0].decode('utf-8'), int(row[1]), float(row[2]))
+        else:
+            # Wide layout
+            columns = { row[0] : row[1:] }
+            for row in csvReader:
+                if len(row) > 0:
+                    columns[row[0]] = row[1:]
+            for word, count, frequency in zip(*[columns[column] for column in WORDTABLE_COLUMNS]):
+                yield (word.decode('utf-8'), int(count), float(frequency))
+
 
+def iter_ngram_csv(filename):
+    """Yield (n, ngram, count, error, frequency) tuples from an n-gram
+    table .csv file, one at a time, with n-grams as unicode.
+    """
+    with open(filename, 'rb') as csvFile:
+        csvReader = csv.reader(csvFile, delimiter=',', quotechar='"')
+
+        # Skip meta rows
+        for row in csvReader:
+            if row == NGRAM_TABLE_COLUMNS:
+                break
         else:
-            # Simply read rows, filtered by minimumRowLength
-            # Return as list of rows
-            csvData = [row for row in csvReader if (minimumRowLength == 0 or len(row) >= minimumRowLength)]
-            return csvData
+            raise ValueError('No n-gram table found in ' + filename)
+
+        for row in csvReader:
+            if len(row) == len(NGRAM_TABLE_COLUMNS):
+                yield (int(row[0]), row[1].decode('utf-8'), int(row[2]), int(row[3]), float(row[4]))
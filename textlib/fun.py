@@ -190,9 +190,9 @@ def assemble_text(wordList, bySyllables):
         text = text + ' '
     return text
 
-def sentence_to_wordlist(sentence, lang):
+def sentence_to_wordlist(sentence, lang, backend='nltk'):
     wordList = []
-    words = tokenize.tokenize_sentence_to_words(sentence)
+    words = tokenize.tokenize_sentence_to_words(sentence, backend=backend)
     for word in words:
         syllables = tokenize.tokenize_word_to_syllables(word, lang=lang)
         wordData = {
@@ -202,13 +202,13 @@ def sentence_to_wordlist(sentence, lang):
         wordList.append(wordData)
     return wordList
 
-def have_fun(sentence, lang='de_DE'):
+def have_fun(sentence, lang='de_DE', backend='nltk'):
     sentence = sentence.decode('utf-8')
     print(sentence)
 
     patternList = load_json(filename='./funpatterns.json')
     for pattern in patternList:
-        wordList = sentence_to_wordlist(sentence, lang=lang)
+        wordList = sentence_to_wordlist(sentence, lang=lang, backend=backend)
         print('')
         print('Pattern: ' + pattern['name'] + ' (' + pattern_actions_to_string(pattern) + ')')
         for patternItem in pattern['items']:
@@ -219,5 +219,5 @@ def have_fun(sentence, lang='de_DE'):
                 resultStr = assemble_text(shuffle_syllables(wordList, patternItem['pattern']), bySyllables=True)
             elif action == 'shuffle_vowels':
                 resultStr = assemble_text(shuffle_vowels(wordList, patternItem['pattern']), bySyllables=False)
-            wordList = sentence_to_wordlist(resultStr, lang=lang)
+            wordList = sentence_to_wordlist(resultStr, lang=lang, backend=backend)
         print(resultStr)
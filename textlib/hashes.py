@@ -2,28 +2,104 @@
 # -*- coding: utf-8 -*-
 
 import hashlib, zlib
+import mmap
 
+# BLAKE2 is part of hashlib since Python 3.6,
+# older versions need the pyblake2 package
+try:
+    from hashlib import blake2b
+except ImportError:
+    try:
+        from pyblake2 import blake2b
+    except ImportError:
+        blake2b = None
 
-def get_file_crc32(filename):
-    """Compute CRC32 checksum from a file
+
+# Digests that can be computed by MultiDigest
+DIGEST_ALGORITHMS = ['CRC32', 'MD5', 'BLAKE2']
+
+# Digests stored in metadata headers
+DEFAULT_DIGESTS = ('CRC32', 'MD5')
+
+# Size of the BLAKE2 digest in bytes
+BLAKE2_DIGEST_SIZE = 16
+
+# Buffer size for reading files that are not memory-mapped
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+class MultiDigest():
+    """Computes several digests of the same data in one pass
     """
-    prev = 0
-    with open(filename, 'rb') as theFile:
-        for chunk in theFile:
-            prev = zlib.crc32(chunk, prev)
 
-    return "%X"%(prev & 0xFFFFFFFF)
+    def __init__(self, algorithms=DEFAULT_DIGESTS):
+        for algorithm in algorithms:
+            if algorithm not in DIGEST_ALGORITHMS:
+                raise ValueError('Invalid digest "' + algorithm + '". Valid digests are: ' + str(DIGEST_ALGORITHMS))
+        if 'BLAKE2' in algorithms and blake2b is None:
+            raise ValueError('BLAKE2 requires Python 3.6 or the pyblake2 package')
+
+        self.crc32 = 0 if 'CRC32' in algorithms else None
+        self.hashes = {}
+        if 'MD5' in algorithms:
+            self.hashes['MD5'] = hashlib.md5()
+        if 'BLAKE2' in algorithms:
+            self.hashes['BLAKE2'] = blake2b(digest_size=BLAKE2_DIGEST_SIZE)
 
-def get_file_md5(filename):
-    """Compute MD5 Hash from a file
+    def update(self, data):
+        """Add a chunk of data to all digests
+        """
+        if self.crc32 is not None:
+            self.crc32 = zlib.crc32(data, self.crc32)
+        for hashObject in self.hashes.itervalues():
+            hashObject.update(data)
+
+    def digests(self):
+        """Return a dictionary with all digests as strings:
+        CRC32 as upper-case hex, the others as hexdigest()
+        """
+        results = {}
+        if self.crc32 is not None:
+            results['CRC32'] = "%X"%(self.crc32 & 0xFFFFFFFF)
+        for name, hashObject in self.hashes.iteritems():
+            results[name] = hashObject.hexdigest()
+        return results
+
+
+def get_bytes_digests(data, algorithms=DEFAULT_DIGESTS):
+    """Compute digests of data that is already in memory.
+    Return a dictionary with the digests as strings.
+    """
+    multiDigest = MultiDigest(algorithms)
+    multiDigest.update(data)
+    return multiDigest.digests()
+
+def get_file_digests(filename, algorithms=DEFAULT_DIGESTS):
+    """Compute digests of a file, reading it only once.
+    The file is memory-mapped if possible.
+    Return a dictionary with the digests as strings.
     """
-    hash_md5 = hashlib.md5()
-    with open(filename, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    multiDigest = MultiDigest(algorithms)
+    with open(filename, 'rb') as theFile:
+        try:
+            fileMap = mmap.mmap(theFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # Empty files can not be mapped, and mapping may fail
+            # for other reasons, too. Read in chunks instead.
+            fileMap = None
+
+        if fileMap is not None:
+            try:
+                multiDigest.update(fileMap)
+            finally:
+                fileMap.close()
+        else:
+            for chunk in iter(lambda: theFile.read(HASH_BUFFER_SIZE), b""):
+                multiDigest.update(chunk)
+
+    return multiDigest.digests()
 
 def get_string_crc32(text):
     """Compute CRC32 checksum from a string
     """
-    return hex(zlib.crc32(text) & 0xffffffff)
\ No newline at end of file
+    return hex(zlib.crc32(text) & 0xffffffff)
@@ -0,0 +1,297 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import re
+import json
+import codecs
+import tempfile
+
+####################################
+#
+# Streaming JSON files
+#
+# JsonWriter writes a JSON object one item at a time, and arrays
+# in it one element at a time, in exactly the same layout as
+# json.dumps(data, indent=4, sort_keys=True). The complete document
+# is never held in memory as one string.
+#
+# JsonReader parses such a file (or any other JSON object) one item
+# at a time, so large arrays can be iterated or skipped element by
+# element instead of being loaded completely.
+#
+####################################
+
+# Indentation of written files
+INDENT = 4
+
+# Separators as used by json.dumps() with indent
+ITEM_SEPARATOR = ', '
+KEY_SEPARATOR = ': '
+
+# Number of bytes read at a time, doubled while a value is incomplete
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Whitespace between JSON tokens
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters that can continue a number
+NUMBER_CHARACTERS = '0123456789.eE+-'
+
+
+####################################
+#
+# Writer
+#
+####################################
+
+def format_value(value, level):
+    """Format a value like json.dumps(indent=4, sort_keys=True)
+    would at the given nesting level
+    """
+    return json.dumps(value, indent=INDENT, sort_keys=True).replace('\n', '\n' + ' ' * (INDENT * level))
+
+def format_key(key):
+    """Format an object key, converting non-string keys like json.dumps()
+    """
+    if isinstance(key, basestring):
+        return json.dumps(key)
+    if isinstance(key, float):
+        return json.dumps(repr(key))
+    return json.dumps(json.dumps(key))
+
+
+class JsonWriter():
+    """Writes a JSON object item by item. Items are written in the
+    order they are given; give them sorted by key to get the same
+    file as json.dumps(indent=4, sort_keys=True).
+    """
+
+    def __init__(self, fileObject):
+        self.fileObject = fileObject
+        self.itemCount = 0
+        self.fileObject.write('{')
+
+    def write_key(self, key):
+        separator = ITEM_SEPARATOR if self.itemCount > 0 else ''
+        self.fileObject.write(separator + '\n' + ' ' * INDENT + format_key(key) + KEY_SEPARATOR)
+        self.itemCount += 1
+
+    def write_item(self, key, value):
+        self.write_key(key)
+        self.fileObject.write(format_value(value, 1))
+
+    def write_array(self, key, elements):
+        """Write an array from any iterable, one element at a time
+        """
+        self.write_key(key)
+        elementIndent = '\n' + ' ' * (INDENT * 2)
+        elementCount = 0
+        for element in elements:
+            separator = ITEM_SEPARATOR if elementCount > 0 else '['
+            self.fileObject.write(separator + elementIndent + format_value(element, 2))
+            elementCount += 1
+        if elementCount == 0:
+            self.fileObject.write('[]')
+        else:
+            self.fileObject.write('\n' + ' ' * INDENT + ']')
+
+    def close(self):
+        self.fileObject.write('\n}' if self.itemCount > 0 else '}')
+
+
+def write_json(data, fileObject, arrays=None):
+    """Write a dictionary as JSON object, sorted by key. Lists are
+    written element by element. arrays can map additional keys to
+    iterables, which are written as arrays without being loaded.
+    """
+    if arrays is None:
+        arrays = {}
+    writer = JsonWriter(fileObject)
+    for key in sorted(set(data.keys()) | set(arrays.keys())):
+        value = arrays[key] if key in arrays else data[key]
+        if isinstance(value, dict) or not hasattr(value, '__iter__'):
+            writer.write_item(key, value)
+        else:
+            writer.write_array(key, value)
+    writer.close()
+
+
+class SentenceSpool():
+    """Temporary file that collects sentences as compact JSON lines,
+    for writing them to a metadata file once the text-level values
+    are known. Iterating the spool yields the sentences again.
+
+    Call flush() before iterating, and before the spool is
+    handed to another process.
+    """
+
+    def __init__(self, directory=None):
+        self.spoolFile = tempfile.TemporaryFile(dir=directory)
+        self.sentenceCount = 0
+
+    def add_sentence(self, sentence):
+        self.spoolFile.write(json.dumps(sentence, separators=(',', ':')) + '\n')
+        self.sentenceCount += 1
+
+    def flush(self):
+        self.spoolFile.flush()
+
+    def __iter__(self):
+        self.spoolFile.seek(0)
+        for line in self.spoolFile:
+            yield json.loads(line)
+
+    def close(self):
+        self.spoolFile.close()
+
+
+####################################
+#
+# Reader
+#
+####################################
+
+class JsonReader():
+    """Parses a JSON object from a file item by item.
+    Only the current value and a chunk of the file are held
+    in memory at a time.
+    """
+
+    def __init__(self, fileObject, chunkSize=READ_CHUNK_SIZE):
+        self.fileObject = fileObject
+        self.chunkSize = chunkSize
+        self.decoder = json.JSONDecoder()
+        self.textDecoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.position = 0
+        self.eof = False
+
+    def fill(self, size):
+        """Read the next size bytes into the buffer.
+        Return False at the end of the file.
+        """
+        if self.eof:
+            return False
+        rawChunk = self.fileObject.read(size)
+        self.buffer = self.buffer[self.position:] + self.textDecoder.decode(rawChunk, final=len(rawChunk) == 0)
+        self.position = 0
+        if len(rawChunk) == 0:
+            self.eof = True
+            return False
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character,
+        or an empty string at the end of the file
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill(self.chunkSize):
+                return ''
+
+    def expect(self, characters):
+        """Consume the next character, which has to be one of characters.
+        Return it.
+        """
+        character = self.peek()
+        if character == '' or character not in characters:
+            raise ValueError('Expected one of "' + characters + '" in JSON file, found "' + character + '"')
+        self.position += 1
+        return character
+
+    def read_value(self):
+        """Parse and return the next value
+        """
+        self.peek()
+        readSize = self.chunkSize
+        while True:
+            try:
+                (value, end) = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARACTERS):
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill(readSize)
+            readSize *= 2
+
+    def iter_keys(self):
+        """Yield the keys of the next object. The value of each key
+        has to be read or skipped before the next key is yielded.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def iter_array(self):
+        """Yield the elements of the next array, one at a time
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(',]') == ']':
+                return
+
+    def skip_value(self):
+        """Skip the next value. Arrays are skipped element by element.
+        """
+        if self.peek() == '[':
+            for element in self.iter_array():
+                pass
+        else:
+            self.read_value()
+
+
+def load_json_item(filename, key):
+    """Load the value of one key of a JSON object file, without
+    loading the other values. Raise KeyError if it does not exist.
+    """
+    with open(filename, 'rb') as jsonFile:
+        reader = JsonReader(jsonFile)
+        for itemKey in reader.iter_keys():
+            if itemKey == key:
+                return reader.read_value()
+            reader.skip_value()
+    raise KeyError(key)
+
+
+def load_json_summary(filename, skipKeys):
+    """Load a JSON object file without the values of skipKeys.
+    Skipped arrays are never held in memory.
+    """
+    data = {}
+    with open(filename, 'rb') as jsonFile:
+        reader = JsonReader(jsonFile)
+        for key in reader.iter_keys():
+            if key in skipKeys:
+                reader.skip_value()
+            else:
+                data[key] = reader.read_value()
+    return data
+
+
+def iter_json_array(filename, key):
+    """Yield the elements of the array of one key
+    of a JSON object file, one at a time
+    """
+    with open(filename, 'rb') as jsonFile:
+        reader = JsonReader(jsonFile)
+        for itemKey in reader.iter_keys():
+            if itemKey == key:
+                for element in reader.iter_array():
+                    yield element
+                return
+            reader.skip_value()
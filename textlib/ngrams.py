@@ -0,0 +1,442 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import zlib
+import json
+import heapq
+import struct
+import operator
+from array import array
+
+####################################
+#
+# N-gram frequencies
+#
+# N-grams are sequences of n consecutive lower-case words within
+# a sentence. They are counted per size n, either exactly, or
+# with bounded memory in sketch mode:
+#
+#   CountMinSketch : Estimated count of any n-gram, never too low
+#   SpaceSaving    : The most frequent n-grams (heavy hitters),
+#                    with an upper bound and the maximum error
+#                    of their counts
+#
+# Both are mergeable, so the tables of single files can be
+# merged into the tables of a folder.
+#
+# N-grams are first counted exactly in a buffer, which is flushed
+# into sketch and heavy hitters when it holds NGRAM_BUFFER_SIZE
+# distinct n-grams. Frequent n-grams are hashed once per flush
+# instead of once per occurrence.
+#
+####################################
+
+# N-gram sizes counted by default
+DEFAULT_NGRAM_SIZES = [2, 3]
+
+# Number of heavy hitters kept per n-gram size
+DEFAULT_CAPACITY = 1000
+
+# Counters per row and number of rows of a count-min sketch.
+# Estimates are at most e / width * (total n-grams) too high,
+# with a probability of 1 - exp(-depth).
+DEFAULT_SKETCH_WIDTH = 2 ** 15
+DEFAULT_SKETCH_DEPTH = 4
+
+# Number of distinct n-grams buffered before they
+# are added to sketch and heavy hitters
+NGRAM_BUFFER_SIZE = 50000
+
+# Separator between the words of an n-gram
+NGRAM_SEPARATOR = u' '
+
+# Start value of the second hash function
+HASH_SEED = 0x5bd1e995
+
+# Type code of sketch counters. 'l' is only 32 bits on some platforms,
+# and Python 2 arrays have no 64-bit integer type; doubles count
+# exactly up to 2 ** 53
+COUNTER_TYPECODE = 'd'
+
+# Sketch file format, see write_sketch_file()
+MAGIC = b'TTNG'
+FORMAT_VERSION = 2
+LENGTH_STRUCT = struct.Struct('<I')
+
+# zlib compression level of sketch rows
+COMPRESSION_LEVEL = 1
+
+
+def parse_ngram_sizes(value):
+    """Parse a comma-separated list of n-gram sizes, e.g. "2,3"
+    """
+    try:
+        sizes = sorted(set(int(size) for size in value.split(',')))
+    except ValueError:
+        raise ValueError('Invalid n-gram sizes "' + value + '". Use a comma-separated list like "2,3"')
+    if len(sizes) == 0 or sizes[0] < 1:
+        raise ValueError('N-gram sizes must be at least 1')
+    return sizes
+
+
+def parse_sketch_size(value):
+    """Parse the size of a count-min sketch, e.g. "32768x4".
+    Return width and depth as a tuple.
+    """
+    try:
+        (width, depth) = [int(part) for part in value.lower().split('x')]
+    except ValueError:
+        raise ValueError('Invalid sketch size "' + value + '". Use WIDTHxDEPTH like "32768x4"')
+    return (width, depth)
+
+
+class NgramSettings():
+    """Which n-grams are counted, and how. In exact mode,
+    all n-grams are counted in memory; otherwise capacity heavy
+    hitters and a count-min sketch of width x depth per size.
+    """
+
+    def __init__(self, sizes=None, exact=False, capacity=DEFAULT_CAPACITY, width=DEFAULT_SKETCH_WIDTH, depth=DEFAULT_SKETCH_DEPTH):
+        self.sizes = sorted(set(sizes or DEFAULT_NGRAM_SIZES))
+        self.exact = exact
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+
+    def describe(self):
+        if self.exact:
+            return 'exact'
+        return 'sketch ' + str(self.width) + 'x' + str(self.depth) + ', top ' + str(self.capacity)
+
+
+####################################
+#
+# Sketches
+#
+####################################
+
+class CountMinSketch():
+    """Count-min sketch: depth rows of width counters. Each key
+    increments one counter per row; its estimated count is the
+    minimum of these counters.
+    """
+
+    def __init__(self, width, depth):
+        self.width = width
+        self.depth = depth
+        self.rows = [array(COUNTER_TYPECODE, [0]) * width for row in xrange(depth)]
+
+    def get_indexes(self, key):
+        """Return the counter index of a key in each row. The rows' hash
+        functions are combined from two CRC32 checksums of the key:
+        row i uses hash1 + i * hash2.
+        """
+        encodedKey = key.encode('utf-8')
+        hash1 = zlib.crc32(encodedKey) & 0xffffffff
+        hash2 = (zlib.crc32(encodedKey, HASH_SEED) & 0xffffffff) | 1
+        width = self.width
+        return [(hash1 + row * hash2) % width for row in xrange(self.depth)]
+
+    def add_counts(self, counts):
+        """Add a dictionary of key counts
+        """
+        # Same indexes as get_indexes(), inlined for speed
+        rows = self.rows
+        width = self.width
+        crc32 = zlib.crc32
+        for key, count in counts.iteritems():
+            encodedKey = key.encode('utf-8')
+            hash1 = crc32(encodedKey) & 0xffffffff
+            hash2 = (crc32(encodedKey, HASH_SEED) & 0xffffffff) | 1
+            for row in rows:
+                row[hash1 % width] += count
+                hash1 += hash2
+
+    def estimate(self, key):
+        return int(min(row[index] for row, index in zip(self.rows, self.get_indexes(key))))
+
+    def merge(self, other):
+        """Add the counters of a sketch of the same size
+        """
+        if other.width != self.width or other.depth != self.depth:
+            raise ValueError('Can not merge count-min sketches of different sizes')
+        self.rows = [array(COUNTER_TYPECODE, map(operator.add, row, otherRow)) for row, otherRow in zip(self.rows, other.rows)]
+
+
+# Sort key of (key, (count, error)) entries: descending by count, then by key
+ENTRY_SORT_KEY = lambda entry: (-entry[1][0], entry[0])
+
+class SpaceSaving():
+    """Space-Saving summary of the most frequent keys. At most capacity
+    keys are monitored. counts maps each of them to a tuple (count, error):
+    count is an upper bound of its true count, count - error a lower bound.
+    Keys that are not monitored occurred at most threshold times.
+
+    Counts are added by merging, like summaries of other texts, so
+    exact counts are merged as a summary without errors.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.threshold = 0
+
+    def merge_entries(self, entries, threshold):
+        """Merge the (key, count, error) entries of another summary with
+        the given threshold. Keys missing in one of the summaries are
+        counted with that summary's threshold as count and error.
+        """
+        monitored = self.counts
+        ownThreshold = self.threshold
+        merged = {}
+        for key, count, error in entries:
+            entry = monitored.get(key)
+            if entry is None:
+                merged[key] = (count + ownThreshold, error + ownThreshold)
+            else:
+                merged[key] = (count + entry[0], error + entry[1])
+        for key, entry in monitored.iteritems():
+            if key not in merged:
+                merged[key] = (entry[0] + threshold, entry[1] + threshold)
+        self.counts = merged
+        self.threshold = ownThreshold + threshold
+        self.truncate()
+
+    def truncate(self):
+        """Keep only the capacity keys with the highest counts.
+        Dropped keys raise the threshold to their counts.
+        """
+        if len(self.counts) <= self.capacity:
+            return
+        topEntries = heapq.nsmallest(self.capacity + 1, self.counts.iteritems(), key=ENTRY_SORT_KEY)
+        self.threshold = max(self.threshold, topEntries[-1][1][0])
+        self.counts = dict(topEntries[:-1])
+
+    def add_counts(self, counts):
+        """Merge a dictionary of exact key counts. Of the keys that
+        are not monitored yet, only the capacity + 1 most frequent can
+        be kept or raise the threshold, so only these are merged.
+        """
+        monitored = self.counts
+        newItems = (item for item in counts.iteritems() if item[0] not in monitored)
+        entries = [(key, count, 0) for key, count in heapq.nlargest(self.capacity + 1, newItems, key=operator.itemgetter(1))]
+        entries.extend((key, counts[key], 0) for key in monitored if key in counts)
+        self.merge_entries(entries, 0)
+
+    def merge(self, other):
+        self.merge_entries(((key, count, error) for key, (count, error) in other.counts.iteritems()), other.threshold)
+
+
+####################################
+#
+# N-gram tables
+#
+####################################
+
+class NgramTable():
+    """Counts of the n-grams of one size n. In exact mode, counts holds
+    all n-grams; in sketch mode, only those not flushed yet.
+    """
+
+    def __init__(self, n, settings):
+        self.n = n
+        self.total = 0
+        self.counts = {}
+        self.sketch = None
+        self.heavyHitters = None
+        if not settings.exact:
+            self.sketch = CountMinSketch(settings.width, settings.depth)
+            self.heavyHitters = SpaceSaving(settings.capacity)
+
+    def flush(self):
+        """Add the buffered counts to sketch and heavy hitters
+        """
+        if self.sketch is None or len(self.counts) == 0:
+            return
+        self.sketch.add_counts(self.counts)
+        self.heavyHitters.add_counts(self.counts)
+        self.counts = {}
+
+    def add_row(self, ngram, count, error):
+        """Add an n-gram as read from an n-gram table file
+        """
+        if self.heavyHitters is None:
+            self.counts[ngram] = count
+        else:
+            self.heavyHitters.counts[ngram] = (count, error)
+
+    def merge(self, other):
+        """Merge the table of another text or corpus
+        """
+        self.total += other.total
+        if self.sketch is None:
+            counts = self.counts
+            for ngram, count in other.counts.iteritems():
+                counts[ngram] = counts.get(ngram, 0) + count
+        else:
+            other.flush()
+            self.sketch.merge(other.sketch)
+            self.heavyHitters.merge(other.heavyHitters)
+
+    def iter_rows(self, topCount=None):
+        """Yield (ngram, count, error) tuples, sorted descending by count.
+        In sketch mode, these are the heavy hitters; count is the lower
+        of the heavy hitter and sketch estimates, and count - error is
+        a lower bound of the true count.
+        """
+        if self.sketch is None:
+            entries = ((ngram, (count, 0)) for ngram, count in self.counts.iteritems())
+        else:
+            self.flush()
+            entries = self.iter_heavy_hitters()
+        if topCount is not None:
+            sortedEntries = heapq.nsmallest(topCount, entries, key=ENTRY_SORT_KEY)
+        else:
+            sortedEntries = sorted(entries, key=ENTRY_SORT_KEY)
+        for ngram, (count, error) in sortedEntries:
+            yield (ngram, count, error)
+
+    def iter_heavy_hitters(self):
+        estimate = self.sketch.estimate
+        for ngram, (count, error) in self.heavyHitters.counts.iteritems():
+            estimatedCount = min(count, estimate(ngram))
+            yield (ngram, (estimatedCount, max(0, estimatedCount - (count - error))))
+
+
+class NgramCounter():
+    """Counts the n-grams of all sizes in settings,
+    one sentence at a time
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.tables = dict((n, NgramTable(n, settings)) for n in settings.sizes)
+
+    def add_words(self, words):
+        """Count the n-grams of a sentence, given as list of lower-case words
+        """
+        wordCount = len(words)
+        exact = self.settings.exact
+        join = NGRAM_SEPARATOR.join
+        for n, table in self.tables.iteritems():
+            ngramCount = wordCount - n + 1
+            if ngramCount <= 0:
+                continue
+            counts = table.counts
+            for start in xrange(ngramCount):
+                ngram = join(words[start:start + n])
+                counts[ngram] = counts.get(ngram, 0) + 1
+            table.total += ngramCount
+            if not exact and len(counts) >= NGRAM_BUFFER_SIZE:
+                table.flush()
+
+    def add_compact_text(self, compactText):
+        """Count the n-grams of all sentences of a CompactText
+        """
+        lowerWords = [word.lower() for word in compactText.words]
+        tokenWordIds = compactText.tokenWordIds
+        offsets = compactText.sentenceOffsets
+        for sentenceIndex in xrange(len(offsets) - 1):
+            self.add_words([lowerWords[wordId] for wordId in tokenWordIds[offsets[sentenceIndex]:offsets[sentenceIndex + 1]]])
+
+    def merge(self, other):
+        for n, table in self.tables.iteritems():
+            table.merge(other.tables[n])
+
+    def finish(self):
+        """Flush all buffers. Return the counter.
+        """
+        for table in self.tables.itervalues():
+            table.flush()
+        return self
+
+
+####################################
+#
+# Sketch files
+#
+####################################
+
+def write_block(fileObject, data):
+    fileObject.write(LENGTH_STRUCT.pack(len(data)))
+    fileObject.write(data)
+
+def read_block(fileObject):
+    lengthData = fileObject.read(LENGTH_STRUCT.size)
+    if len(lengthData) < LENGTH_STRUCT.size:
+        raise ValueError('N-gram sketch file is truncated')
+    (length,) = LENGTH_STRUCT.unpack(lengthData)
+    data = fileObject.read(length)
+    if len(data) < length:
+        raise ValueError('N-gram sketch file is truncated')
+    return data
+
+
+def write_sketch_file(counter, filename):
+    """Write the state of an NgramCounter that is not part of its
+    n-gram table file: settings, totals and thresholds, and the
+    sketches. The file starts with MAGIC and the format version
+    (1 byte), followed by a JSON header and, in sketch mode, the
+    zlib-compressed rows of each table's sketch. Header and rows
+    are preceded by their length (4 bytes, little endian).
+    """
+    settings = counter.settings
+    tables = [counter.tables[n] for n in settings.sizes]
+    header = {
+        'exact' : settings.exact,
+        'width' : settings.width,
+        'depth' : settings.depth,
+        'capacity' : settings.capacity,
+        'itemSize' : array(COUNTER_TYPECODE).itemsize,
+        'tables' : [{
+            'n' : table.n,
+            'total' : table.total,
+            'threshold' : table.heavyHitters.threshold if table.heavyHitters is not None else 0
+        } for table in tables]
+    }
+    with open(filename, 'wb') as sketchFile:
+        sketchFile.write(MAGIC + struct.pack('<B', FORMAT_VERSION))
+        write_block(sketchFile, json.dumps(header, separators=(',', ':')))
+        for table in tables:
+            if table.sketch is not None:
+                table.flush()
+                for row in table.sketch.rows:
+                    write_block(sketchFile, zlib.compress(row.tostring(), COMPRESSION_LEVEL))
+
+
+def load_sketch_file(filename, settings):
+    """Load a sketch file into a new NgramCounter, without the n-grams
+    of its table file, which have to be added with NgramTable.add_row().
+    Raise ValueError if the file was not counted with the same settings.
+    """
+    with open(filename, 'rb') as sketchFile:
+        magic = sketchFile.read(len(MAGIC) + 1)
+        if magic[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not an n-gram sketch file')
+        version = struct.unpack('<B', magic[len(MAGIC):])[0]
+        if version != FORMAT_VERSION:
+            raise ValueError('Unsupported n-gram sketch format version ' + str(version))
+
+        header = json.loads(read_block(sketchFile))
+        if header['exact'] != settings.exact:
+            raise ValueError('N-grams were not counted in ' + ('exact' if settings.exact else 'sketch') + ' mode')
+        if not settings.exact and (header['width'] != settings.width or header['depth'] != settings.depth or header['itemSize'] != array(COUNTER_TYPECODE).itemsize):
+            raise ValueError('N-gram sketches have a different size')
+        if not settings.exact and header.get('capacity') != settings.capacity:
+            raise ValueError('N-grams were counted with another number of heavy hitters')
+        sizes = [tableHeader['n'] for tableHeader in header['tables']]
+        if not set(settings.sizes).issubset(sizes):
+            raise ValueError('N-gram sizes ' + str(settings.sizes) + ' were not counted, only ' + str(sizes))
+
+        counter = NgramCounter(settings)
+        for tableHeader in header['tables']:
+            rows = None
+            if not settings.exact:
+                rows = [array(COUNTER_TYPECODE, zlib.decompress(read_block(sketchFile))) for row in xrange(settings.depth)]
+            table = counter.tables.get(tableHeader['n'])
+            if table is None:
+                continue
+            table.total = tableHeader['total']
+            if rows is not None:
+                table.sketch.rows = rows
+                table.heavyHitters.threshold = tableHeader['threshold']
+    return counter
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import multiprocessing
+import collections
+import Queue
+from textlib import profiling
+
+####################################
+#
+# Constants
+#
+####################################
+
+# Maximum number of items waiting in a pipeline queue
+PIPELINE_QUEUE_SIZE = 4
+
+# Seconds between checks for Ctrl+C or a stopped pipeline
+# while waiting for a queue or thread
+POLL_INTERVAL = 0.1
+
+# Marks the end of a queue
+END_OF_QUEUE = None
+
+
+def put_item(itemQueue, item, stopped=None):
+    """Put an item into a bounded queue, waiting for free space.
+    Give up and return False if the event stopped is set.
+    """
+    while stopped is None or not stopped.is_set():
+        try:
+            itemQueue.put(item, True, POLL_INTERVAL)
+            return True
+        except Queue.Full:
+            pass
+    return False
+
+def get_item(itemQueue):
+    """Get an item from a queue, waiting until there is one.
+    Unlike a plain get(), this can be interrupted by Ctrl+C.
+    """
+    while True:
+        try:
+            return itemQueue.get(True, POLL_INTERVAL)
+        except Queue.Empty:
+            pass
+
+def join_thread(thread):
+    """Wait for a thread or process to finish.
+    Can be interrupted by Ctrl+C.
+    """
+    while thread.is_alive():
+        thread.join(POLL_INTERVAL)
+
+
+####################################
+#
+# Prefetcher
+#
+####################################
+
+class Prefetcher():
+    """Calls function(item) for the items of an iterable in a
+    background thread, ahead of the consumer. Iterating the
+    Prefetcher yields (item, result) tuples in the order of
+    the items. Errors are raised when their item is reached.
+
+    At most queueSize results wait in the queue, so memory use
+    stays bounded when the consumer is slower.
+    """
+
+    def __init__(self, items, function, queueSize=PIPELINE_QUEUE_SIZE):
+        self.queue = Queue.Queue(maxsize=queueSize)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(items, function), name='Prefetcher')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, items, function):
+        try:
+            for item in items:
+                try:
+                    entry = (item, function(item), None)
+                except Exception:
+                    entry = (item, None, sys.exc_info())
+                if not put_item(self.queue, entry, self.stopped):
+                    return
+        except Exception:
+            # Iterating the items failed
+            put_item(self.queue, (None, None, sys.exc_info()), self.stopped)
+        put_item(self.queue, END_OF_QUEUE, self.stopped)
+
+    def __iter__(self):
+        while True:
+            entry = get_item(self.queue)
+            if entry is END_OF_QUEUE:
+                return
+            (item, result, excInfo) = entry
+            if excInfo is not None:
+                raise excInfo[0], excInfo[1], excInfo[2]
+            yield (item, result)
+
+    def close(self):
+        """Stop prefetching and wait for the thread to finish
+        """
+        self.stopped.set()
+        join_thread(self.thread)
+
+
+####################################
+#
+# Background writer
+#
+####################################
+
+def run_write_job(function, args, connection):
+    """Run a write job in a forked writer process. The error, if any,
+    and the stages recorded by the profiler are sent to connection.
+    """
+    profiler = profiling.profiler
+
+    # The lock may have been held by another thread of the parent,
+    # and the parent's file reports are not ours to send
+    profiler.lock = threading.Lock()
+    profiler.pop_file_reports()
+
+    profiler.begin_file(None)
+    try:
+        function(*args)
+        error = None
+    except Exception as e:
+        error = repr(e)
+    profiler.end_file()
+    connection.send((error, profiler.pop_file_reports()))
+    connection.close()
+
+
+class BackgroundWriter():
+    """Runs write jobs in forked background processes, so they
+    overlap with the work of the main process. Serializing result
+    files is CPU-bound; in a thread it would compete for the
+    interpreter lock instead. The processes inherit the job's
+    arguments, so nothing has to be pickled.
+
+    At most queueSize jobs run at a time; submit() waits for the
+    oldest one to finish, so memory use stays bounded when writing
+    is slower than producing results. Failing jobs do not stop the
+    writer; their key and error are returned by close().
+    """
+
+    def __init__(self, queueSize=PIPELINE_QUEUE_SIZE):
+        self.queueSize = queueSize
+        self.pendingJobs = collections.deque()
+        self.errors = []
+
+    def submit(self, key, function, *args):
+        """Run function(*args) in the background.
+        key identifies the job in the errors returned by close().
+        """
+        while len(self.pendingJobs) >= self.queueSize:
+            self.finish_job()
+        (receiver, sender) = multiprocessing.Pipe(False)
+        process = multiprocessing.Process(target=run_write_job, args=(function, args, sender), name='BackgroundWriter')
+        process.start()
+        sender.close()
+        self.pendingJobs.append((key, process, receiver))
+
+    def finish_job(self):
+        """Wait for the oldest job to finish
+        """
+        (key, process, receiver) = self.pendingJobs.popleft()
+        try:
+            while not receiver.poll(POLL_INTERVAL):
+                pass
+            (error, fileReports) = receiver.recv()
+        except EOFError:
+            error = 'Writer process exited with code ' + str(process.exitcode)
+            fileReports = []
+        receiver.close()
+        join_thread(process)
+        if error is not None:
+            self.errors.append((key, error))
+        profiling.profiler.add_run_times(fileReports)
+
+    def close(self):
+        """Wait for all pending jobs to finish.
+        Return a list of (key, error) tuples of failed jobs.
+        """
+        while len(self.pendingJobs) > 0:
+            self.finish_job()
+        return self.errors
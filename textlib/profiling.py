@@ -0,0 +1,248 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+import contextlib
+from textlib import fileoperations
+
+####################################
+#
+# Constants
+#
+####################################
+
+# Stages captured by cProfile, if enabled
+CPROFILE_STAGES = ['tokenize', 'analyze', 'writeMetadata']
+
+# Counters that get a per-second throughput in reports
+THROUGHPUT_COUNTERS = ['bytes', 'sentences', 'words', 'syllables']
+
+# Number of functions listed when printing cProfile statistics
+CPROFILE_PRINT_COUNT = 25
+
+
+def get_cpu_time():
+    """Return the user + system CPU time of this process
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+####################################
+#
+# Profiler
+#
+####################################
+
+class StageTimes():
+    """Wall and CPU time and number of calls per stage,
+    plus named counters
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, stage, wallTime, cpuTime, calls=1):
+        stageTimes = self.stages.get(stage)
+        if stageTimes is None:
+            stageTimes = self.stages[stage] = { 'wall' : 0.0, 'cpu' : 0.0, 'calls' : 0 }
+        stageTimes['wall'] += wallTime
+        stageTimes['cpu'] += cpuTime
+        stageTimes['calls'] += calls
+
+    def add_counter(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        for stage, stageTimes in other.stages.iteritems():
+            self.add_stage(stage, stageTimes['wall'], stageTimes['cpu'], stageTimes['calls'])
+        for name, value in other.counters.iteritems():
+            self.add_counter(name, value)
+
+    def report(self, wallTime):
+        """Return stages, counters and throughput as dictionary
+        """
+        throughput = {}
+        for name in THROUGHPUT_COUNTERS:
+            if name in self.counters and wallTime > 0.0:
+                throughput[name + 'PerSecond'] = self.counters[name] / wallTime
+        return {
+            'wall' : wallTime,
+            'stages' : self.stages,
+            'counters' : self.counters,
+            'throughput' : throughput
+        }
+
+
+class Profiler():
+    """Records wall and CPU time of named pipeline stages and
+    throughput counters, for the whole run and per file.
+    Does nothing until enable() is called.
+
+    Stages can be recorded from several threads. A file is recorded
+    by the thread that began it; stages of other threads only count
+    in the run totals.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.cProfile = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.runTimes = StageTimes()
+        self.runStart = time.time()
+        self.fileReports = []
+        self.fileState = threading.local()
+        self.mainThread = threading.current_thread()
+
+    def get_file_times(self):
+        """Return the StageTimes of the file recorded
+        by the current thread, or None
+        """
+        return getattr(self.fileState, 'fileTimes', None)
+
+    def enable(self, captureCProfile=False):
+        """Start recording. With captureCProfile, the
+        stages in CPROFILE_STAGES are also run under cProfile.
+        """
+        self.enabled = True
+        self.cProfile = None
+        if captureCProfile:
+            import cProfile
+            self.cProfile = cProfile.Profile()
+        self.reset()
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """Context manager that records the time of a stage
+        """
+        if not self.enabled:
+            yield
+            return
+
+        # cProfile only captures the thread that enabled it
+        captureCProfile = self.cProfile is not None and stage in CPROFILE_STAGES and threading.current_thread() is self.mainThread
+        if captureCProfile:
+            self.cProfile.enable()
+        wallStart = time.time()
+        cpuStart = get_cpu_time()
+        try:
+            yield
+        finally:
+            wallTime = time.time() - wallStart
+            cpuTime = get_cpu_time() - cpuStart
+            if captureCProfile:
+                self.cProfile.disable()
+            with self.lock:
+                self.runTimes.add_stage(stage, wallTime, cpuTime)
+            fileTimes = self.get_file_times()
+            if fileTimes is not None:
+                fileTimes.add_stage(stage, wallTime, cpuTime)
+
+    def count(self, name, value):
+        """Add to a throughput counter
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.runTimes.add_counter(name, value)
+        fileTimes = self.get_file_times()
+        if fileTimes is not None:
+            fileTimes.add_counter(name, value)
+
+    def begin_file(self, filename):
+        """Start recording the stages of a file
+        """
+        if not self.enabled:
+            return
+        self.fileState.fileName = filename
+        self.fileState.fileTimes = StageTimes()
+        self.fileState.fileStart = time.time()
+
+    def end_file(self):
+        """Finish recording the stages of a file
+        """
+        fileTimes = self.get_file_times()
+        if not self.enabled or fileTimes is None:
+            return
+        fileReport = fileTimes.report(time.time() - self.fileState.fileStart)
+        fileReport['file'] = self.fileState.fileName
+        with self.lock:
+            self.fileReports.append(fileReport)
+        self.fileState.fileName = None
+        self.fileState.fileTimes = None
+
+    def pop_file_reports(self):
+        """Return and forget the file reports recorded so far,
+        e.g. to send them from a worker process to the main process
+        """
+        with self.lock:
+            fileReports = self.fileReports
+            self.fileReports = []
+        return fileReports
+
+    def add_file_reports(self, fileReports):
+        """Add file reports recorded by another process,
+        including their stages in the run totals
+        """
+        if not self.enabled:
+            return
+        for fileReport in fileReports:
+            fileTimes = StageTimes()
+            fileTimes.stages = fileReport['stages']
+            fileTimes.counters = fileReport['counters']
+            with self.lock:
+                self.runTimes.merge(fileTimes)
+                self.fileReports.append(fileReport)
+
+    def add_run_times(self, fileReports):
+        """Add the stages of file reports recorded by another
+        process to the run totals only
+        """
+        if not self.enabled:
+            return
+        for fileReport in fileReports:
+            fileTimes = StageTimes()
+            fileTimes.stages = fileReport['stages']
+            fileTimes.counters = fileReport['counters']
+            with self.lock:
+                self.runTimes.merge(fileTimes)
+
+    def report(self):
+        """Return the run report and all file reports as dictionary
+        """
+        return {
+            'run' : self.runTimes.report(time.time() - self.runStart),
+            'files' : self.fileReports
+        }
+
+    def write_report(self, filename, cProfileFilename=None):
+        """Write the report as JSON file, print a summary,
+        and write cProfile statistics if they were captured
+        """
+        report = self.report()
+        fileoperations.write_json(report, filename)
+        print('Profile report written to ' + filename)
+
+        runReport = report['run']
+        for stage, stageTimes in sorted(runReport['stages'].iteritems(), key=lambda item: -item[1]['wall']):
+            print('{:<18} wall {:8.3f}s  cpu {:8.3f}s  calls {:6d}'.format(stage, stageTimes['wall'], stageTimes['cpu'], stageTimes['calls']))
+        for name, value in sorted(runReport['throughput'].iteritems()):
+            print('{:<18} {:.1f}'.format(name, value))
+
+        if self.cProfile is not None and cProfileFilename is not None:
+            if len(self.cProfile.getstats()) == 0:
+                print('cProfile did not capture anything (no ' + ', '.join(CPROFILE_STAGES) + ' stages ran in this process), no statistics written')
+                return
+            import pstats
+            self.cProfile.dump_stats(cProfileFilename)
+            print('cProfile statistics of ' + ', '.join(CPROFILE_STAGES) + ' written to ' + cProfileFilename)
+            pstats.Stats(cProfileFilename).sort_stats('cumulative').print_stats(CPROFILE_PRINT_COUNT)
+
+
+# Profiler shared by all modules
+profiler = Profiler()
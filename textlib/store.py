@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+
+####################################
+#
+# Constants
+#
+####################################
+
+# Store schema version identifier
+# Increase this if the schema changes!
+STORE_VERSION = '2'
+
+# Number of files written per transaction
+STORE_BATCH_SIZE = 50
+
+# Text-level values stored as columns of the files table
+FILE_COLUMNS = [
+    'sentenceCount',
+    'wordCount',
+    'syllableCount',
+    'charCount',
+    'punctuationCount',
+    'averageWordsPerSentence',
+    'averageSyllablesPerWord',
+    'averageSyllableLength',
+    'averageWordLength',
+    'averagePunctuationPerSentence'
+]
+
+# Sentence-level values stored as columns of the sentences table
+SENTENCE_COLUMNS = [
+    'crc32',
+    'wordCount',
+    'charCount',
+    'punctuationCount',
+    'averageSyllablesPerWord',
+    'averageSyllableLength',
+    'averageWordLength'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    filename TEXT,
+    language TEXT,
+    tokenizer TEXT,
+    crc32 TEXT,
+    md5 TEXT,
+    analyzeVersion TEXT,
+    dateOfAnalysis TEXT,
+    """ + ',\n    '.join(column + ' NUMERIC' for column in FILE_COLUMNS) + """,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS files_language ON files (language);
+CREATE TABLE IF NOT EXISTS sentences (
+    fileId INTEGER NOT NULL REFERENCES files (id),
+    sentenceIndex INTEGER NOT NULL,
+    """ + ',\n    '.join(column + (' TEXT' if column == 'crc32' else ' NUMERIC') for column in SENTENCE_COLUMNS) + """,
+    maxSyllableCountPerWord INTEGER,
+    PRIMARY KEY (fileId, sentenceIndex)
+);
+CREATE TABLE IF NOT EXISTS readability (
+    fileId INTEGER NOT NULL REFERENCES files (id),
+    id TEXT NOT NULL,
+    value,
+    PRIMARY KEY (fileId, id)
+);
+CREATE INDEX IF NOT EXISTS readability_id ON readability (id);
+CREATE TABLE IF NOT EXISTS words (
+    fileId INTEGER NOT NULL REFERENCES files (id),
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (fileId, word)
+);
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+"""
+
+
+####################################
+#
+# Rows
+#
+####################################
+
+def make_sentence_row(sentenceIndex, sentence):
+    """Extract the per-sentence statistics from an analyzed sentence,
+    as tuple in the order of SENTENCE_COLUMNS, followed by the
+    maximum syllable count per word. Return None for sentences
+    without words.
+    """
+    if 'wordCount' not in sentence:
+        return None
+    row = [sentenceIndex]
+    row.extend(sentence[column] for column in SENTENCE_COLUMNS)
+    row.append(sentence['maxSyllableCountPerWord']['count'])
+    return tuple(row)
+
+def make_sentence_rows(sentences):
+    """Extract the per-sentence statistics from analyzed sentences,
+    see make_sentence_row(). Sentences without words are
+    skipped, but keep their index.
+    """
+    collector = SentenceRowCollector()
+    for sentence in sentences:
+        collector.add_sentence(sentence)
+    return collector.rows
+
+
+class SentenceRowCollector():
+    """Collects the per-sentence statistics of sentences
+    that are analyzed one at a time
+    """
+
+    def __init__(self):
+        self.sentenceCount = 0
+        self.rows = []
+
+    def add_sentence(self, sentence):
+        row = make_sentence_row(self.sentenceCount, sentence)
+        if row is not None:
+            self.rows.append(row)
+        self.sentenceCount += 1
+
+
+####################################
+#
+# Corpus store
+#
+####################################
+
+class CorpusStore():
+    """SQLite database with the analysis results of a corpus:
+    per-file headers and text-level values, per-sentence statistics,
+    readability indices and word counts, in indexed tables.
+
+    Files are written in batches; a transaction is committed every
+    batchSize files, and by commit() and close().
+    """
+
+    def __init__(self, filename, batchSize=STORE_BATCH_SIZE):
+        self.filename = filename
+        self.batchSize = batchSize
+        self.pendingFiles = 0
+        self.connection = sqlite3.connect(filename)
+        self.drop_outdated_tables()
+        self.connection.executescript(SCHEMA)
+        self.connection.execute('INSERT OR REPLACE INTO store_info (key, value) VALUES (?, ?)', ('store_version', STORE_VERSION))
+        self.connection.commit()
+
+    def drop_outdated_tables(self):
+        """Drop all tables of a store with another schema version.
+        Its files are added again from their result files.
+        """
+        cursor = self.connection.cursor()
+        if cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'store_info'").fetchone() is None:
+            return
+        row = cursor.execute("SELECT value FROM store_info WHERE key = 'store_version'").fetchone()
+        if row is not None and row[0] == STORE_VERSION:
+            return
+        print('Corpus store has an outdated schema, rebuilding it...')
+        for table in ('sentences', 'readability', 'words', 'files', 'store_info'):
+            cursor.execute('DROP TABLE IF EXISTS ' + table)
+        self.connection.commit()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+        self.pendingFiles = 0
+
+    def get_file_header(self, path):
+        """Return the stored CRC32, analyze version, language and
+        tokenizer of a file as a dict, or None if the file is not in the store
+        """
+        row = self.connection.execute('SELECT crc32, analyzeVersion, language, tokenizer FROM files WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'CRC32' : row[0],
+            'analyze_version' : row[1],
+            'language' : row[2],
+            'tokenizer' : row[3]
+        }
+
+    def has_file(self, path, meta):
+        """Check if a file is stored with the same
+        checksum, analyze version, language and tokenizer as in meta
+        """
+        header = self.get_file_header(path)
+        return header is not None and \
+            header['CRC32'] == meta['CRC32'] and \
+            header['analyze_version'] == meta['analyze_version'] and \
+            header['language'] == meta['language'] and \
+            header['tokenizer'] == meta.get('tokenizer')
+
+    def delete_file(self, path):
+        """Remove a file and all its rows from the store
+        """
+        cursor = self.connection.cursor()
+        row = cursor.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            return
+        fileId = row[0]
+        for table in ('sentences', 'readability', 'words'):
+            cursor.execute('DELETE FROM ' + table + ' WHERE fileId = ?', (fileId,))
+        cursor.execute('DELETE FROM files WHERE id = ?', (fileId,))
+
+    def add_file(self, path, textData, wordTable, sentenceRows=None):
+        """Store the results of a file, replacing earlier results.
+        textData does not need to contain sentences; if it does not,
+        sentenceRows (as returned by make_sentence_rows()) can be given.
+        """
+        if sentenceRows is None:
+            sentenceRows = make_sentence_rows(textData.get('sentences', []))
+
+        self.delete_file(path)
+        cursor = self.connection.cursor()
+
+        # File header and text-level values
+        meta = textData.get('_meta', {})
+        summary = dict((key, value) for key, value in textData.iteritems() if key not in ('_meta', 'sentences', 'vocabulary'))
+        columns = ['path', 'filename', 'language', 'tokenizer', 'crc32', 'md5', 'analyzeVersion', 'dateOfAnalysis'] + FILE_COLUMNS + ['summary']
+        values = [path, meta.get('Filename'), meta.get('language'), meta.get('tokenizer'), meta.get('CRC32'), meta.get('MD5'), meta.get('analyze_version'), meta.get('Date of analysis')]
+        values.extend(textData.get(column) for column in FILE_COLUMNS)
+        values.append(json.dumps(summary))
+        cursor.execute('INSERT INTO files (' + ', '.join(columns) + ') VALUES (' + ', '.join('?' * len(columns)) + ')', values)
+        fileId = cursor.lastrowid
+
+        # Per-sentence statistics
+        sentenceColumns = ['sentenceIndex'] + SENTENCE_COLUMNS + ['maxSyllableCountPerWord']
+        cursor.executemany('INSERT INTO sentences (fileId, ' + ', '.join(sentenceColumns) + ') VALUES (?, ' + ', '.join('?' * len(sentenceColumns)) + ')',
+            ((fileId,) + row for row in sentenceRows))
+
+        # Readability indices
+        cursor.executemany('INSERT INTO readability (fileId, id, value) VALUES (?, ?, ?)',
+            ((fileId, result['id'], result['value']) for result in textData.get('readingEase', [])))
+
+        # Word counts
+        cursor.executemany('INSERT INTO words (fileId, word, count) VALUES (?, ?, ?)',
+            ((fileId, word, valueDict['count']) for word, valueDict in wordTable['words'].iteritems()))
+
+        self.pendingFiles += 1
+        if self.pendingFiles >= self.batchSize:
+            self.commit()
+
+    #
+    # Queries
+    #
+
+    def file_count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def word_counts(self):
+        """Return a list of (word, count) tuples with the
+        total count of each word over all files, sorted
+        descending by count
+        """
+        return self.connection.execute('SELECT word, SUM(count) AS total FROM words GROUP BY word ORDER BY total DESC, word').fetchall()
+
+    def word_frequencies(self):
+        """Return a list of (word, count, frequency) tuples
+        over all files, sorted descending by count
+        """
+        totalWordCount = self.connection.execute('SELECT SUM(count) FROM words').fetchone()[0] or 0
+        return [(word, count, float(count) / float(totalWordCount)) for word, count in self.word_counts()]
+
+    def readability_distribution(self, resultId):
+        """Return a list of (path, value) tuples with the value
+        of a readability index (e.g. "fre") for every file,
+        sorted ascending by value
+        """
+        return self.connection.execute('SELECT files.path, readability.value FROM readability JOIN files ON files.id = readability.fileId WHERE readability.id = ? ORDER BY readability.value', (resultId,)).fetchall()
@@ -1,12 +1,145 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-import nltk
-from hyphen import Hyphenator
+import os
+import re
+from collections import OrderedDict
+from textlib import fileoperations, profiling
 
+# NLTK and PyHyphen are slow to import, so they are
+# only imported by the functions that actually need them
 
-# Hyphenator class instance
-# Lazy-initialized in tokenize_text()
-hyphenator = None
+
+# Syllable cache file format version
+# Increase this if the layout of the cache file changes
+SYLLABLE_CACHE_VERSION = '1'
+
+# Default maximum number of (language, word) entries in the syllable cache
+SYLLABLE_CACHE_SIZE = 200000
+
+
+# Available word tokenizer backends
+#   nltk  : nltk.word_tokenize(), filtered to alphabetic words afterwards
+#   regex : precompiled pattern that only matches alphabetic words (faster)
+TOKENIZER_BACKENDS = ['nltk', 'regex']
+
+# Alphabetic word tokens: any run of Unicode letters
+WORD_PATTERN = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+# Pool of Hyphenator class instances, keyed by language
+# Lazy-initialized in get_hyphenator()
+hyphenators = {}
+
+
+class SyllableCache():
+    """Bounded in-process cache for syllabification results,
+    keyed by (language, word), with least-recently-used eviction.
+    """
+
+    def __init__(self, maxSize=SYLLABLE_CACHE_SIZE):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, word, lang):
+        """Return a copy of the cached syllables of a word,
+        or None if the word is not cached.
+        """
+        key = (lang, word)
+        try:
+            syllables = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        # Re-insert to mark entry as most recently used
+        self.entries[key] = syllables
+        self.hits += 1
+        return list(syllables)
+
+    def put(self, word, lang, syllables):
+        """Store the syllables of a word,
+        evicting the least recently used entry if the cache is full.
+        """
+        key = (lang, word)
+        self.entries.pop(key, None)
+        self.entries[key] = tuple(syllables)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the counters
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return a dictionary with size and hit/miss counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size' : len(self.entries),
+            'maxSize' : self.maxSize,
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'hitRate' : (float(self.hits) / float(lookups)) if lookups > 0 else 0.0
+        }
+
+    def load(self, filename):
+        """Load entries from a persistent cache file.
+        Return number of loaded entries.
+        """
+        cacheData = fileoperations.load_json(filename)
+        if cacheData.get('version') != SYLLABLE_CACHE_VERSION:
+            print('Syllable cache version differs, ignoring ' + fileoperations.shorten_filename(filename))
+            return 0
+
+        count = 0
+        for lang, words in cacheData.get('languages', {}).iteritems():
+            for word, syllables in words.iteritems():
+                self.put(word, lang, syllables)
+                count += 1
+        return count
+
+    def save(self, filename):
+        """Write all entries to a persistent cache file
+        """
+        languages = {}
+        for (lang, word), syllables in self.entries.iteritems():
+            languages.setdefault(lang, {})[word] = list(syllables)
+
+        cacheData = {
+            'version' : SYLLABLE_CACHE_VERSION,
+            'languages' : languages
+        }
+        fileoperations.write_json(cacheData, filename)
+
+
+# Syllable cache, shared by all calls to tokenize_word_to_syllables()
+syllableCache = SyllableCache()
+
+
+def load_syllable_cache(filename):
+    """Fill the syllable cache from a cache file, if it exists
+    """
+    if not os.path.isfile(filename):
+        return
+    try:
+        count = syllableCache.load(filename)
+        print('Loaded ' + str(count) + ' cached syllabifications from ' + fileoperations.shorten_filename(filename))
+    except:
+        print('ERROR: Could not load syllable cache from ' + fileoperations.shorten_filename(filename) + '!')
+
+def save_syllable_cache(filename):
+    """Write the syllable cache to a cache file
+    """
+    try:
+        syllableCache.save(filename)
+        print('Saved ' + str(len(syllableCache.entries)) + ' cached syllabifications to ' + fileoperations.shorten_filename(filename))
+    except:
+        print('ERROR: Could not save syllable cache to ' + fileoperations.shorten_filename(filename) + '!')
 
 
 def is_alphanumeric(s):
@@ -19,43 +152,105 @@ def is_alphanumeric(s):
     return True
 
 
-def tokenize_sentence_to_words(sentence):
+def tokenize_sentence_to_words(sentence, backend='nltk'):
+    """Split a sentence into words.
+    The "nltk" backend also returns punctuation and other non-word tokens,
+    the "regex" backend only returns alphabetic words.
+    """
+    if backend == 'regex':
+        return WORD_PATTERN.findall(sentence)
+    import nltk
     return nltk.word_tokenize(sentence)
 
 
-def tokenize_word_to_syllables(word, lang):
-    global hyphenator
+def is_word(token):
+    """Return True if a token from tokenize_sentence_to_words()
+    should be treated as a word.
+    """
+    # Ignore short "words" that do not contain alphanumerics
+    if len(token) == 1 and not token[0].isalpha():
+        return False
+
+    # Ignore "words" that do not contain alphanumerics
+    if is_alphanumeric(token) == False:
+        return False
+
+    return True
+
+
+def get_hyphenator(lang):
+    """Return the Hyphenator for a language.
+    It is created on first use and then reused for the lifetime of the process.
+    """
+    hyphenator = hyphenators.get(lang)
     if hyphenator is None:
         print('Initializing Hyphenator (' + lang + ')...')
+        from hyphen import Hyphenator
         hyphenator = Hyphenator(lang)
+        hyphenators[lang] = hyphenator
+    return hyphenator
 
-    syllables = hyphenator.syllables(word)
+
+def tokenize_word_to_syllables(word, lang):
+    # Look up cached syllables first
+    syllables = syllableCache.get(word, lang)
+    if syllables is not None:
+        return syllables
+
+    syllables = get_hyphenator(lang).syllables(word)
 
     # Word with only one syllable need special treatment,
     # because the hyphenator does not recognize them
     if len(syllables) == 0:
         syllables = [word]
 
+    syllableCache.put(word, lang, syllables)
     return syllables
 
 
-def tokenize_text(text, lang='de_DE'):
-    """Tokenize an entire text.
+def split_sentences(text):
+    """Split a text into a list of sentences
+    """
+    import nltk
+    return nltk.sent_tokenize(text)
 
-    The text will be split into sentences.
-    Sentences will be split into words.
-    Words will be split into syllables.
 
-    Returns a dictionary containing a list with all sentences in the text.
-    Each "sentence" element contains the original sentence, and a list with all words in the sentence.
-    Each "word" element contains the original word, and a list with all syllables in the word.
+def iter_split_chunks(textChunks):
+    """Split a text that is given as an iterable of unicode chunks
+    into sentences, yielding one sentence at a time.
+
+    The last sentence found in the buffered text may continue in the
+    next chunk, so it is carried over and split again together with
+    the next chunk. Memory use is bounded by the chunk size plus the
+    length of the longest sentence.
     """
+    rest = u''
+    for chunk in textChunks:
+        buffered = rest + chunk
+        sentences = split_sentences(buffered)
+        if len(sentences) == 0:
+            rest = buffered
+            continue
 
-    # List of data sets for each sentence in this text
-    sentenceDataList = []
+        for sentence in sentences[:-1]:
+            yield sentence
 
-    # Split text into list of sentences
-    sentences = nltk.sent_tokenize(text)
+        # Carry over the last sentence, including anything after it
+        lastStart = buffered.rfind(sentences[-1])
+        rest = buffered[lastStart:] if lastStart >= 0 else sentences[-1]
+
+    for sentence in split_sentences(rest):
+        yield sentence
+
+
+def iter_tokenize_sentences(sentences, lang='de_DE', backend='nltk'):
+    """Tokenize sentences, yielding one tokenized sentence at a time.
+
+    Each yielded "sentence" element has the same layout as the
+    elements of the list returned by tokenize_text().
+    """
+    if backend not in TOKENIZER_BACKENDS:
+        raise ValueError('Invalid tokenizer backend "' + backend + '". Valid backends are: ' + str(TOKENIZER_BACKENDS))
 
     # Iterate sentences
     for sentence in sentences:
@@ -63,16 +258,12 @@ def tokenize_text(text, lang='de_DE'):
         wordDataList = []
 
         # Split sentence into list of words
-        words = tokenize_sentence_to_words(sentence)
+        words = tokenize_sentence_to_words(sentence, backend=backend)
 
         # Iterate words
         for word in words:
-            # Ignore short "words" that do not contain alphanumerics
-            if len(word) == 1 and not word[0].isalpha():
-                continue
-
-            # Ignore "words" that do not contain alphanumerics
-            if is_alphanumeric(word) == False:
+            # The regex backend only returns words anyway
+            if backend != 'regex' and not is_word(word):
                 continue
 
             # Split word into syllables
@@ -85,15 +276,49 @@ def tokenize_text(text, lang='de_DE'):
             }
             wordDataList.append(wordData)
 
-        # Add to sentence dat list
+        # Yield sentence data
         sentenceData = {
             'sentence' : sentence,
             'words' : wordDataList,
         }
-        sentenceDataList.append(sentenceData)
+        yield sentenceData
+
+
+def iter_tokenize_text(text, lang='de_DE', backend='nltk'):
+    """Tokenize an entire text, yielding one sentence at a time.
 
-    textData = {
-        'sentences' : sentenceDataList
-    }
+    Each yielded "sentence" element has the same layout as the
+    elements of the list returned by tokenize_text().
+    """
+    if backend not in TOKENIZER_BACKENDS:
+        raise ValueError('Invalid tokenizer backend "' + backend + '". Valid backends are: ' + str(TOKENIZER_BACKENDS))
+
+    # Split text into list of sentences
+    return iter_tokenize_sentences(split_sentences(text), lang=lang, backend=backend)
+
+
+def iter_tokenize_chunks(textChunks, lang='de_DE', backend='nltk'):
+    """Tokenize a text that is given as an iterable of unicode chunks
+    (e.g. from fileoperations.iter_text_file_chunks()),
+    yielding one sentence at a time.
+    """
+    return iter_tokenize_sentences(iter_split_chunks(textChunks), lang=lang, backend=backend)
+
+
+def tokenize_text(text, lang='de_DE', backend='nltk'):
+    """Tokenize an entire text.
+
+    The text will be split into sentences.
+    Sentences will be split into words.
+    Words will be split into syllables.
+
+    Returns a dictionary containing a list with all sentences in the text.
+    Each "sentence" element contains the original sentence, and a list with all words in the sentence.
+    Each "word" element contains the original word, and a list with all syllables in the word.
+    """
+    with profiling.profiler.stage('tokenize'):
+        textData = {
+            'sentences' : list(iter_tokenize_text(text, lang=lang, backend=backend))
+        }
 
     return textData
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import string
+from textlib import hashes
+
+# NumPy is optional, it is only needed for the "numpy" statistics backend
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Backends for computing statistics of compact texts
+STATS_BACKENDS = ['python', 'numpy']
+
+# Code points counted by analyze.count_punctuation()
+PUNCTUATION_CODEPOINTS = [ord(c) for c in string.punctuation]
+
+
+def is_available():
+    """Return True if NumPy is installed
+    """
+    return numpy is not None
+
+
+####################################
+#
+# Columns
+#
+####################################
+
+def column_to_array(column):
+    """Return a CompactText column as NumPy array.
+    The array shares its memory with the column.
+    """
+    if len(column) == 0:
+        return numpy.zeros(0, dtype=numpy.intc)
+    return numpy.frombuffer(column, dtype=numpy.intc)
+
+
+class CompactArrays():
+    """NumPy views of the columns of a CompactText:
+    per-token word ids, syllable counts and char counts,
+    and per-sentence word counts
+    """
+
+    def __init__(self, compactText):
+        self.compactText = compactText
+        self.wordIds = column_to_array(compactText.tokenWordIds)
+        self.syllableCounts = column_to_array(compactText.tokenSyllableCounts)
+        self.charCounts = column_to_array(compactText.tokenCharCounts)
+        self.sentenceWordCounts = numpy.diff(column_to_array(compactText.sentenceOffsets))
+        self._punctuationCounts = None
+
+    def punctuation_counts(self):
+        """Return the punctuation count of each sentence.
+        All sentences are converted to code points in one array,
+        punctuation is counted by a cumulative sum over that array.
+        """
+        if self._punctuationCounts is None:
+            encodedSentences = [sentence.encode('utf-32-le') for sentence in self.compactText.sentences]
+            codepoints = numpy.frombuffer(b''.join(encodedSentences), dtype='<u4')
+            sentenceLengths = numpy.array([len(encoded) // 4 for encoded in encodedSentences], dtype=numpy.int64)
+            sentenceEnds = numpy.cumsum(sentenceLengths)
+
+            isPunctuation = numpy.in1d(codepoints, PUNCTUATION_CODEPOINTS)
+            punctuationTotals = numpy.concatenate(([0], numpy.cumsum(isPunctuation, dtype=numpy.int64)))
+            self._punctuationCounts = punctuationTotals[sentenceEnds] - punctuationTotals[sentenceEnds - sentenceLengths]
+        return self._punctuationCounts
+
+
+####################################
+#
+# Statistics
+#
+####################################
+
+def add_compact_metadata(metadata, compactArrays):
+    """Vectorized version of MetadataAccumulator.add_compact_text():
+    update the text-level totals and maxima of a MetadataAccumulator
+    """
+    compactText = compactArrays.compactText
+    sentenceWordCounts = compactArrays.sentenceWordCounts
+    syllableCounts = compactArrays.syllableCounts
+
+    # Sentences without words are counted, but not analyzed
+    metadata.sentenceCount += len(compactText.sentences)
+    hasWords = sentenceWordCounts > 0
+    if not hasWords.any():
+        return
+
+    # Totals
+    punctuationCounts = numpy.where(hasWords, compactArrays.punctuation_counts(), 0)
+    metadata.totalWordCountPerText += int(sentenceWordCounts.sum())
+    metadata.totalSyllableCountPerText += int(syllableCounts.sum())
+    metadata.totalCharCountPerText += int(compactArrays.charCounts.sum())
+    metadata.totalPunctuationCountPerText += int(punctuationCounts.sum())
+
+    # Maxima, argmax returns the first occurrence like the sequential code
+    sentenceIndex = int(numpy.argmax(punctuationCounts))
+    if punctuationCounts[sentenceIndex] > metadata.totalMaxPunctuationCountPerSentence:
+        metadata.totalMaxPunctuationCountPerSentence = int(punctuationCounts[sentenceIndex])
+        metadata.totalMaxPunctuationCountPerSentence_sentence = hashes.get_string_crc32(compactText.sentences[sentenceIndex].encode('utf-8'))
+
+    sentenceIndex = int(numpy.argmax(sentenceWordCounts))
+    if sentenceWordCounts[sentenceIndex] > metadata.maxWordCountPerSentence:
+        metadata.maxWordCountPerSentence = int(sentenceWordCounts[sentenceIndex])
+        metadata.maxWordCountPerSentence_sentence = hashes.get_string_crc32(compactText.sentences[sentenceIndex].encode('utf-8'))
+
+    tokenIndex = int(numpy.argmax(syllableCounts))
+    if syllableCounts[tokenIndex] > metadata.totalMaxSyllableCountPerWord:
+        metadata.totalMaxSyllableCountPerWord = int(syllableCounts[tokenIndex])
+        metadata.totalMaxSyllableCountPerWord_word = hashes.get_string_crc32(compactText.words[compactArrays.wordIds[tokenIndex]].encode('utf-8'))
+
+
+def add_compact_readability(readingEase, compactArrays):
+    """Vectorized version of ReadabilityAccumulator.add_compact_text():
+    update the counters of a ReadabilityAccumulator
+    """
+    syllableCounts = compactArrays.syllableCounts
+    readingEase.words_with_at_least_6_letters += int(numpy.count_nonzero(compactArrays.charCounts >= 6))
+    readingEase.words_with_at_least_3_syllables += int(numpy.count_nonzero(syllableCounts >= 3))
+    readingEase.words_with_only_one_syllable += int(numpy.count_nonzero(syllableCounts == 1))
+
+
+def add_compact_word_counts(wordTable, compactArrays):
+    """Vectorized version of WordTableAccumulator.add_compact_text():
+    update the word counts of a WordTableAccumulator
+    """
+    words = compactArrays.compactText.words
+    idCounts = numpy.bincount(compactArrays.wordIds, minlength=len(words))
+
+    # Interned words are in order of first occurrence,
+    # so this adds words in the same order as add_sentence()
+    wordCounts = wordTable.wordCounts
+    for word, count in zip(words, idCounts.tolist()):
+        wordStr = word.lower()
+        wordCounts[wordStr] = wordCounts.get(wordStr, 0) + count
@@ -3,7 +3,10 @@
 
 import time
 import optparse
-from textlib import analyze,csm,fun
+from textlib import tokenize
+
+# Modules for the different modes are imported in main(), when
+# they are needed, so each mode only pays for its own imports
 
 
 LANG_DEFAULT = 'de_DE'
@@ -26,27 +29,128 @@ def main():
     parser.add_option('-s', '--shuffle', type='str', dest='fun',
                       nargs=1, default=None, metavar='FUN', help='Fun with words')
     parser.add_option('-f', '--force', action='store_true', dest='force', default=False, help='Force update of cached data')
+    parser.add_option('-t', '--tokenizer', type='choice', dest='tokenizer', nargs=1, default='nltk', metavar='BACKEND',
+                      choices=tokenize.TOKENIZER_BACKENDS,
+                      help='Word tokenizer backend: "nltk" (default) or "regex" (faster, alphabetic words only)')
+    parser.add_option('-r', '--recursive', action='store_true', dest='recursive', default=False,
+                      help='Also process files in all subfolders of a folder')
+    parser.add_option('--include', type='str', dest='include', action='append', default=None, metavar='PATTERN',
+                      help='Only process files whose name or relative path matches the glob PATTERN. Can be used multiple times')
+    parser.add_option('--exclude', type='str', dest='exclude', action='append', default=None, metavar='PATTERN',
+                      help='Skip files and folders whose name or relative path matches the glob PATTERN. Can be used multiple times')
+    parser.add_option('-e', '--extension', type='str', dest='extensions', action='append', default=None, metavar='EXTENSION',
+                      help='Extension of the text files to analyze in a folder. Can be used multiple times. If unspecified, ".txt" is used.')
+    parser.add_option('--verify', action='store_true', dest='verify', default=False,
+                      help='Verify cached data by checksums, even if size and modification time of the texts are unchanged')
+    parser.add_option('--format', type='choice', dest='outputFormat', nargs=1, default='json', metavar='FORMAT',
+                      choices=['json', 'binary'],
+                      help='Format of the metadata files: "json" (default) or "binary" (smaller and faster, header and summary can be read without the sentences)')
+    parser.add_option('--store', type='str', dest='storeFile', nargs=1, default=None, metavar='FILE',
+                      help='Also write all analysis results to the SQLite corpus store FILE. With "--csm learn", learn from FILE')
+    parser.add_option('--vocabulary', action='store_true', dest='vocabularyIds', default=False,
+                      help='Write a table of all distinct words to the metadata file, and let words reference it by id instead of repeating their metadata')
+    parser.add_option('--wordtable-top', type='int', dest='wordTableTop', nargs=1, default=None, metavar='N',
+                      help='Only write the N most frequent words to the word table of a folder')
+    parser.add_option('--wordtable-min-count', type='int', dest='wordTableMinCount', nargs=1, default=None, metavar='N',
+                      help='Only write words that occur at least N times to the word table of a folder')
+    parser.add_option('--ngrams', type='str', dest='ngramSizes', nargs=1, default=None, metavar='SIZES',
+                      help='Also count n-grams of the comma-separated SIZES (e.g. "2,3") and write n-gram tables')
+    parser.add_option('--ngram-exact', action='store_true', dest='ngramExact', default=False,
+                      help='Count n-grams exactly instead of with bounded memory. Only for small corpora')
+    parser.add_option('--ngram-top', type='int', dest='ngramTop', nargs=1, default=None, metavar='N',
+                      help='Number of most frequent n-grams per size that are tracked, and written to the n-gram table of a folder (default: 1000)')
+    parser.add_option('--ngram-sketch', type='str', dest='ngramSketch', nargs=1, default=None, metavar='WIDTHxDEPTH',
+                      help='Size of the count-min sketch that estimates n-gram counts (default: 32768x4)')
+    parser.add_option('--streaming', action='store_true', dest='streaming', default=False,
+                      help='Analyze texts one sentence at a time to save memory. Sentences are collected in a temporary file until the metadata file is written')
+    parser.add_option('--chunked', action='store_true', dest='chunked', default=False,
+                      help='Read and decode texts in chunks, for files that do not fit into memory. Implies --streaming')
+    parser.add_option('--compact', action='store_true', dest='compactTokens', default=False,
+                      help='Keep tokens in compact columns during analysis to save memory')
+    parser.add_option('--stats', type='choice', dest='statsBackend', nargs=1, default='python', metavar='BACKEND',
+                      choices=['python', 'numpy'],
+                      help='Statistics backend: "python" (default) or "numpy" (vectorized, requires NumPy). "numpy" implies --compact')
+    parser.add_option('-j', '--jobs', type='int', dest='jobs', nargs=1, default=1, metavar='N',
+                      help='Analyze the files of a folder in N parallel processes')
+    parser.add_option('--pipeline', action='store_true', dest='pipelined', default=False,
+                      help='Analyze the files of a folder in a single process, while reading upcoming files and writing finished results in background threads. Ignored with --jobs')
+    parser.add_option('--syllable-cache', type='str', dest='syllableCache', nargs=1, default=None, metavar='FILE',
+                      help='Load syllabification results from FILE before analyzing, and save them back afterwards')
+    parser.add_option('--serve', type='str', dest='serve', nargs=1, default=None, metavar='ADDRESS',
+                      help='Run an analysis server on ADDRESS (PORT, HOST:PORT or unix:PATH) that keeps NLTK and PyHyphen loaded. Use "--serve help" for more information.')
+    parser.add_option('--profile', type='str', dest='profile', nargs=1, default=None, metavar='FILE',
+                      help='Record wall and CPU time per stage and throughput counters, and write a per-run and per-file report to FILE as JSON')
+    parser.add_option('--cprofile', type='str', dest='cProfile', nargs=1, default=None, metavar='FILE',
+                      help='With --profile, also run the hot stages (tokenize, analyze, writeMetadata) under cProfile and write the statistics to FILE. Not available with --jobs')
+    parser.add_option('--benchmark', type='str', dest='benchmark', nargs=1, default=None, metavar='MODE',
+                      help='Run a benchmark. Use "--benchmark help" for more information.')
+    parser.add_option('--benchmark-output', type='str', dest='benchmarkOutput', nargs=1, default=None, metavar='FILE',
+                      help='Write benchmark results to FILE as JSON')
     (options, args) = parser.parse_args()
+    if options.cProfile and not options.profile:
+        parser.error('--cprofile requires --profile')
+    if options.cProfile and options.jobs > 1:
+        parser.error('--cprofile can not be used with --jobs, the hot stages run in the worker processes')
+    if (options.compactTokens or options.statsBackend == 'numpy') and (options.streaming or options.chunked):
+        parser.error('--compact and --stats numpy can not be used with --streaming or --chunked, which do not keep the tokens of a text')
 
     # Memorize start time
     timeStarted = time.time()
 
+    # Profiling
+    if options.profile:
+        from textlib import profiling
+        profiling.profiler.enable(captureCProfile=options.cProfile is not None)
+
     # Text analysis
     doneSomething = False
     if options.analyze:
-        analyze.analyze(args[0], fileExtension='.txt', lang=options.language, forceAnalyze=options.force)
+        from textlib import analyze, ngrams
+        ngramSizes = None
+        ngramTop = options.ngramTop if options.ngramTop is not None else ngrams.DEFAULT_CAPACITY
+        ngramSketch = (ngrams.DEFAULT_SKETCH_WIDTH, ngrams.DEFAULT_SKETCH_DEPTH)
+        try:
+            if options.ngramSizes:
+                ngramSizes = ngrams.parse_ngram_sizes(options.ngramSizes)
+            if options.ngramSketch:
+                ngramSketch = ngrams.parse_sketch_size(options.ngramSketch)
+        except ValueError as e:
+            parser.error(str(e))
+        if options.syllableCache:
+            tokenize.load_syllable_cache(options.syllableCache)
+        analyze.analyze(args[0], fileExtension=tuple(options.extensions or ['.txt']), lang=options.language, forceAnalyze=options.force, streaming=options.streaming, backend=options.tokenizer, compactTokens=options.compactTokens, jobs=options.jobs, verify=options.verify, recursive=options.recursive, include=options.include, exclude=options.exclude, outputFormat=options.outputFormat, storeFile=options.storeFile, chunked=options.chunked, statsBackend=options.statsBackend, vocabularyIds=options.vocabularyIds, pipelined=options.pipelined, wordTableTop=options.wordTableTop, wordTableMinCount=options.wordTableMinCount, ngramSizes=ngramSizes, ngramExact=options.ngramExact, ngramTop=ngramTop, ngramSketchWidth=ngramSketch[0], ngramSketchDepth=ngramSketch[1])
+        if options.syllableCache:
+            tokenize.save_syllable_cache(options.syllableCache)
         doneSomething = True
 
     # Common Sense Matrix
     if options.commonSense:
-        csm.start(options.commonSense, args)
+        from textlib import csm
+        csm.start(options.commonSense, args, recursive=options.recursive, include=options.include, exclude=options.exclude, storeFile=options.storeFile)
         doneSomething = True
         
     # Word Shuffle Fun
     if options.fun:
-        fun.have_fun(options.fun, lang=options.language)
+        from textlib import fun
+        fun.have_fun(options.fun, lang=options.language, backend=options.tokenizer)
+        doneSomething = True
+
+    # Analysis server
+    if options.serve:
+        from textlib import daemon
+        daemon.serve(options.serve, lang=options.language, backend=options.tokenizer, jobs=options.jobs)
         doneSomething = True
 
+    # Benchmarks
+    if options.benchmark:
+        from textlib import benchmark
+        benchmark.start(options.benchmark, args, outputFile=options.benchmarkOutput)
+        doneSomething = True
+
+    if options.profile and doneSomething:
+        print('')
+        profiling.profiler.write_report(options.profile, cProfileFilename=options.cProfile)
+
     if not doneSomething:
         parser.print_help()
     else: